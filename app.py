@@ -4,6 +4,9 @@ import os
 from dotenv import load_dotenv
 import asyncio
 import database
+import bulk_jobs
+import backups
+import level_ups
 import logging
 from logging.handlers import RotatingFileHandler
 
@@ -25,6 +28,16 @@ logger.addHandler(console)
 # --- CONFIGURATION ---
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+DB_PRAGMA_PROFILE = os.getenv("DB_PRAGMA_PROFILE", database.DEFAULT_PRAGMA_PROFILE)
+DB_SHARD_DIR = os.getenv("DB_SHARD_DIR")  # Unset = everything in economy.db/shop.db; see split_shards.py
+DB_SHARD_BUCKETS = int(os.getenv("DB_SHARD_BUCKETS", "0"))  # 0 = one shard per guild
+DB_SHARD_CACHE = int(os.getenv("DB_SHARD_CACHE", str(database.SHARD_CACHE_SIZE)))  # Shards kept open at once
+DB_USER_CACHE = int(os.getenv("DB_USER_CACHE", str(database.USER_CACHE_SIZE)))  # Cached user rows, 0 = off
+LEVEL_UP_WORKERS = int(os.getenv("LEVEL_UP_WORKERS", str(level_ups.LEVEL_UP_WORKERS)))
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))  # Snapshots kept per database
+BACKUP_COMPRESS = os.getenv("BACKUP_COMPRESS", "1") == "1"
+BACKUP_INTERVAL_HOURS = float(os.getenv("BACKUP_INTERVAL_HOURS", "24"))  # 0 = only on /backup
 
 # --- BOT INITIALIZATION ---
 class MyBot(commands.Bot):
@@ -35,11 +48,30 @@ class MyBot(commands.Bot):
         intents.voice_states = True 
         
         super().__init__(command_prefix="/", intents=intents, help_command=None) # We disable default help
-        self.db = database.DatabaseManager(self)
+        self.db = database.DatabaseManager(self, pragma_profile=DB_PRAGMA_PROFILE, shard_dir=DB_SHARD_DIR,
+                                           shard_buckets=DB_SHARD_BUCKETS, shard_cache_size=DB_SHARD_CACHE, user_cache_size=DB_USER_CACHE)
+        self.jobs = bulk_jobs.BulkJobRunner(self)  # Cogs register their job kinds when they load
+        self.level_ups = level_ups.LevelUpQueue(self, workers=LEVEL_UP_WORKERS)  # EconomyCog registers the handler
+        self.backups = backups.BackupService(self.db, BACKUP_DIR, keep=BACKUP_KEEP, compress=BACKUP_COMPRESS, interval_hours=BACKUP_INTERVAL_HOURS)
+
+    async def setup_hook(self):
+        """Runs once before connecting to Discord. Opens the database pool, queues unfinished bulk jobs, starts the
+        level-up workers and schedules backups."""
+        await self.db.init_db()
+        self.loop.create_task(self.jobs.resume())
+        self.level_ups.start()
+        self.backups.start()
+
+    async def close(self):
+        """Shuts the bot down, then closes the database pool once cogs have unloaded."""
+        await super().close()
+        await self.jobs.close()
+        await self.level_ups.close()
+        await self.backups.close()
+        await self.db.close()
 
     async def on_ready(self):
         """Event that runs when the bot is online."""
-        await self.db.init_db()
         logger.info(f'Logged in as {self.user.name} (ID: {self.user.id})')
         logger.info(f'Discord.py Version: {discord.__version__}')
         
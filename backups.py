@@ -0,0 +1,180 @@
+# backups.py
+# Online snapshots of economy.db and shop.db (and every shard file when sharded), taken while the bot keeps running.
+# SQLite's backup API copies a few hundred pages per step and sleeps in between. It reads from its own
+# read-only connection that holds ONE read transaction for the whole copy: in WAL mode that snapshot never
+# blocks the writer, and commits made meanwhile can't force the copy to start over.
+# Snapshots are integrity-checked, optionally gzipped and pruned to the newest `keep` per database.
+import asyncio
+import gzip
+import os
+import pathlib
+import re
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+
+DATABASES = ("economy", "shop")
+BACKUP_PAGES_PER_STEP = 256  # Pages copied per backup step (1 MB at the default 4 KB page size)
+BACKUP_STEP_SLEEP = 0.005    # Seconds to pause between steps
+INTEGRITY_ERRORS_SHOWN = 5   # integrity_check rows kept in the report when a snapshot is damaged
+# <database>-<YYYYmmdd-HHMMSS>[-n].db[.gz]; shard names contain dashes themselves ("guild-123-economy")
+SNAPSHOT_NAME = re.compile(r"^(?P<name>.+)-\d{8}-\d{6}(?:-\d+)?\.db(?:\.gz)?$")
+
+def _copy_snapshot(source_path: str, target_path: str) -> dict:
+    """Runs in a worker thread. Copies a live database into target_path and checks the copy."""
+    source = sqlite3.connect(f"{pathlib.Path(source_path).absolute().as_uri()}?mode=ro", uri=True, isolation_level=None)
+    target = sqlite3.connect(target_path)
+    try:
+        # Pin one snapshot: every step reads the same version of the file
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchall()
+        started = time.perf_counter()
+        source.backup(target, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP)
+        copy_seconds = time.perf_counter() - started
+        source.execute("COMMIT")
+
+        target.execute("PRAGMA journal_mode=DELETE")  # A self-contained single file, no -wal next to it
+        (pages,), = target.execute("PRAGMA page_count").fetchall()
+        (page_size,), = target.execute("PRAGMA page_size").fetchall()
+        problems = [row[0] for row in target.execute("PRAGMA integrity_check").fetchmany(INTEGRITY_ERRORS_SHOWN)]
+    finally:
+        source.close()
+        target.close()
+    return {"bytes": pages * page_size, "copy_seconds": copy_seconds, "integrity": "; ".join(problems)}
+
+def _check_snapshot(path: str) -> str:
+    db = sqlite3.connect(f"{pathlib.Path(path).absolute().as_uri()}?mode=ro", uri=True)
+    try:
+        return "; ".join(row[0] for row in db.execute("PRAGMA integrity_check").fetchmany(INTEGRITY_ERRORS_SHOWN))
+    finally:
+        db.close()
+
+def _gzip(source_path: str, target_path: str):
+    with open(source_path, "rb") as source, gzip.open(target_path, "wb", compresslevel=6) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+
+def _gunzip(source_path: str, target_path: str):
+    with gzip.open(source_path, "rb") as source, open(target_path, "wb") as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+
+class BackupService:
+    """Scheduled and on-demand snapshots of the bot's databases, plus restoring one of them."""
+    def __init__(self, db, directory: str = "backups", keep: int = 7, compress: bool = True, interval_hours: float = 24.0):
+        self.db = db
+        self.directory = directory
+        self.keep = keep
+        self.compress = compress
+        self.interval_hours = interval_hours  # 0 turns scheduled backups off; /backup still works
+        self.last_backup = {}  # {name: report of the most recent successful snapshot}
+        self._lock = asyncio.Lock()  # One backup or restore at a time
+        self._task = None
+
+    def start(self):
+        if self.interval_hours > 0 and self._task is None:
+            self._task = asyncio.create_task(self._backup_loop())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _backup_loop(self):
+        while True:
+            await asyncio.sleep(self.interval_hours * 3600)
+            try:
+                await self.backup_all()
+            except Exception as e:
+                print(f"❌ Scheduled backup failed: {e}")
+
+    async def backup_all(self) -> list:
+        return [await self.backup(name) for name in self.db.database_paths()]
+
+    async def backup(self, name: str) -> dict:
+        """Snapshots one database. Returns a report with the file, sizes, MB/s and the integrity check result;
+        a snapshot that fails the check is deleted instead of kept."""
+        if name not in self.db.database_paths(): raise ValueError(f"Unknown database '{name}'. Choose from: {', '.join(DATABASES)} or a shard")
+        async with self._lock:
+            return await self._backup(name)
+
+    async def _backup(self, name: str, prune: bool = True) -> dict:
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        extension = ".db.gz" if self.compress else ".db"
+        filename, copy = f"{name}-{stamp}{extension}", 1
+        while os.path.exists(os.path.join(self.directory, filename)):  # Two snapshots in the same second
+            copy += 1
+            filename = f"{name}-{stamp}-{copy}{extension}"
+        path = os.path.join(self.directory, filename)
+        partial = path + ".part"
+        started = time.perf_counter()
+        try:
+            report = await asyncio.to_thread(_copy_snapshot, self.db.database_paths()[name], partial)
+            if report["integrity"] != "ok":
+                print(f"❌ {name.title()} DB snapshot failed its integrity check, discarding it: {report['integrity']}")
+                return dict(report, name=name, file=None)
+            if self.compress:
+                await asyncio.to_thread(_gzip, partial, path)
+            else:
+                os.replace(partial, path)
+        finally:
+            if os.path.exists(partial): os.remove(partial)
+
+        report.update(name=name, file=filename, stored_bytes=os.path.getsize(path), total_seconds=time.perf_counter() - started)
+        report["mb_per_s"] = report["bytes"] / (1024 * 1024) / report["copy_seconds"] if report["copy_seconds"] else 0.0
+        self.last_backup[name] = report
+        pruned = self._prune(name) if prune else 0
+        print(f"💾 {name.title()} DB backed up to {path}: {report['bytes'] / (1024 * 1024):.1f} MB in {report['copy_seconds']:.2f}s "
+              f"({report['mb_per_s']:.1f} MB/s), stored {report['stored_bytes'] / (1024 * 1024):.1f} MB, integrity ok"
+              + (f", pruned {pruned} old" if pruned else ""))
+        return report
+
+    @staticmethod
+    def snapshot_database(filename: str):
+        """The database a snapshot file belongs to, or None if it isn't a snapshot."""
+        match = SNAPSHOT_NAME.match(filename)
+        return match["name"] if match else None
+
+    def list_snapshots(self, name: str = None) -> list:
+        """Snapshot file names, newest first."""
+        if not os.path.isdir(self.directory): return []
+        files = [f for f in os.listdir(self.directory) if self.snapshot_database(f) and (name is None or self.snapshot_database(f) == name)]
+        return sorted(files, key=lambda f: os.path.getmtime(os.path.join(self.directory, f)), reverse=True)
+
+    def _prune(self, name: str) -> int:
+        stale = self.list_snapshots(name)[self.keep:] if self.keep > 0 else []
+        for filename in stale:
+            os.remove(os.path.join(self.directory, filename))
+        return len(stale)
+
+    async def restore(self, filename: str) -> dict:
+        """Replaces a live database with one of its snapshots. The current contents are backed up first,
+        so a restore can itself be undone."""
+        if filename not in self.list_snapshots():
+            raise ValueError(f"No snapshot named `{filename}` in {self.directory}/")
+        name = self.snapshot_database(filename)
+        if name not in self.db.database_paths():
+            raise ValueError(f"`{filename}` is a snapshot of '{name}', which this bot doesn't use")
+        path = os.path.join(self.directory, filename)
+        async with self._lock:
+            staged = path
+            if filename.endswith(".gz"):
+                staged = os.path.join(self.directory, f".restore-{filename[:-3]}")
+                await asyncio.to_thread(_gunzip, path, staged)
+            try:
+                integrity = await asyncio.to_thread(_check_snapshot, staged)
+                if integrity != "ok":
+                    raise ValueError(f"`{filename}` failed its integrity check: {integrity}")
+                # Not pruned: that could delete the snapshot being restored. The next backup prunes.
+                safety = await self._backup(name, prune=False)
+                started = time.perf_counter()
+                await self.db.restore_database(name, staged)
+                elapsed = time.perf_counter() - started
+            finally:
+                if staged != path and os.path.exists(staged): os.remove(staged)
+
+        size = os.path.getsize(self.db.database_paths()[name])
+        saved = safety["file"] or "nothing, it failed its integrity check"
+        print(f"♻️ {name.title()} DB restored from {filename} in {elapsed:.2f}s (previous state saved as {saved})")
+        return {"name": name, "file": filename, "safety_file": safety["file"], "seconds": elapsed,
+                "mb_per_s": size / (1024 * 1024) / elapsed if elapsed else 0.0}
@@ -0,0 +1,414 @@
+import aiosqlite
+import asyncio
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import database
+import levels
+import storage
+
+# Micro-benchmarks for the database layer. Every run works on throwaway databases
+# in a temp folder, nothing here touches the real economy.db/shop.db.
+# Usage: python benchmark_db.py [--only pool] [--only search] [--only checkout] [--only group_commit] [--only records] [--only user_cache] [--only contract] ...
+
+# --- CONNECTION POOL ---
+# The "chat message" workload the economy cog generated: 1 user read + 3 settings reads + 1 user write
+QUERIES_PER_MESSAGE = 5
+
+class LegacyDatabase:
+    """Connect-per-call behaviour from before the connection pool, kept for comparison."""
+    def __init__(self, economy_db_path):
+        self.economy_db_path = economy_db_path
+
+    async def get_guild_setting(self, guild_id, key, default=None):
+        async with aiosqlite.connect(self.economy_db_path) as db:
+            cursor = await db.execute("SELECT setting_value FROM guild_settings WHERE guild_id = ? AND setting_key = ?", (guild_id, key))
+            row = await cursor.fetchone()
+            if row:
+                val = row[0]
+                if val.isdigit(): return int(val)
+                return val
+            return default
+
+    async def get_user_data(self, user_id, guild_id):
+        async with aiosqlite.connect(self.economy_db_path) as db:
+            db.row_factory = aiosqlite.Row
+            cursor = await db.execute("SELECT * FROM users WHERE user_id = ? AND guild_id = ?", (user_id, guild_id))
+            row = await cursor.fetchone()
+            if not row:
+                await db.execute("INSERT INTO users (user_id, guild_id) VALUES (?, ?)", (user_id, guild_id))
+                await db.commit()
+                cursor = await db.execute("SELECT * FROM users WHERE user_id = ? AND guild_id = ?", (user_id, guild_id))
+                row = await cursor.fetchone()
+            return dict(row)
+
+    async def update_user_data(self, user_id, guild_id, data):
+        set_clause = ", ".join([f"{key} = ?" for key in data.keys()])
+        values = list(data.values()) + [user_id, guild_id]
+        async with aiosqlite.connect(self.economy_db_path) as db:
+            await db.execute(f"UPDATE users SET {set_clause} WHERE user_id = ? AND guild_id = ?", values)
+            await db.commit()
+
+async def simulate_messages(db, guild_id, user_count, messages):
+    for _ in range(messages):
+        user_id = random.randint(1, user_count)
+        player = await db.get_user_data(user_id, guild_id)
+        for key in ("SUPREME_ROLE_ID", "MASTER_ROLE_ID", "ELITE_ROLE_ID"):
+            await db.get_guild_setting(guild_id, key)
+        await db.update_user_data(user_id, guild_id, {"balance": player['balance'] + 10, "last_coin_claim": time.time()})
+
+async def run_workload(db, user_count, messages, concurrency):
+    guild_id = 1
+    per_worker = messages // concurrency
+    start = time.perf_counter()
+    await asyncio.gather(*(simulate_messages(db, guild_id, user_count, per_worker) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return (per_worker * concurrency * QUERIES_PER_MESSAGE) / elapsed
+
+async def bench_pool(args):
+    print(f"--- CONNECTION POOL BENCHMARK ({args.messages} messages, {args.users} users, concurrency {args.concurrency}) ---\n")
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+        economy_path = os.path.join(tmp, "economy.db")
+        shop_path = os.path.join(tmp, "shop.db")
+        seed = database.DatabaseManager(None, economy_db_path=economy_path, shop_db_path=shop_path)
+        await seed.init_db()
+        for key, role_id in (("SUPREME_ROLE_ID", 3), ("MASTER_ROLE_ID", 2), ("ELITE_ROLE_ID", 1)):
+            await seed.set_guild_setting(1, key, role_id)
+        # Pre-create the rows: the legacy get-or-create races under concurrency
+        for user_id in range(1, args.users + 1):
+            await seed.get_user_data(user_id, 1)
+        await seed.close()
+
+        qps = await run_workload(LegacyDatabase(economy_path), args.users, args.messages, args.concurrency)
+        print(f"   {'connect-per-call':<26}{qps:>10,.0f} queries/s")
+
+        for profile in database.PRAGMA_PROFILES:
+            db = database.DatabaseManager(None, pragma_profile=profile, economy_db_path=economy_path, shop_db_path=shop_path)
+            await db.init_db()
+            qps = await run_workload(db, args.users, args.messages, args.concurrency)
+            await db.close()
+            print(f"   {f'pooled ({profile})':<26}{qps:>10,.0f} queries/s")
+    print()
+
+# --- SHOP SEARCH ---
+NAME_WORDS = ["galaxy", "neon", "retro", "glitch", "smooth", "cinematic", "anime", "vintage", "dream", "shadow", "crystal", "storm", "velvet", "pixel", "aurora", "ember"]
+KIND_WORDS = ["pack", "preset", "overlay", "transition", "project", "edit", "bundle", "effect"]
+APPLICATIONS = ["After Effects", "Alight Motion", "Premiere Pro", "CapCut", "General"]
+CATEGORIES = ["Project File", "CC", "Overlays", "Presets", "Transitions", "Sound FX"]
+SEARCH_QUERIES = ["galaxy", "neon pack", "cap", "overlays", "retro glitch", "aur", "velvet transition", "cinematic"]
+
+def fake_item(guild_id, n):
+    name = f"{random.choice(NAME_WORDS).title()} {random.choice(NAME_WORDS).title()} {random.choice(KIND_WORDS).title()} {n}"
+    return (1, guild_id, name, random.choice(APPLICATIONS), random.choice(CATEGORIES), random.randint(50, 5000), "https://example.com", time.time() - random.random() * 1e7)
+
+async def seed_catalog(db, size, guild_id=1):
+    async with db.shop.write() as conn:
+        await conn.executemany(
+            "INSERT INTO items (creator_id, guild_id, item_name, application, category, price, product_link, upload_timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [fake_item(guild_id, n) for n in range(size)]
+        )
+
+async def time_queries(run_query, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in SEARCH_QUERIES:
+            await run_query(query)
+    return (time.perf_counter() - start) / (rounds * len(SEARCH_QUERIES)) * 1000
+
+async def bench_search(args):
+    print("--- SHOP SEARCH BENCHMARK (LIKE '%query%' vs FTS5) ---\n")
+    for size in (10_000, 100_000):
+        with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+            db = database.DatabaseManager(None, economy_db_path=os.path.join(tmp, "economy.db"), shop_db_path=os.path.join(tmp, "shop.db"))
+            await db.init_db()
+            await seed_catalog(db, size)
+
+            async def like_search(query):
+                # The query /search used before the FTS index
+                return await db.shop.reader.execute_fetchall("SELECT item_id, item_name, price FROM items WHERE guild_id = ? AND item_name LIKE ?", (1, f'%{query}%'))
+
+            async def fts_search(query):
+                # No limit, like /search and the LIKE query, so both return every match
+                return await db.search_items(1, query)
+
+            like_ms = await time_queries(like_search, args.rounds)
+            fts_ms = await time_queries(fts_search, args.rounds)
+            like_rows = sum([len(await like_search(query)) for query in SEARCH_QUERIES]) / len(SEARCH_QUERIES)
+            fts_rows = sum([len(await fts_search(query)) for query in SEARCH_QUERIES]) / len(SEARCH_QUERIES)
+            await db.close()
+            print(f"   {size:>7,} items   LIKE {like_ms:>8.2f} ms/query ({like_rows:,.0f} rows)   "
+                  f"FTS5 {fts_ms:>8.2f} ms/query ({fts_rows:,.0f} rows)   ({like_ms / fts_ms:.1f}x)")
+    print()
+
+# --- SHOP CHECKOUT ---
+COMMISSION_RATE = 0.80  # Same as cogs/shop.py
+
+async def legacy_checkout(db, buyer_id, guild_id, item_id, price):
+    # The sequence PurchaseView.buy_button ran before purchase_item: four calls, three commits
+    item = await db.get_item_details(item_id, guild_id)
+    if await db.debit(buyer_id, guild_id, price) is None: return None
+    await db.credit(item['creator_id'], guild_id, int(item['price'] * COMMISSION_RATE))
+    await db.increment_purchase_count(item_id, guild_id)
+    return item
+
+async def attached_checkout(db, buyer_id, guild_id, item_id, price):
+    item, balance = await db.purchase_item(buyer_id, guild_id, item_id, price, COMMISSION_RATE)
+    return item if balance is not None else None
+
+async def bench_checkout(args):
+    print(f"--- SHOP CHECKOUT BENCHMARK ({args.checkouts} purchases, separate commits vs one ATTACH transaction) ---\n")
+    for profile in ("safe", database.DEFAULT_PRAGMA_PROFILE):
+        for label, checkout in (("separate commits", legacy_checkout), ("ATTACH transaction", attached_checkout)):
+            with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+                db = database.DatabaseManager(None, pragma_profile=profile, economy_db_path=os.path.join(tmp, "economy.db"), shop_db_path=os.path.join(tmp, "shop.db"))
+                await db.init_db()
+                await seed_catalog(db, 100)
+                for user_id in range(1, args.users + 1):
+                    await db.credit(user_id, 1, 10_000_000)
+                start = time.perf_counter()
+                for _ in range(args.checkouts):
+                    assert await checkout(db, random.randint(1, args.users), 1, random.randint(1, 100), 100)
+                elapsed = time.perf_counter() - start
+                await db.close()
+            print(f"   {f'{label} ({profile})':<34}{args.checkouts / elapsed:>9,.0f} checkouts/s   {elapsed / args.checkouts * 1000:>6.2f} ms each")
+    print()
+
+# --- GROUP COMMIT ---
+async def credit_many(db, user_count, writes):
+    for _ in range(writes):
+        await db.credit(random.randint(1, user_count), 1, 10)
+
+async def bench_group_commit(args):
+    print(f"--- GROUP COMMIT BENCHMARK ({args.messages} credits, concurrency {args.concurrency * 4}) ---\n")
+    concurrency = args.concurrency * 4
+    default_max = database.GROUP_COMMIT_MAX
+    for profile in ("safe", database.DEFAULT_PRAGMA_PROFILE):
+        for label, group_max in (("commit per write", 1), ("group commit", default_max)):
+            database.GROUP_COMMIT_MAX = group_max
+            with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+                db = database.DatabaseManager(None, pragma_profile=profile, economy_db_path=os.path.join(tmp, "economy.db"), shop_db_path=os.path.join(tmp, "shop.db"))
+                await db.init_db()
+                start = time.perf_counter()
+                await asyncio.gather(*(credit_many(db, args.users, args.messages // concurrency) for _ in range(concurrency)))
+                elapsed = time.perf_counter() - start
+                stats = db.economy.get_write_stats()
+                await db.close()
+            writes = args.messages // concurrency * concurrency
+            print(f"   {f'{label} ({profile})':<30}{writes / elapsed:>9,.0f} writes/s   "
+                  f"avg batch {stats['avg_batch']:>5.1f}   commit {stats['avg_commit_ms']:>5.2f} ms avg / {stats['max_commit_ms']:>5.2f} max   "
+                  f"peak queue {stats['max_queue_depth']}")
+    database.GROUP_COMMIT_MAX = default_max
+    print()
+
+# --- ROW RECORDS ---
+async def legacy_user_row(db, user_id, guild_id):
+    # get_user_data before UserRecord: SELECT * and a dict per call
+    key = (user_id, guild_id)
+    rows = await db.economy.reader.execute_fetchall("SELECT * FROM users WHERE user_id = ? AND guild_id = ?", key)
+    return db.accruals.overlay(key, dict(rows[0]))
+
+async def on_message_fields(db, user_id, guild_id):
+    # What EconomyCog.on_message reads now
+    return await db.get_user_fields(user_id, guild_id, "last_coin_claim", "last_xp_claim", "xp", "level")
+
+async def measure_reads(db, fetch, user_count, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        await fetch(db, random.randint(1, user_count), 1)
+    latency_us = (time.perf_counter() - start) / calls * 1e6
+    # Memory held by the results themselves, as a list of rows kept around (e.g. a cache or a scan)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [await fetch(db, user_id, 1) for user_id in range(1, user_count + 1)]
+    retained = (tracemalloc.get_traced_memory()[0] - before) / len(kept)
+    tracemalloc.stop()
+    return latency_us, retained
+
+async def bench_records(args):
+    print(f"--- ROW RECORD BENCHMARK (on_message user read, {args.messages} calls, {args.users} users) ---\n")
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+        db = database.DatabaseManager(None, economy_db_path=os.path.join(tmp, "economy.db"), shop_db_path=os.path.join(tmp, "shop.db"))
+        await db.init_db()
+        for user_id in range(1, args.users + 1):
+            await db.credit(user_id, 1, 100)
+        for label, fetch in (("SELECT * -> dict", legacy_user_row), ("get_user_data -> UserRecord", database.DatabaseManager.get_user_data), ("get_user_fields (4 columns)", on_message_fields)):
+            latency_us, retained = await measure_reads(db, fetch, args.users, args.messages)
+            print(f"   {label:<30}{latency_us:>8.1f} us/call   {retained:>6.0f} bytes retained per result")
+        await db.close()
+    print()
+
+# --- USER ROW CACHE ---
+async def bench_user_cache(args):
+    # Chat-like traffic: a few active members send most messages. Each "interaction" reads the same row a
+    # few times (a command, its checks, a game round) and every fourth one writes the balance back.
+    print(f"--- USER CACHE BENCHMARK ({args.messages} interactions, {args.users} users, skewed) ---\n")
+    rng = random.Random(7)
+    weights = [1 / rank for rank in range(1, args.users + 1)]
+    picks = rng.choices(range(1, args.users + 1), weights, k=args.messages)
+    for label, cache_size in (("no cache", 0), (f"LRU of {args.users // 5}", args.users // 5), (f"LRU of {args.users}", args.users)):
+        with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+            db = database.DatabaseManager(None, economy_db_path=os.path.join(tmp, "economy.db"), shop_db_path=os.path.join(tmp, "shop.db"), user_cache_size=cache_size)
+            await db.init_db()
+            for user_id in range(1, args.users + 1):
+                await db.credit(user_id, 1, 100)
+            db.user_cache.clear()
+            db.user_cache.stats.update(hits=0, misses=0, evictions=0, invalidations=0)
+            start = time.perf_counter()
+            for n, user_id in enumerate(picks):
+                for _ in range(3):
+                    player = await db.get_user_data(user_id, 1)
+                if n % 4 == 0:
+                    await db.update_user_data(user_id, 1, {"balance": player['balance'] + 1})
+            elapsed = time.perf_counter() - start
+            stats = db.user_cache.get_stats()
+            await db.close()
+        print(f"   {label:<16}{elapsed / args.messages * 1e6:>8.1f} us/interaction   hit rate {stats['hit_rate']:>6.1%}   {stats['evictions']:,} evictions")
+    print()
+
+# --- STORAGE ENGINE CONTRACT ---
+# One seeded workload over the StorageEngine interface, run against every engine. Each step records what the
+# engine returned; the engines must agree on all of it (search by result set, since only SQLite ranks by BM25).
+# Steps recorded as ("expect", what, got, expected) must also come out as expected on every engine.
+STORAGE_ENGINES = {
+    "sqlite": lambda tmp: database.DatabaseManager(None, economy_db_path=os.path.join(tmp, "economy.db"), shop_db_path=os.path.join(tmp, "shop.db")),
+    "sqlite-nocache": lambda tmp: database.DatabaseManager(None, economy_db_path=os.path.join(tmp, "economy.db"), shop_db_path=os.path.join(tmp, "shop.db"), user_cache_size=0),
+    "memory": lambda tmp: storage.MemoryEngine(),
+}
+
+async def contract_setup(db, users, seen):
+    for key, value in (("SUPREME_ROLE_ID", 3), ("WELCOME_MESSAGE", "hi"), ("ADMIN_LIST", "[1, 2]")):
+        await db.set_guild_setting(1, key, value)
+        seen.append(("setting", key, await db.get_guild_setting(1, key)))
+    seen.append(("missing setting", await db.get_guild_setting(1, "NOPE", "default")))
+    for user_id in range(1, users + 1):
+        seen.append(("new user", dict(await db.get_user_data(user_id, 1))))
+    seen.append(("user fields", await db.get_user_fields(1, 1, "balance", "level")))
+    seen.append(("many users", sorted(await db.get_users_data(1, [1, 2, users + 1], create_missing=False))))
+    # Batch lookup: existing rows with buffered rewards on top, a new user created, duplicates collapsed
+    db.accrue_user_data(2, 1, {"balance": 7})
+    batch = await db.get_users_data(1, [2, users + 1, 2])
+    seen.append(("expect", "batch lookup", {user_id: (row['user_id'], row['balance'], row['level']) for user_id, row in batch.items()}, {2: (2, 7, 1), users + 1: (users + 1, 0, 1)}))
+    for n in range(40):
+        item_id = await db.add_item_to_shop(n % users + 1, 1, f"{NAME_WORDS[n % len(NAME_WORDS)].title()} {KIND_WORDS[n % len(KIND_WORDS)].title()} {n}",
+                                            APPLICATIONS[n % len(APPLICATIONS)], CATEGORIES[n % len(CATEGORIES)], 50 + n * 10, "https://example.com", None, None, None)
+        seen.append(("item", dict(await db.get_item_details(item_id, 1), upload_timestamp=None)))
+    # Buying your own item: the balance returned includes the commission paid back to you
+    await db.credit(1, 1, 1000)
+    item, balance = await db.purchase_item(1, 1, 1, 500, 0.8)
+    seen.append(("expect", "own item purchase", balance, await db.get_user_fields(1, 1, "balance")))
+    # Chat XP and a stream reward accrued from the same starting row (level 1, 140 xp) add up as 200 total XP
+    await db.update_user_data(users, 1, {"level": 1, "xp": 140})
+    start = await db.get_user_fields(users, 1, "level", "xp")
+    for xp in (20, 40):
+        db.accrue_user_data(users, 1, {"xp": xp})
+    expected = levels.split_total(levels.total_xp(*start) + 60)
+    seen.append(("expect", "two xp sources, buffered", await db.get_user_fields(users, 1, "level", "xp"), expected))
+    await db.flush_accruals()
+    row = await db.get_user_data(users, 1)
+    seen.append(("expect", "two xp sources, flushed", (row['level'], row['xp']), expected))
+    seen.append(("expect", "two xp sources, ranked", (await db.get_user_rank(users, 1))['total_xp'], 200))
+
+async def contract_step(db, rng, users, seen):
+    user_id, other_id = rng.randint(1, users), rng.randint(1, users)
+    action = rng.random()
+    if action < 0.30:
+        db.accrue_user_data(user_id, 1, {"balance": 10, "xp": 5}, {"last_coin_claim": 1000.0 + rng.random()})
+        seen.append(("fields", await db.get_user_fields(user_id, 1, "balance", "xp")))
+    elif action < 0.45:
+        seen.append(("credit", await db.credit(user_id, 1, rng.randint(1, 500))))
+    elif action < 0.55:
+        seen.append(("debit", await db.debit(user_id, 1, rng.randint(1, 800), clamp=rng.random() < 0.3)))
+    elif action < 0.62:
+        seen.append(("transfer", await db.transfer(user_id, other_id, 1, rng.randint(1, 300)) if user_id != other_id else None))
+    elif action < 0.70:
+        level = rng.randint(1, 30)
+        await db.update_user_data(user_id, 1, {"level": level, "xp": rng.randint(0, 100 + 50 * level)})
+        seen.append(("user", dict(await db.get_user_data(user_id, 1))))
+    elif action < 0.80:
+        item, balance = await db.purchase_item(user_id, 1, rng.randint(1, 45), rng.randint(50, 600), 0.8)
+        seen.append(("purchase", item and item['purchase_count'], balance))
+    elif action < 0.86:
+        seen.append(("leaderboard", await db.get_leaderboard(1, limit=10, offset=rng.randint(0, 5))))
+        seen.append(("rank", await db.get_user_rank(user_id, 1), await db.count_ranked_users(1)))
+    elif action < 0.93:
+        order, category = rng.choice(list(storage.ITEM_ORDERINGS)), rng.choice([None, *CATEGORIES])
+        first = await db.get_items_page(1, order, limit=5, category=category)
+        following = await db.get_items_page(1, order, after=db.item_cursor(first[-1], order), limit=5, category=category) if first else []
+        back = await db.get_items_page(1, order, before=db.item_cursor(following[0], order), limit=5, category=category) if following else []
+        strip = lambda page: [item['item_id'] for item in page] if order == "name" else len(page)  # Upload times can tie
+        seen.append(("page", strip(first), strip(following), strip(back), await db.count_items(1, category), await db.get_item_categories(1)))
+    else:
+        query = rng.choice(SEARCH_QUERIES)
+        seen.append(("search", query, sorted(item['item_id'] for item in await db.search_items(1, query))))
+        featured = rng.randint(1, 40)
+        await db.set_featured_item(featured, 1)
+        seen.append(("featured", (await db.get_featured_item(1))['item_id']))
+
+async def bench_contract(args):
+    print(f"--- STORAGE ENGINE CONTRACT ({args.messages} mixed operations, {args.users} users) ---\n")
+    results = {}
+    for name, make_engine in STORAGE_ENGINES.items():
+        with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+            db = make_engine(tmp)
+            await db.init_db()
+            seen = []
+            await contract_setup(db, args.users, seen)
+            rng = random.Random(42)
+            start = time.perf_counter()
+            for _ in range(args.messages):
+                await contract_step(db, rng, args.users, seen)
+            elapsed = time.perf_counter() - start
+            await db.close()
+        results[name] = seen
+        print(f"   {name:<16}{args.messages / elapsed:>10,.0f} ops/s   {elapsed / args.messages * 1e6:>8.1f} us/op")
+
+    reference_name, reference = next(iter(results.items()))
+    passed = True
+    for name, seen in results.items():
+        for _, what, got, expected in (step for step in seen if step[0] == "expect"):
+            if got != expected:
+                print(f"   ❌ {name}: {what} gave {got}, expected {expected}")
+                passed = False
+    for name, seen in results.items():
+        mismatches = [i for i, (expected, got) in enumerate(zip(reference, seen)) if expected != got]
+        if len(seen) != len(reference): mismatches.append(min(len(seen), len(reference)))
+        if mismatches:
+            i = mismatches[0]
+            print(f"   ❌ {name} disagrees with {reference_name} on {len(mismatches)} results, first: {reference[i] if i < len(reference) else None} vs {seen[i] if i < len(seen) else None}")
+            passed = False
+        elif name != reference_name:
+            print(f"   ✅ {name} matches {reference_name} on all {len(seen):,} results")
+    print()
+    return passed
+
+BENCHMARKS = {
+    "pool": bench_pool,
+    "search": bench_search,
+    "checkout": bench_checkout,
+    "group_commit": bench_group_commit,
+    "records": bench_records,
+    "user_cache": bench_user_cache,
+    "contract": bench_contract,
+}
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Rocks 2.0 database layer.")
+    parser.add_argument("--only", action="append", choices=list(BENCHMARKS), help="Run just this benchmark (repeatable, default: all).")
+    parser.add_argument("--messages", type=int, default=2000, help="Simulated chat messages per run.")
+    parser.add_argument("--users", type=int, default=500, help="Distinct users in the simulated guild.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent message handlers.")
+    parser.add_argument("--checkouts", type=int, default=1000, help="Shop purchases per checkout run.")
+    parser.add_argument("--rounds", type=int, default=20, help="Repetitions of each query set.")
+    args = parser.parse_args()
+    failed = False
+    for name in args.only or BENCHMARKS:
+        # Benchmarks that check results (contract) return False on a mismatch
+        failed |= await BENCHMARKS[name](args) is False
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
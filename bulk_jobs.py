@@ -0,0 +1,185 @@
+# bulk_jobs.py
+# Guild-wide jobs (/syncranks, /synccreators) that run in the background instead of inside the interaction.
+# A job walks the guild's users in user_id order, one chunk at a time. After every chunk its place and counters
+# are saved to the bulk_jobs table and its status message is edited, so a restart resumes where it stopped.
+# Cogs register job kinds with bot.jobs.register(); app.py resumes unfinished jobs once the bot is ready.
+import asyncio
+import json
+import time
+from abc import ABC, abstractmethod
+import discord
+
+JOB_CHUNK_SIZE = 50  # Users per chunk; progress is saved after each one
+ROLE_EDIT_DELAY = 0.5  # Seconds between Discord changes, keeps us well under the role-edit rate limit
+STATUS_EDIT_INTERVAL = 5.0  # Minimum seconds between status message edits
+MAX_RATE_LIMIT_RETRIES = 3
+
+class BulkJob(ABC):
+    """One kind of job. Subclasses pick the users to visit and what to do with each member."""
+    kind = ""
+    title = ""
+    not_set_up = "This guild isn't set up for this job."  # Shown when prepare() returns None
+
+    @abstractmethod
+    async def prepare(self, bot, guild):
+        """Reads whatever the job needs (role IDs etc.). Returns it as a context, or None if the guild isn't set up."""
+
+    @abstractmethod
+    def min_level(self, context) -> int:
+        """Only users at or above this level are visited."""
+
+    @abstractmethod
+    async def process(self, bot, guild, member, user_data, context, details: dict) -> bool:
+        """Applies the job to one member. Returns True if anything changed; may add counters to `details`."""
+
+    def summarize(self, details: dict) -> str:
+        return ""
+
+async def with_rate_limit_retry(call, *args, **kwargs):
+    """Runs a Discord API call, waiting out 429s instead of failing the member."""
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        try:
+            return await call(*args, **kwargs)
+        except discord.RateLimited as e:
+            if attempt == MAX_RATE_LIMIT_RETRIES: raise
+            await asyncio.sleep(e.retry_after)
+        except discord.HTTPException as e:
+            if e.status != 429 or attempt == MAX_RATE_LIMIT_RETRIES: raise
+            await asyncio.sleep(2 ** attempt)
+
+class BulkJobRunner:
+    def __init__(self, bot):
+        self.bot = bot
+        self.kinds = {}  # {kind: BulkJob}
+        self._tasks = {}  # {job_id: asyncio.Task}
+        self._starting = set()  # (guild_id, kind) between the running-job check and the job's row existing
+
+    def register(self, job: BulkJob):
+        self.kinds[job.kind] = job
+
+    async def start(self, kind: str, guild: discord.Guild, channel) -> int:
+        """Starts a job and posts its status message in `channel`. Returns the job_id, or None if one is already running.
+        Raises ValueError (with the job's not_set_up message) if the guild isn't set up for it."""
+        # Reserve the slot before the first await, so a second call can't pass the check before our row exists
+        slot = (guild.id, kind)
+        if slot in self._starting: return None
+        self._starting.add(slot)
+        try:
+            if await self.bot.db.get_running_bulk_jobs(guild.id, kind):
+                return None
+            job = self.kinds[kind]
+            context = await job.prepare(self.bot, guild)
+            if context is None: raise ValueError(job.not_set_up)
+            total = await self.bot.db.count_users_at_level(guild.id, job.min_level(context))
+            job_id = await self.bot.db.create_bulk_job(guild.id, kind, channel.id, total, json.dumps({}))
+        finally:
+            self._starting.discard(slot)
+        try:
+            message = await channel.send(embed=self._status_embed(job, await self.bot.db.get_bulk_job(job_id)))
+            await self.bot.db.update_bulk_job(job_id, {"message_id": message.id})
+        except discord.HTTPException:
+            print(f"⚠️ Bulk job #{job_id} can't post its status message in #{channel}")
+        self._spawn(job_id)
+        return job_id
+
+    async def resume(self):
+        """Restarts every job that was still running when the bot last stopped."""
+        await self.bot.wait_until_ready()
+        for row in await self.bot.db.get_running_bulk_jobs():
+            if row['kind'] not in self.kinds:
+                print(f"⚠️ Bulk job #{row['job_id']} has unknown kind '{row['kind']}', leaving it paused")
+                continue
+            print(f"🔁 Resuming bulk job #{row['job_id']} ({row['kind']}) at {row['processed']}/{row['total']}")
+            self._spawn(row['job_id'])
+
+    async def close(self):
+        """Stops running jobs. Their state stays 'running' so the next start resumes them."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _spawn(self, job_id: int):
+        if job_id in self._tasks: return
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, job_id: int):
+        state = await self.bot.db.get_bulk_job(job_id)
+        job = self.kinds[state['kind']]
+        guild = self.bot.get_guild(state['guild_id'])
+        if guild is None:
+            await self.bot.db.update_bulk_job(job_id, {"status": "failed"})
+            return
+
+        details = json.loads(state['details'] or "{}")
+        status_message = self._status_message(guild, state)
+        last_edit = 0.0
+        try:
+            context = await job.prepare(self.bot, guild)
+            if context is None:
+                state['status'] = "failed"
+            else:
+                chunks = self.bot.db.iter_users(guild.id, ("level",), min_level=job.min_level(context), after_user_id=state['cursor'], batch_size=JOB_CHUNK_SIZE)
+                async for chunk in chunks:
+                    for user_data in chunk:
+                        member = guild.get_member(user_data['user_id'])
+                        if member and not member.bot:
+                            try:
+                                if await job.process(self.bot, guild, member, user_data, context, details):
+                                    state['changed'] += 1
+                                    await asyncio.sleep(ROLE_EDIT_DELAY)
+                            except discord.HTTPException as e:
+                                state['failed'] += 1
+                                print(f"❌ Bulk job #{job_id} failed for {member.display_name}: {e}")
+                        state['processed'] += 1
+                    state['cursor'] = chunk[-1]['user_id']
+                    await self._save(job_id, state, details)
+                    if status_message and time.monotonic() - last_edit >= STATUS_EDIT_INTERVAL:
+                        last_edit = time.monotonic()
+                        await self._edit_status(status_message, job, state, details)
+                state['status'] = "done"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Bulk job #{job_id} ({job.kind}) stopped: {e}")
+            state['status'] = "failed"
+
+        await self._save(job_id, state, details)
+        if status_message:
+            await self._edit_status(status_message, job, state, details)
+
+    async def _save(self, job_id: int, state: dict, details: dict):
+        await self.bot.db.update_bulk_job(job_id, {
+            "status": state['status'], "cursor": state['cursor'], "processed": state['processed'],
+            "changed": state['changed'], "failed": state['failed'], "details": json.dumps(details),
+        })
+
+    def _status_message(self, guild: discord.Guild, state: dict):
+        channel = guild.get_channel(state['channel_id']) if state['channel_id'] else None
+        if channel is None or not state['message_id']: return None
+        return channel.get_partial_message(state['message_id'])
+
+    async def _edit_status(self, message, job: BulkJob, state: dict, details: dict):
+        try:
+            await message.edit(embed=self._status_embed(job, state, details))
+        except discord.HTTPException:
+            pass
+
+    def _status_embed(self, job: BulkJob, state: dict, details: dict = None):
+        colors = {"running": discord.Color.blue(), "done": discord.Color.brand_green(), "failed": discord.Color.red()}
+        total = max(state['total'], state['processed'])
+        progress = state['processed'] / total if total else 1.0
+        bar = '🟩' * int(20 * progress) + '⬛' * (20 - int(20 * progress))
+        labels = {"running": "⏳ Running", "done": "✅ Complete", "failed": "❌ Stopped"}
+
+        embed = discord.Embed(title=f"{job.title} — {labels[state['status']]}", color=colors[state['status']])
+        embed.description = f"`{bar}`\nChecked **{state['processed']:,} / {total:,}** members"
+        embed.add_field(name="Updated", value=f"**{state['changed']:,}**", inline=True)
+        embed.add_field(name="Failed", value=f"**{state['failed']:,}**", inline=True)
+        summary = job.summarize(details or {})
+        if summary:
+            embed.add_field(name="Details", value=summary, inline=False)
+        embed.set_footer(text=f"Job #{state['job_id']} • Resumes automatically after a restart")
+        return embed
@@ -1,12 +1,83 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from .channel_config import get_guild_setting, is_owner_or_has_admin_role, PERKS
-import ast
+from .channel_config import get_guild_settings, get_role_grants, is_owner_or_has_admin_role, is_bot_owner, PERKS, ADMIN_GRANT, CREATOR_GRANT
+from bulk_jobs import BulkJob, with_rate_limit_retry
+from backups import DATABASES
+
+# --- BULK JOBS ---
+# Run by bot.jobs (bulk_jobs.py) in chunks; both are safe to re-run on members they already handled.
+class SyncCreatorsJob(BulkJob):
+    kind = "sync_creators"
+    title = "🎨 Creator Role Sync"
+    not_set_up = "No Creator roles configured. Use `/config addcreatorrole` first."
+
+    async def prepare(self, bot, guild):
+        return await get_role_grants(bot, guild.id, CREATOR_GRANT) or None
+
+    def min_level(self, context):
+        return 25
+
+    async def process(self, bot, guild, member, user_data, creator_role_ids, details):
+        current_role_ids = {role.id for role in member.roles}
+        roles_to_add = []
+        for role_id in creator_role_ids:
+            if role_id not in current_role_ids:
+                role = guild.get_role(int(role_id))
+                if role:
+                    roles_to_add.append(role)
+        if not roles_to_add: return False
+        await with_rate_limit_retry(member.add_roles, *roles_to_add, reason="Syncing Creator roles")
+        return True
+
+class SyncRanksJob(BulkJob):
+    kind = "sync_ranks"
+    title = "🏅 Rank Role Sync"
+    not_set_up = "No rank roles configured. Use `/config setrankrole` to set them up."
+
+    async def prepare(self, bot, guild):
+        settings = await get_guild_settings(bot, guild.id)
+        supreme_id = settings.get("SUPREME_ROLE_ID")
+        master_id = settings.get("MASTER_ROLE_ID")
+        elite_id = settings.get("ELITE_ROLE_ID")
+        
+        # Normalize IDs to int if they exist
+        rank_roles_map = {
+            100: (int(supreme_id) if supreme_id else None, "supreme"),
+            75: (int(master_id) if master_id else None, "master"),
+            50: (int(elite_id) if elite_id else None, "elite")
+        }
+        return {level_req: rank for level_req, rank in rank_roles_map.items() if rank[0]} or None
+
+    def min_level(self, rank_roles_map):
+        return min(rank_roles_map)
+
+    async def process(self, bot, guild, member, user_data, rank_roles_map, details):
+        user_level = user_data['level']
+        for level_req, (role_id, perk_key) in sorted(rank_roles_map.items(), reverse=True):
+            if user_level >= level_req:
+                role = guild.get_role(role_id)
+                if role and role not in member.roles:
+                    await with_rate_limit_retry(member.add_roles, role, reason=f"Retroactive promotion")
+                    details[perk_key] = details.get(perk_key, 0) + 1
+                    
+                    # DM Logic
+                    perk_info = PERKS[perk_key]
+                    embed = discord.Embed(title="🎉 You've Been Promoted!", description=f"You earned the **{role.name}** rank!", color=discord.Color.brand_green())
+                    embed.add_field(name="💰 Boost", value=f"**{perk_info['multiplier']:.1f}x** Coins & XP!", inline=False)
+                    try: await member.send(embed=embed)
+                    except discord.HTTPException: pass
+                    return True
+        return False
+
+    def summarize(self, details):
+        return f"**Supreme:** {details.get('supreme', 0)} | **Master:** {details.get('master', 0)} | **Elite:** {details.get('elite', 0)}"
 
 class AdminCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        bot.jobs.register(SyncCreatorsJob())
+        bot.jobs.register(SyncRanksJob())
 
     async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
         if isinstance(error, app_commands.CheckFailure):
@@ -20,91 +91,25 @@ class AdminCog(commands.Cog):
     @app_commands.checks.has_permissions(administrator=True)
     async def sync_creators(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True, thinking=True)
-        
-        # Updated: Async DB fetch + Parse list
-        raw_ids = await get_guild_setting(self.bot, interaction.guild.id, "CREATOR_ROLE_IDS")
-        try:
-            creator_role_ids = ast.literal_eval(raw_ids) if raw_ids else []
-        except:
-            creator_role_ids = []
-
-        if not creator_role_ids:
-            await interaction.followup.send("❌ No Creator roles configured. Use `/config addcreatorrole` first.", ephemeral=True)
-            return
-        
-        all_users_data = await self.bot.db.get_all_users_in_guild(interaction.guild.id)
-        eligible_users = [user for user in all_users_data if user['level'] >= 25]
-        updated_count = 0
-        
-        for user_data in eligible_users:
-            member = interaction.guild.get_member(user_data['user_id'])
-            if member:
-                current_role_ids = {role.id for role in member.roles}
-                roles_to_add = []
-                for role_id in creator_role_ids:
-                    if role_id not in current_role_ids:
-                        role = interaction.guild.get_role(int(role_id))
-                        if role:
-                            roles_to_add.append(role)
-                if roles_to_add:
-                    try:
-                        await member.add_roles(*roles_to_add, reason="Syncing Creator roles")
-                        updated_count += 1
-                    except discord.Forbidden:
-                        print(f"Failed to add creator role to {member.display_name}")
-        
-        await interaction.followup.send(f"✅ Sync complete! Updated **{updated_count}** eligible members.", ephemeral=True)
+        await self.start_job(interaction, SyncCreatorsJob.kind)
 
     @app_commands.command(name="syncranks", description="[Admin] Give rank roles to all members who meet level requirements.")
     @app_commands.checks.has_permissions(administrator=True)
     async def sync_ranks(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True, thinking=True)
-        
-        # Updated: Fetch individual settings asynchronously
-        supreme_id = await get_guild_setting(self.bot, interaction.guild.id, "SUPREME_ROLE_ID")
-        master_id = await get_guild_setting(self.bot, interaction.guild.id, "MASTER_ROLE_ID")
-        elite_id = await get_guild_setting(self.bot, interaction.guild.id, "ELITE_ROLE_ID")
-        
-        # Normalize IDs to int if they exist
-        rank_roles_map = {
-            100: (int(supreme_id) if supreme_id else None, "supreme"),
-            75: (int(master_id) if master_id else None, "master"),
-            50: (int(elite_id) if elite_id else None, "elite")
-        }
-
-        if not any(role_id for role_id, _ in rank_roles_map.values()):
-            await interaction.followup.send("❌ No rank roles configured. Use `/config setrankrole` to set them up.", ephemeral=True)
-            return
-
-        all_users_data = await self.bot.db.get_all_users_in_guild(interaction.guild.id)
-        counts = {"elite": 0, "master": 0, "supreme": 0}
-        
-        await interaction.followup.send(f"Scanning **{len(all_users_data)}** members...", ephemeral=True)
-
-        for user_data in all_users_data:
-            member = interaction.guild.get_member(user_data['user_id'])
-            if not member or member.bot: continue
+        await self.start_job(interaction, SyncRanksJob.kind)
 
-            user_level = user_data['level']
-            
-            for level_req, (role_id, perk_key) in sorted(rank_roles_map.items(), reverse=True):
-                if user_level >= level_req and role_id:
-                    role = interaction.guild.get_role(role_id)
-                    if role and role not in member.roles:
-                        try:
-                            await member.add_roles(role, reason=f"Retroactive promotion")
-                            counts[perk_key] += 1
-                            
-                            # DM Logic
-                            perk_info = PERKS[perk_key]
-                            embed = discord.Embed(title="🎉 You've Been Promoted!", description=f"You earned the **{role.name}** rank!", color=discord.Color.brand_green())
-                            embed.add_field(name="💰 Boost", value=f"**{perk_info['multiplier']:.1f}x** Coins & XP!", inline=False)
-                            await member.send(embed=embed)
-                        except: pass
-                        break 
-        
-        summary = f"**Supreme:** {counts['supreme']} | **Master:** {counts['master']} | **Elite:** {counts['elite']}"
-        await interaction.followup.send(f"✅ **Rank Sync Complete**\n{summary}", ephemeral=True)
+    async def start_job(self, interaction: discord.Interaction, kind: str):
+        # The job runs in the background and keeps its own status message up to date in this channel.
+        # start() checks the guild is set up for it (prepare) itself, so a config change can't slip past a check here
+        try:
+            job_id = await self.bot.jobs.start(kind, interaction.guild, interaction.channel)
+        except ValueError as e:
+            return await interaction.followup.send(f"❌ {e}", ephemeral=True)
+        if job_id is None:
+            await interaction.followup.send("❌ That sync is already running. Check its status message in the channel.", ephemeral=True)
+        else:
+            await interaction.followup.send(f"✅ Started job **#{job_id}**. Progress is posted in {interaction.channel.mention}.", ephemeral=True)
 
     @app_commands.command(name="removecoins", description="[Admin] Remove coins from a user.")
     @app_commands.check(is_owner_or_has_admin_role)
@@ -112,9 +117,7 @@ class AdminCog(commands.Cog):
         await interaction.response.defer()
         if amount <= 0: return await interaction.followup.send("Please provide a positive number.", ephemeral=True)
         
-        player = await self.bot.db.get_user_data(user.id, interaction.guild.id)
-        new_balance = max(0, player['balance'] - amount)
-        await self.bot.db.update_user_data(user.id, interaction.guild.id, {"balance": new_balance})
+        await self.bot.db.debit(user.id, interaction.guild.id, amount, clamp=True)
         await interaction.followup.send(f"✅ Removed **{amount:,}** coins from {user.mention}.")
 
     adminrole_group = app_commands.Group(name="adminrole", description="Manage which roles have admin access.")
@@ -122,41 +125,23 @@ class AdminCog(commands.Cog):
     @adminrole_group.command(name="add", description="[Admin] Grant a role admin command access.")
     @app_commands.checks.has_permissions(administrator=True)
     async def add_admin_role(self, interaction: discord.Interaction, role: discord.Role):
-        # Updated: Read -> Parse -> Append -> Save
-        raw_roles = await get_guild_setting(self.bot, interaction.guild.id, "ADMIN_ROLES")
-        try:
-            admin_roles = ast.literal_eval(raw_roles) if raw_roles else []
-        except: admin_roles = []
-
-        if role.id in admin_roles:
+        if not await self.bot.db.add_role_grant(interaction.guild.id, ADMIN_GRANT, role.id):
             return await interaction.response.send_message(f"❌ {role.mention} is already an admin role.", ephemeral=True)
             
-        admin_roles.append(role.id)
-        await self.bot.db.set_guild_setting(interaction.guild.id, "ADMIN_ROLES", str(admin_roles))
         await interaction.response.send_message(f"✅ Granted admin access to {role.mention}.", ephemeral=True)
 
     @adminrole_group.command(name="remove", description="[Admin] Revoke a role's admin command access.")
     @app_commands.checks.has_permissions(administrator=True)
     async def remove_admin_role(self, interaction: discord.Interaction, role: discord.Role):
-        raw_roles = await get_guild_setting(self.bot, interaction.guild.id, "ADMIN_ROLES")
-        try:
-            admin_roles = ast.literal_eval(raw_roles) if raw_roles else []
-        except: admin_roles = []
-
-        if role.id not in admin_roles:
+        if not await self.bot.db.remove_role_grant(interaction.guild.id, ADMIN_GRANT, role.id):
             return await interaction.response.send_message(f"❌ {role.mention} is not an admin role.", ephemeral=True)
             
-        admin_roles.remove(role.id)
-        await self.bot.db.set_guild_setting(interaction.guild.id, "ADMIN_ROLES", str(admin_roles))
         await interaction.response.send_message(f"✅ Revoked admin access from {role.mention}.", ephemeral=True)
 
     @adminrole_group.command(name="list", description="[Admin] List all roles with admin command access.")
     @app_commands.checks.has_permissions(administrator=True)
     async def list_admin_roles(self, interaction: discord.Interaction):
-        raw_roles = await get_guild_setting(self.bot, interaction.guild.id, "ADMIN_ROLES")
-        try:
-            admin_role_ids = ast.literal_eval(raw_roles) if raw_roles else []
-        except: admin_role_ids = []
+        admin_role_ids = await get_role_grants(self.bot, interaction.guild.id, ADMIN_GRANT)
         
         if not admin_role_ids:
             return await interaction.response.send_message("No admin roles configured.", ephemeral=True)
@@ -170,9 +155,7 @@ class AdminCog(commands.Cog):
     @app_commands.check(is_owner_or_has_admin_role)
     async def givecoins(self, interaction: discord.Interaction, user: discord.User, amount: int):
         await interaction.response.defer()
-        player = await self.bot.db.get_user_data(user.id, interaction.guild.id)
-        new_balance = player['balance'] + amount
-        await self.bot.db.update_user_data(user.id, interaction.guild.id, {"balance": new_balance})
+        await self.bot.db.credit(user.id, interaction.guild.id, amount)
         await interaction.followup.send(f"✅ Gave **{amount:,}** coins to {user.mention}.")
 
     @app_commands.command(name="removeitem", description="[Admin] Remove an item from the shop.")
@@ -190,14 +173,91 @@ class AdminCog(commands.Cog):
             await self.bot.db.update_user_data(user.id, interaction.guild.id, {"level": 1, "xp": 0})
             await interaction.followup.send(f"✅ Reset level for {user.mention}.")
         else:
-            all_users = await self.bot.db.get_all_users_in_guild(interaction.guild.id)
-            updated = 0
-            for user_data in all_users:
-                if user_data['level'] > 11:
-                    await self.bot.db.update_user_data(user_data['user_id'], interaction.guild.id, {"level": 9, "xp": 0})
-                    updated += 1
+            # One set-based UPDATE for the whole guild
+            updated = await self.bot.db.reset_levels(interaction.guild.id, above=11, to_level=9)
             await interaction.followup.send(f"✅ Reset complete! Affected **{updated}** players.")
 
+    @app_commands.command(name="dbstats", description="[Admin] Show database writer queue, commit latency and maintenance.")
+    @app_commands.check(is_owner_or_has_admin_role)
+    async def dbstats(self, interaction: discord.Interaction):
+        embed = discord.Embed(title="🗄️ Database Writers", color=discord.Color.orange())
+        for name, stats in self.bot.db.get_write_stats().items():
+            embed.add_field(name=name.title(), value=(
+                f"Queue: **{stats['queue_depth']}** (peak {stats['max_queue_depth']})\n"
+                f"Commits: **{stats['commits']:,}** • {stats['writes']:,} writes (avg {stats['avg_batch']:.1f}, max {stats['max_batch']} per commit)\n"
+                f"Commit latency: **{stats['last_commit_ms']:.2f} ms** last • {stats['avg_commit_ms']:.2f} avg • {stats['max_commit_ms']:.2f} max\n"
+                f"WAL: **{getattr(self.bot.db, name).wal_bytes() / (1024 * 1024):.1f} MB**"
+                + self._maintenance_line(self.bot.db.last_maintenance.get(name))
+            ), inline=False)
+        cache = self.bot.db.user_cache.get_stats()
+        embed.add_field(name="User Cache", value=(
+            f"Rows: **{cache['size']:,}**/{cache['capacity']:,} • hit rate **{cache['hit_rate']:.1%}**\n"
+            f"Hits: {cache['hits']:,} • misses {cache['misses']:,} • evictions {cache['evictions']:,} • invalidations {cache['invalidations']:,}"
+        ), inline=False)
+        cooldowns = self.bot.db.cooldowns.get_stats()
+        embed.add_field(name="Cooldowns", value=(
+            f"Tracked: **{cooldowns['tracked']:,}**/{cooldowns['capacity']:,} • answered from memory {cooldowns['hits']:,} • "
+            f"loaded {cooldowns['loads']:,} • pruned {cooldowns['pruned']:,}"
+        ), inline=False)
+        queue = self.bot.level_ups.get_stats()
+        embed.add_field(name="Level-up Queue", value=(
+            f"Backlog: **{queue['depth']}**/{queue['capacity']} (peak {queue['max_depth']}, oldest {queue['oldest_wait_ms']:.0f} ms) • {queue['workers']} workers\n"
+            f"Done: **{queue['processed']:,}** • merged {queue['merged']:,} • dropped {queue['dropped']:,} • failed {queue['failed']:,} • "
+            f"wait {queue['avg_wait_ms']:.0f} ms avg, {queue['max_wait_ms']:.0f} ms max"
+        ), inline=False)
+        economy = self.bot.get_cog("EconomyCog")
+        if economy:
+            boards = economy.get_leaderboard_stats()
+            embed.add_field(name="Leaderboard Snapshots", value=(
+                f"Guilds: **{boards['guilds']:,}** • served from memory **{boards['hit_rate']:.1%}**\n"
+                f"Served: {boards['served']:,} • rebuilds {boards['rebuilds']:,} (top changed {boards['changed']:,}, expired {boards['expired']:,})"
+            ), inline=False)
+        if self.bot.db.shards:
+            shards = self.bot.db.shards.get_stats()
+            embed.add_field(name="Shards", value=(
+                f"Open: **{shards['open']}**/{shards['capacity']} • {shards['on_disk']:,} on disk\n"
+                f"Hits: **{shards['hits']:,}** • {shards['opens']:,} opens • {shards['evictions']:,} evictions"
+            ), inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @staticmethod
+    def _maintenance_line(report) -> str:
+        if not report: return " • not maintained yet"
+        return (f" • last maintenance <t:{int(report['finished_at'])}:R>: {report['checkpoint']} checkpoint, "
+                f"{report['pages_after']:,} pages ({report['free_after']:,} free), {report['total_ms']:.1f} ms")
+
+    @app_commands.command(name="backup", description="[Owner] Take an online snapshot of the bot's databases.")
+    @app_commands.check(is_bot_owner)
+    @app_commands.choices(database=[app_commands.Choice(name=name, value=name) for name in DATABASES])
+    async def backup(self, interaction: discord.Interaction, database: app_commands.Choice[str] = None):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        reports = [await self.bot.backups.backup(database.value)] if database else await self.bot.backups.backup_all()
+        lines = []
+        for report in reports:
+            if report['file'] is None:
+                lines.append(f"❌ **{report['name']}**: integrity check failed, snapshot discarded (`{report['integrity']}`)")
+            else:
+                lines.append(f"✅ **{report['name']}** → `{report['file']}` • {report['bytes'] / (1024 * 1024):.1f} MB "
+                             f"at {report['mb_per_s']:.1f} MB/s • stored {report['stored_bytes'] / (1024 * 1024):.1f} MB")
+        await interaction.followup.send("\n".join(lines), ephemeral=True)
+
+    @app_commands.command(name="restore", description="[Owner] Replace a database with one of its snapshots.")
+    @app_commands.describe(snapshot="Snapshot file from /backup; the current data is backed up first.")
+    @app_commands.check(is_bot_owner)
+    async def restore(self, interaction: discord.Interaction, snapshot: str):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            report = await self.bot.backups.restore(snapshot)
+        except ValueError as e:
+            return await interaction.followup.send(f"❌ {e}", ephemeral=True)
+        saved = f"The previous data was saved as `{report['safety_file']}`." if report['safety_file'] else "⚠️ The previous data failed its integrity check and was not saved."
+        await interaction.followup.send(
+            f"♻️ Restored **{report['name']}** from `{report['file']}` in {report['seconds']:.2f}s ({report['mb_per_s']:.1f} MB/s).\n{saved}", ephemeral=True)
+
+    @restore.autocomplete("snapshot")
+    async def restore_snapshot_autocomplete(self, interaction: discord.Interaction, current: str):
+        return [app_commands.Choice(name=filename, value=filename) for filename in self.bot.backups.list_snapshots() if current in filename][:25]
+
     @app_commands.command(name="featureitem", description="[Admin] Feature an item in the new shop view.")
     @app_commands.check(is_owner_or_has_admin_role)
     async def feature_item(self, interaction: discord.Interaction, item_id: int):
@@ -2,11 +2,15 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import os
-import ast # Used to safely convert strings "[1, 2]" back to lists [1, 2]
 import typing
+from collections import OrderedDict
 
 WELCOME_GIF_DIR = "cogs/welcome_gifs"
 
+# grant_type values in guild_role_grants
+ADMIN_GRANT = "admin"
+CREATOR_GRANT = "creator"
+
 PERKS = {
     "default": {"multiplier": 1.0, "daily_bonus": 0, "shop_discount": 0.0, "pay_limit": 10000, "flair": ""},
     "elite": {"multiplier": 1.2, "daily_bonus": 250, "shop_discount": 0.0, "pay_limit": 25000, "flair": "💠"},
@@ -18,37 +22,67 @@ PERKS = {
 async def get_guild_setting(bot, guild_id, key, default=None):
     return await bot.db.get_guild_setting(guild_id, key, default)
 
+async def get_guild_settings(bot, guild_id) -> dict:
+    """Returns the guild's whole (cached) settings snapshot. Treat it as read-only."""
+    return await bot.db.get_guild_settings(guild_id)
+
+async def get_role_grants(bot, guild_id, grant_type) -> frozenset:
+    """Role IDs holding ADMIN_GRANT or CREATOR_GRANT in the guild (cached, nothing to parse)."""
+    return await bot.db.get_role_grants(guild_id, grant_type)
+
+async def has_role_grant(bot, member: discord.Member, grant_type) -> bool:
+    grants = await bot.db.get_role_grants(member.guild.id, grant_type)
+    return bool(grants) and not grants.isdisjoint(role.id for role in member.roles)
+
+# --- MEMBER PERK CACHE ---
+# Resolved tier per (guild_id, member_id). Dropped when the member's roles change (on_member_update), when they
+# leave, and for the whole guild when a rank role is set (/config setrankrole) or deleted. Each tier also
+# remembers the settings snapshot it was read from; a /restore reloads settings into new snapshots, so tiers
+# from before it no longer match.
+PERK_CACHE_SIZE = 50_000  # Members remembered; least recently used go first
+RANK_SETTINGS = (("SUPREME_ROLE_ID", "supreme"), ("MASTER_ROLE_ID", "master"), ("ELITE_ROLE_ID", "elite"))  # Highest first
+_member_tiers = OrderedDict()  # {(guild_id, member_id): (PERKS key, settings snapshot it came from)}
+
+def forget_member_perks(guild_id, member_id=None):
+    """Drops one member's cached tier, or every member's in the guild when member_id is None."""
+    if member_id is not None:
+        _member_tiers.pop((guild_id, member_id), None)
+        return
+    for key in [key for key in _member_tiers if key[0] == guild_id]:
+        del _member_tiers[key]
+
 async def get_member_perks(bot, member: discord.Member) -> dict:
     if not member or not isinstance(member, discord.Member): return PERKS["default"]
-    
-    # We fetch the role IDs from DB
-    supreme_id = await bot.db.get_guild_setting(member.guild.id, "SUPREME_ROLE_ID")
-    master_id = await bot.db.get_guild_setting(member.guild.id, "MASTER_ROLE_ID")
-    elite_id = await bot.db.get_guild_setting(member.guild.id, "ELITE_ROLE_ID")
+    key = (member.guild.id, member.id)
+    # Role IDs come from the in-memory settings snapshot, so no DB round trip here
+    settings = await bot.db.get_guild_settings(member.guild.id)
+    cached = _member_tiers.get(key)
+    if cached is not None and cached[1] is settings:
+        _member_tiers.move_to_end(key)
+        return PERKS[cached[0]]
 
-    role_ids = {role.id for role in member.roles}
-    
-    if supreme_id and int(supreme_id) in role_ids: return PERKS["supreme"]
-    if master_id and int(master_id) in role_ids: return PERKS["master"]
-    if elite_id and int(elite_id) in role_ids: return PERKS["elite"]
-    return PERKS["default"]
+    tier = "default"
+    for setting_key, rank in RANK_SETTINGS:
+        role_id = settings.get(setting_key)
+        if role_id and member.get_role(int(role_id)):
+            tier = rank
+            break
+
+    _member_tiers[key] = (tier, settings)
+    if len(_member_tiers) > PERK_CACHE_SIZE:
+        _member_tiers.popitem(last=False)
+    return PERKS[tier]
 
 # Helper to check permissions asynchronously
 async def is_owner_or_has_admin_role(interaction: discord.Interaction) -> bool:
     if interaction.user.id == interaction.guild.owner_id: return True
     
     # We need to access the bot via the interaction
-    raw_admin = await interaction.client.db.get_guild_setting(interaction.guild.id, "ADMIN_ROLES")
-    if not raw_admin: return False
-    
-    try:
-        admin_role_ids = set(ast.literal_eval(raw_admin))
-    except:
-        return False
-        
-    user_role_ids = {role.id for role in interaction.user.roles}
-    return not user_role_ids.isdisjoint(admin_role_ids)
+    return await has_role_grant(interaction.client, interaction.user, ADMIN_GRANT)
 
+async def is_bot_owner(interaction: discord.Interaction) -> bool:
+    # For commands that act on every guild's data at once (backups, restores)
+    return await interaction.client.is_owner(interaction.user)
 
 class ChannelConfigCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -56,6 +90,21 @@ class ChannelConfigCog(commands.Cog):
         if not os.path.exists(WELCOME_GIF_DIR):
             os.makedirs(WELCOME_GIF_DIR)
 
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        # A deleted role can't grant anything any more
+        await self.bot.db.remove_role_from_all_grants(role.guild.id, role.id)
+        forget_member_perks(role.guild.id)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        if before.roles != after.roles:
+            forget_member_perks(after.guild.id, after.id)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        forget_member_perks(member.guild.id, member.id)
+
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
         if member.bot: return
@@ -102,12 +151,7 @@ class ChannelConfigCog(commands.Cog):
 
     @config_group.command(name="addcreatorrole", description="Add a role that can upload items.")
     async def add_creator(self, interaction: discord.Interaction, role: discord.Role):
-        current_raw = await self.bot.db.get_guild_setting(interaction.guild.id, "CREATOR_ROLE_IDS")
-        current_list = ast.literal_eval(current_raw) if current_raw else []
-        
-        if role.id not in current_list:
-            current_list.append(role.id)
-            await self.bot.db.set_guild_setting(interaction.guild.id, "CREATOR_ROLE_IDS", str(current_list))
+        if await self.bot.db.add_role_grant(interaction.guild.id, CREATOR_GRANT, role.id):
             await interaction.response.send_message(f"✅ Added {role.mention} as creator.", ephemeral=True)
         else:
             await interaction.response.send_message("❌ Role already added.", ephemeral=True)
@@ -120,6 +164,7 @@ class ChannelConfigCog(commands.Cog):
     ])
     async def set_rank(self, interaction: discord.Interaction, rank: str, role: discord.Role):
         await self.bot.db.set_guild_setting(interaction.guild.id, rank, role.id)
+        forget_member_perks(interaction.guild.id)
         await interaction.response.send_message(f"✅ Set {rank} to {role.mention}", ephemeral=True)
 
 async def setup(bot: commands.Bot):
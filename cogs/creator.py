@@ -1,15 +1,11 @@
 import discord
 from discord.ext import commands
 from discord import app_commands, ui
-from .channel_config import get_guild_settings, get_member_perks
+from .channel_config import get_guild_settings, get_role_grants, has_role_grant, get_member_perks, CREATOR_GRANT
 import time
 
 async def can_upload_check(interaction: discord.Interaction) -> bool:
-    guild_settings = get_guild_settings(interaction.guild.id)
-    creator_role_ids = set(guild_settings.get("CREATOR_ROLE_IDS", []))
-    if not creator_role_ids: return False
-    user_role_ids = {role.id for role in interaction.user.roles}
-    return not user_role_ids.isdisjoint(creator_role_ids)
+    return await has_role_grant(interaction.client, interaction.user, CREATOR_GRANT)
 
 class UploadModal(ui.Modal, title="Upload New Shop Item"):
     # ... (This class is unchanged)
@@ -62,8 +58,8 @@ class BumpItemView(ui.View):
 
     async def on_select(self, interaction: discord.Interaction):
         item_id = int(self.select_menu.values[0])
-        await self.bot.db.bump_item(item_id)
-        await self.bot.db.update_user_data(interaction.user.id, interaction.guild.id, {"last_bump_timestamp": time.time()})
+        await self.bot.db.bump_item(item_id, interaction.guild.id)
+        self.bot.db.cooldowns.claim("bump", interaction.user.id, interaction.guild.id)
         
         embed = discord.Embed(title="🚀 Item Bumped!", description=f"Your item has been moved to the top of the 'New Arrivals' list.", color=discord.Color.green())
         await interaction.response.edit_message(embed=embed, view=None)
@@ -79,8 +75,7 @@ class CreatorCog(commands.Cog):
         
     async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
         if isinstance(error, app_commands.CheckFailure):
-            guild_settings = get_guild_settings(interaction.guild.id)
-            if not guild_settings.get("CREATOR_ROLE_IDS"):
+            if not await get_role_grants(self.bot, interaction.guild.id, CREATOR_GRANT):
                 await interaction.response.send_message("❌ No Creator roles are set up. An admin must use `/config addcreatorrole`.", ephemeral=True)
             else:
                 await interaction.response.send_message("❌ You do not have a required Creator Role to use this command.", ephemeral=True)
@@ -97,20 +92,17 @@ class CreatorCog(commands.Cog):
     @app_commands.command(name="bumpitem", description="[Supreme Members] Move one of your items to the top of the shop.")
     async def bump_item(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        perks = get_member_perks(interaction.user)
+        perks = await get_member_perks(self.bot, interaction.user)
         
         # Check for Supreme rank
         if perks['flair'] != "👑":
             await interaction.followup.send("❌ This command is only available to **Supreme Members** (Level 100+).", ephemeral=True)
             return
             
-        # Check cooldown
-        player_data = await self.bot.db.get_user_data(interaction.user.id, interaction.guild.id)
-        last_bump = player_data.get('last_bump_timestamp', 0)
-        cooldown = 604800 # 7 days in seconds
+        # Check cooldown (7 days, see cooldowns.py)
+        time_left = await self.bot.db.cooldowns.remaining("bump", interaction.user.id, interaction.guild.id)
         
-        if time.time() - last_bump < cooldown:
-            time_left = cooldown - (time.time() - last_bump)
+        if time_left:
             await interaction.followup.send(f"❌ Your item bump is on cooldown. Please wait **{time.strftime('%d days, %H hours, %M minutes', time.gmtime(time_left))}**.", ephemeral=True)
             return
 
@@ -145,7 +137,7 @@ class CreatorCog(commands.Cog):
                 del self.pending_uploads[message.author.id]
                 await message.reply("✅ **Upload Complete!** Your item has been added.")
 
-                guild_settings = get_guild_settings(message.guild.id)
+                guild_settings = await get_guild_settings(self.bot, message.guild.id)
                 log_channel_id = guild_settings.get("NEW_ITEM_LOG_CHANNEL_ID")
                 if log_channel_id:
                     log_channel = self.bot.get_channel(log_channel_id)
@@ -3,16 +3,38 @@ from discord.ext import commands
 from discord import app_commands
 import time
 import random
-from .channel_config import get_guild_setting, get_member_perks, PERKS # Updated import
+import levels
+from dataclasses import dataclass
+from bulk_jobs import with_rate_limit_retry
+from .channel_config import get_guild_settings, get_member_perks, PERKS
+
+LEADERBOARD_PAGE_SIZE = 10
+LEADERBOARD_SNAPSHOT_PAGES = 5  # Pages kept rendered per guild; deeper ones are queried each time
+LEADERBOARD_TTL = 60            # Seconds a snapshot is served at most (member names, flairs and the member count can drift)
+RANK_EMOJIS = {1: "🥇", 2: "🥈", 3: "🥉"}
+
+@dataclass(slots=True)
+class LeaderboardSnapshot:
+    lines: list        # Rendered rows for the top LEADERBOARD_SNAPSHOT_PAGES pages, best first
+    total_users: int
+    version: int       # db.rank_watch version it was built at; a different one means the top changed
+    built_at: float    # time.monotonic()
 
 class EconomyCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        bot.level_ups.register(self.handle_level_up)
+        self._leaderboards = {}  # {guild_id: LeaderboardSnapshot}
+        self.leaderboard_stats = {"served": 0, "rebuilds": 0, "changed": 0, "expired": 0}
 
     @commands.Cog.listener()
     async def on_ready(self):
         print(f'{self.__class__.__name__} cog has been loaded.')
 
+    async def cog_unload(self):
+        # Don't leave chat rewards sitting in the write-behind buffer
+        await self.bot.db.flush_accruals()
+
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         if message.interaction_metadata is not None or message.author.bot or not message.guild:
@@ -23,109 +45,118 @@ class EconomyCog(commands.Cog):
         current_time = time.time()
         
         try:
-            player = await self.bot.db.get_user_data(user_id, guild_id)
+            # Cooldowns are checked in memory: most messages stop here without touching the database
+            cooldowns = self.bot.db.cooldowns
+            coin_ready = not await cooldowns.remaining("coin", user_id, guild_id, current_time)
+            xp_ready = not await cooldowns.remaining("xp", user_id, guild_id, current_time)
+            if not (coin_ready or xp_ready):
+                return
             # Updated: await the async function and pass self.bot
             perks = await get_member_perks(self.bot, message.author)
-            data_to_update = {}
+            # Rewards are buffered and written in batches by the database manager
+            increments, timestamps = {}, {}
+            leveled_up = False
             
-            if current_time - player['last_coin_claim'] > 25:
+            if coin_ready:
                 base_coins = random.randint(5, 20)
                 coins_earned = int(base_coins * perks["multiplier"])
-                data_to_update['balance'] = player['balance'] + coins_earned
-                data_to_update['last_coin_claim'] = current_time
+                increments['balance'] = coins_earned
+                timestamps['last_coin_claim'] = current_time
 
-            if current_time - player['last_xp_claim'] > 20:
+            if xp_ready:
+                player_xp, player_level = await self.bot.db.get_user_fields(user_id, guild_id, "xp", "level")
                 base_xp = random.randint(10, 25)
                 xp_earned = int(base_xp * perks["multiplier"])
-                new_xp = player['xp'] + xp_earned
-                
+                player = {"level": player_level, "xp": player_xp}
+                leveled_up = levels.apply_xp(player, xp_earned) > 0
                 current_level = player['level']
-                xp_needed = 100 + (current_level * 50)
-                
-                leveled_up = False
-                while new_xp >= xp_needed:
-                    current_level += 1
-                    new_xp -= xp_needed
-                    xp_needed = 100 + (current_level * 50)
-                    leveled_up = True
                 
-                if leveled_up:
-                    data_to_update['xp'] = new_xp
-                    data_to_update['level'] = current_level
-
-                    # Updated: Fetch specific setting asynchronously
-                    level_up_channel_id = await get_guild_setting(self.bot, message.guild.id, "LEVEL_UP_CHANNEL_ID")
-                    
-                    target_channel = None
-                    if level_up_channel_id:
-                        target_channel = self.bot.get_channel(int(level_up_channel_id))
-                    
-                    if not target_channel:
-                        target_channel = message.channel
-                        
-                    await target_channel.send(f"🎉 Congratulations {message.author.mention}, you have reached **Level {current_level}**!")
-                    
-                    # --- UPDATED: Fetch Role IDs from DB ---
-                    elite_id = await get_guild_setting(self.bot, message.guild.id, "ELITE_ROLE_ID")
-                    master_id = await get_guild_setting(self.bot, message.guild.id, "MASTER_ROLE_ID")
-                    supreme_id = await get_guild_setting(self.bot, message.guild.id, "SUPREME_ROLE_ID")
-
-                    roles_to_assign = {
-                        50: (elite_id, "elite"),
-                        75: (master_id, "master"),
-                        100: (supreme_id, "supreme")
-                    }
-                    
-                    for level_req, (role_id, perk_key) in roles_to_assign.items():
-                        if current_level >= level_req and role_id:
-                            role = message.guild.get_role(int(role_id))
-                            if role and role not in message.author.roles:
-                                try:
-                                    await message.author.add_roles(role, reason=f"Reached Level {level_req}")
-                                    
-                                    # --- Send Detailed DM ---
-                                    perk_info = PERKS[perk_key]
-                                    embed = discord.Embed(
-                                        title="🎉 Rank Up!",
-                                        description=f"Congratulations! You've been promoted to **{role.name}** in **{message.guild.name}** for reaching level {level_req}!",
-                                        color=discord.Color.brand_green()
-                                    )
-                                    embed.add_field(name="💰 Economy Boost", value=f"You now earn **{perk_info['multiplier']:.1f}x** Coins & XP!", inline=False)
-                                    embed.add_field(name="🎁 Daily Bonus", value=f"You get an extra **{perk_info['daily_bonus']:,}** coins from `/daily`.", inline=False)
-                                    
-                                    if perk_info['shop_discount'] > 0:
-                                        embed.add_field(name="🛍️ Shop Discount", value=f"You now get a **{perk_info['shop_discount']:.0%}** discount on all shop items!", inline=False)
-                                    
-                                    if perk_key == "supreme":
-                                         embed.add_field(name="🚀 Supreme Perk", value="You can now use the `/bumpitem` command once per week to promote your shop items!", inline=False)
-
-                                    await message.author.send(embed=embed)
-
-                                except (discord.Forbidden, discord.HTTPException):
-                                    print(f"Failed to assign rank role or DM {message.author.name}")
-                else:
-                    data_to_update['xp'] = new_xp
-                
-                data_to_update['last_xp_claim'] = current_time
+                # Accrued as total XP: the level follows when it lands, so other XP sources add up correctly
+                increments['xp'] = xp_earned
+                timestamps['last_xp_claim'] = current_time
+
+            if increments or timestamps:
+                self.bot.db.accrue_user_data(user_id, guild_id, increments, timestamps)
 
-            if data_to_update:
-                await self.bot.db.update_user_data(user_id, guild_id, data_to_update)
+            if leveled_up:
+                # Announcement, rank roles and DM happen on the level-up queue (handle_level_up)
+                self.bot.level_ups.submit(guild_id, user_id, current_level, message.channel.id)
         except Exception as e:
             print(f"Error in on_message economy processing for {message.author.name}: {e}")
 
+    async def handle_level_up(self, event):
+        """Runs on a bot.level_ups worker: announces the level and grants every rank role now due in one member edit."""
+        guild = self.bot.get_guild(event.guild_id)
+        if guild is None: return
+        member = guild.get_member(event.user_id)
+        # One cached settings snapshot covers the announcement channel and the rank roles
+        settings = await get_guild_settings(self.bot, guild.id)
+
+        level_up_channel_id = settings.get("LEVEL_UP_CHANNEL_ID")
+        target_channel = self.bot.get_channel(int(level_up_channel_id)) if level_up_channel_id else None
+        if not target_channel and event.channel_id:
+            target_channel = self.bot.get_channel(event.channel_id)
+        if target_channel:
+            mention = member.mention if member else f"<@{event.user_id}>"
+            try:
+                await with_rate_limit_retry(target_channel.send, f"🎉 Congratulations {mention}, you have reached **Level {event.level}**!")
+            except discord.HTTPException as e:
+                print(f"Failed to announce level {event.level} for user {event.user_id}: {e}")
+        if member is None: return
+
+        roles_to_assign = {
+            50: (settings.get("ELITE_ROLE_ID"), "elite"),
+            75: (settings.get("MASTER_ROLE_ID"), "master"),
+            100: (settings.get("SUPREME_ROLE_ID"), "supreme")
+        }
+        new_ranks = []
+        for level_req, (role_id, perk_key) in roles_to_assign.items():
+            if event.level >= level_req and role_id:
+                role = guild.get_role(int(role_id))
+                if role and role not in member.roles:
+                    new_ranks.append((level_req, role, perk_key))
+        if not new_ranks: return
+
+        level_req, role, perk_key = new_ranks[-1]  # The highest rank reached gets the DM
+        try:
+            await with_rate_limit_retry(member.add_roles, *(rank_role for _, rank_role, _ in new_ranks), reason=f"Reached Level {level_req}")
+        except discord.HTTPException:
+            print(f"Failed to assign rank role to {member.name}")
+            return
+
+        # --- Send Detailed DM ---
+        perk_info = PERKS[perk_key]
+        embed = discord.Embed(
+            title="🎉 Rank Up!",
+            description=f"Congratulations! You've been promoted to **{role.name}** in **{guild.name}** for reaching level {level_req}!",
+            color=discord.Color.brand_green()
+        )
+        embed.add_field(name="💰 Economy Boost", value=f"You now earn **{perk_info['multiplier']:.1f}x** Coins & XP!", inline=False)
+        embed.add_field(name="🎁 Daily Bonus", value=f"You get an extra **{perk_info['daily_bonus']:,}** coins from `/daily`.", inline=False)
+
+        if perk_info['shop_discount'] > 0:
+            embed.add_field(name="🛍️ Shop Discount", value=f"You now get a **{perk_info['shop_discount']:.0%}** discount on all shop items!", inline=False)
+
+        if perk_key == "supreme":
+            embed.add_field(name="🚀 Supreme Perk", value="You can now use the `/bumpitem` command once per week to promote your shop items!", inline=False)
+
+        try:
+            await member.send(embed=embed)
+        except discord.HTTPException:
+            print(f"Failed to DM {member.name} about their rank up")
+
     @app_commands.command(name="balance", description="Check your current coin balance.")
     async def balance(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=False)
-        player = await self.bot.db.get_user_data(interaction.user.id, interaction.guild.id)
-        embed = discord.Embed(title="💰 Your Balance", description=f"You currently have **{player['balance']:,}** coins.", color=discord.Color.gold())
+        balance = await self.bot.db.get_user_fields(interaction.user.id, interaction.guild.id, "balance")
+        embed = discord.Embed(title="💰 Your Balance", description=f"You currently have **{balance:,}** coins.", color=discord.Color.gold())
         await interaction.followup.send(embed=embed)
 
     @app_commands.command(name="lvl", description="Check your current level and XP.")
     async def lvl(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=False)
-        player = await self.bot.db.get_user_data(interaction.user.id, interaction.guild.id)
-        level, xp = player['level'], player['xp']
-        xp_needed = 100 + (level * 50)
+        level, xp = await self.bot.db.get_user_fields(interaction.user.id, interaction.guild.id, "level", "xp")
+        xp_needed = levels.xp_to_next(level)
         embed = discord.Embed(title="📈 Your Level", color=discord.Color.blue())
         embed.add_field(name="Level", value=f"**{level}**", inline=True)
         embed.add_field(name="XP", value=f"**{xp:,} / {xp_needed:,}**", inline=True)
@@ -145,7 +176,7 @@ class EconomyCog(commands.Cog):
         perks = await get_member_perks(self.bot, target_user)
         
         level, xp, balance, streak = player['level'], player['xp'], player['balance'], player['daily_streak']
-        xp_needed = 100 + (level * 50)
+        xp_needed = levels.xp_to_next(level)
         
         embed = discord.Embed(title=f"{perks['flair']} Profile for {target_user.display_name}", color=target_user.color)
         embed.set_thumbnail(url=target_user.display_avatar.url)
@@ -171,19 +202,15 @@ class EconomyCog(commands.Cog):
         if recipient.id == interaction.user.id or recipient.bot:
             await interaction.followup.send("❌ You cannot send coins to yourself or a bot.", ephemeral=True); return
 
-        sender_data = await self.bot.db.get_user_data(interaction.user.id, interaction.guild.id)
         # Updated: await the async function
         sender_perks = await get_member_perks(self.bot, interaction.user)
         
         if amount > sender_perks['pay_limit']:
             await interaction.followup.send(f"❌ Your rank's pay limit is **{sender_perks['pay_limit']:,}** coins.", ephemeral=True); return
-        if sender_data['balance'] < amount:
-            await interaction.followup.send(f"❌ You don't have enough coins!", ephemeral=True); return
 
-        recipient_data = await self.bot.db.get_user_data(recipient.id, interaction.guild.id)
-        
-        await self.bot.db.update_user_data(interaction.user.id, interaction.guild.id, {"balance": sender_data['balance'] - amount})
-        await self.bot.db.update_user_data(recipient.id, interaction.guild.id, {"balance": recipient_data['balance'] + amount})
+        # Balance check and both updates happen in one transaction
+        if await self.bot.db.transfer(interaction.user.id, recipient.id, interaction.guild.id, amount) is None:
+            await interaction.followup.send(f"❌ You don't have enough coins!", ephemeral=True); return
 
         embed = discord.Embed(title="💸 Transaction Successful", description=f"{interaction.user.mention} sent **{amount:,}** coins to {recipient.mention}.", color=discord.Color.green())
         await interaction.followup.send(embed=embed, ephemeral=False)
@@ -200,31 +227,90 @@ class EconomyCog(commands.Cog):
         embed.set_footer(text="Increase your rank by leveling up to improve your rewards!")
         await interaction.followup.send(embed=embed)
     
+    # --- LEADERBOARD SNAPSHOTS ---
+    # The first pages are rendered once and served from memory until db.rank_watch reports a level/xp change
+    # that can reach them, or LEADERBOARD_TTL runs out.
+    async def _leaderboard_line(self, guild: discord.Guild, rank: int, user_data: dict) -> str:
+        member = guild.get_member(user_data['user_id'])
+        if member:
+            perks = await get_member_perks(self.bot, member)
+            user_name = f"{perks['flair']} {member.mention}"
+        else:
+            user_name = f"*User Left (ID: {user_data['user_id']})*"
+        return f"{RANK_EMOJIS.get(rank, f'**{rank}.**')} {user_name} - **Level {user_data['level']}**"
+
+    async def _leaderboard_snapshot(self, guild: discord.Guild) -> LeaderboardSnapshot:
+        watch = self.bot.db.rank_watch
+        snapshot = self._leaderboards.get(guild.id)
+        if snapshot:
+            if snapshot.version != watch.version(guild.id):
+                self.leaderboard_stats["changed"] += 1
+            elif time.monotonic() - snapshot.built_at > LEADERBOARD_TTL:
+                self.leaderboard_stats["expired"] += 1
+            else:
+                self.leaderboard_stats["served"] += 1
+                return snapshot
+        # Watch before reading, so a change landing while this builds makes it stale instead of going unnoticed
+        version = watch.watch(guild.id)
+        total_users = await self.bot.db.count_ranked_users(guild.id)
+        rows = await self.bot.db.get_leaderboard(guild.id, limit=LEADERBOARD_SNAPSHOT_PAGES * LEADERBOARD_PAGE_SIZE)
+        watch.narrow(guild.id, version, rows)
+        lines = [await self._leaderboard_line(guild, rank, user_data) for rank, user_data in enumerate(rows, 1)]
+        snapshot = LeaderboardSnapshot(lines, total_users, version, time.monotonic())
+        self._leaderboards[guild.id] = snapshot
+        self.leaderboard_stats["rebuilds"] += 1
+        return snapshot
+
+    def get_leaderboard_stats(self) -> dict:
+        served = self.leaderboard_stats["served"] + self.leaderboard_stats["rebuilds"]
+        return dict(self.leaderboard_stats, guilds=len(self._leaderboards),
+                    hit_rate=self.leaderboard_stats["served"] / served if served else 0.0)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self._leaderboards.pop(guild.id, None)
+
     @app_commands.command(name="leaderboard", description="View the server's top members by level.")
-    async def leaderboard(self, interaction: discord.Interaction):
+    @app_commands.describe(page="Which page of the leaderboard to show (10 members per page).")
+    async def leaderboard(self, interaction: discord.Interaction, page: app_commands.Range[int, 1] = 1):
         await interaction.response.defer(ephemeral=False)
-        top_users = await self.bot.db.get_leaderboard(interaction.guild.id, limit=10)
+        snapshot = await self._leaderboard_snapshot(interaction.guild)
+        total_users = snapshot.total_users
 
-        if not top_users:
+        if not total_users:
             await interaction.followup.send("There are no users to rank on the leaderboard yet!"); return
 
+        total_pages = (total_users + LEADERBOARD_PAGE_SIZE - 1) // LEADERBOARD_PAGE_SIZE
+        page = min(page, total_pages)
+        offset = (page - 1) * LEADERBOARD_PAGE_SIZE
+        if page <= LEADERBOARD_SNAPSHOT_PAGES:
+            lines = snapshot.lines[offset:offset + LEADERBOARD_PAGE_SIZE]
+        else:
+            top_users = await self.bot.db.get_leaderboard(interaction.guild.id, limit=LEADERBOARD_PAGE_SIZE, offset=offset)
+            lines = [await self._leaderboard_line(interaction.guild, rank, user_data) for rank, user_data in enumerate(top_users, offset + 1)]
+
         embed = discord.Embed(title=f"🏆 Leaderboard for {interaction.guild.name}", color=discord.Color.gold())
-        leaderboard_text = ""
-        rank_emojis = {1: "🥇", 2: "🥈", 3: "🥉"}
-
-        for i, user_data in enumerate(top_users, 1):
-            member = interaction.guild.get_member(user_data['user_id'])
-            if member:
-                # Updated: await the async function
-                perks = await get_member_perks(self.bot, member)
-                user_name = f"{perks['flair']} {member.mention}"
-            else:
-                user_name = f"*User Left (ID: {user_data['user_id']})*"
-            
-            rank = rank_emojis.get(i, f"**{i}.**")
-            leaderboard_text += f"{rank} {user_name} - **Level {user_data['level']}**\n"
+        embed.description = "".join(f"{line}\n" for line in lines)
+        embed.set_footer(text=f"Page {page}/{total_pages} • {total_users:,} ranked members • Use /rank to find your position")
+        await interaction.followup.send(embed=embed)
 
-        embed.description = leaderboard_text
+    @app_commands.command(name="rank", description="See your (or another user's) position on the leaderboard.")
+    @app_commands.describe(user="The user whose rank you want to see (optional).")
+    async def rank(self, interaction: discord.Interaction, user: discord.Member = None):
+        target_user = user or interaction.user
+        await interaction.response.defer(ephemeral=False)
+
+        standing = await self.bot.db.get_user_rank(target_user.id, interaction.guild.id)
+        if not standing:
+            await interaction.followup.send(f"❌ {target_user.display_name} isn't on the leaderboard yet. Send a message to get started!"); return
+
+        page = (standing['rank'] - 1) // LEADERBOARD_PAGE_SIZE + 1
+        embed = discord.Embed(title=f"🏅 Rank for {target_user.display_name}", color=discord.Color.gold())
+        embed.set_thumbnail(url=target_user.display_avatar.url)
+        embed.add_field(name="Position", value=f"**#{standing['rank']:,}** of {standing['out_of']:,}", inline=True)
+        embed.add_field(name="📈 Level", value=f"**{standing['level']}**", inline=True)
+        embed.add_field(name="📊 Total XP", value=f"**{standing['total_xp']:,}**", inline=True)
+        embed.set_footer(text=f"Find them on /leaderboard page {page}")
         await interaction.followup.send(embed=embed)
 
 async def setup(bot: commands.Bot):
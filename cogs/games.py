@@ -11,12 +11,13 @@ import time
 
 # --- Blackjack Game View ---
 class BlackjackView(discord.ui.View):
-    def __init__(self, bot, author, player_data, bet):
+    def __init__(self, bot, author, balance, bet):
         super().__init__(timeout=120)
         self.bot = bot
         self.author = author
-        self.player_data = player_data
+        self.balance = balance  # Balance after the bet was taken
         self.bet = bet
+        self.finished = False
         self.deck = [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11] * 4
         random.shuffle(self.deck)
         self.player_hand = [self.deck.pop(), self.deck.pop()]
@@ -45,30 +46,39 @@ class BlackjackView(discord.ui.View):
         embed.set_footer(text="Tip: Try to get closer to 21 than the dealer without going over!")
         await interaction.edit_original_response(embed=embed, view=self)
 
+    async def on_timeout(self):
+        # The bet was taken when the game started, so hand it back if the player walked away
+        if not self.finished:
+            self.finished = True
+            await self.bot.db.credit(self.author.id, self.author.guild.id, self.bet)
+
     async def handle_game_end(self, interaction, result):
+        if self.finished: return
+        self.finished = True
         dealer_score = self.calculate_hand_value(self.dealer_hand)
         
         file = None
+        # The bet was already taken, so payouts include the stake
         if result == "win" or result == "blackjack":
             # file = discord.File("cogs/win.gif", filename="win.gif") # Uncomment if you have the file
             if result == "win":
-                new_balance = self.player_data['balance'] + self.bet
+                payout = self.bet * 2
                 title = "🎉 You Won! 🎉"
                 desc = f"You won **{self.bet*2:,}** coins!"
             else: # Blackjack
-                new_balance = self.player_data['balance'] + int(self.bet * 1.5)
+                payout = self.bet + int(self.bet * 1.5)
                 title = "✨ BLACKJACK! ✨"
                 desc = f"You won **{int(self.bet * 2.5):,}** coins!"
         elif result == "push":
-            new_balance = self.player_data['balance']
+            payout = self.bet
             title = "🤝 Push 🤝"
             desc = "It's a tie! Your bet has been returned."
         else: # loss
-            new_balance = self.player_data['balance'] - self.bet
+            payout = 0
             title = "💔 You Lost 💔"
             desc = f"The dealer won. You lost **{self.bet:,}** coins."
             
-        await self.bot.db.update_user_data(self.author.id, self.author.guild.id, {"balance": new_balance})
+        new_balance = await self.bot.db.credit(self.author.id, self.author.guild.id, payout) if payout else self.balance
         
         embed = discord.Embed(title=title, description=desc, color=discord.Color.blue())
         embed.add_field(name="Your Hand", value=f"{' '.join(map(str, self.player_hand))} (**{self.calculate_hand_value(self.player_hand)}**)", inline=True)
@@ -111,14 +121,16 @@ class GamesCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
-    async def check_player_can_bet(self, interaction: discord.Interaction, player_data: dict, bet: int) -> bool:
+    async def place_bet(self, interaction: discord.Interaction, bet: int):
+        """Takes the bet up front. Returns the balance left afterwards, or None if the bet was refused."""
         if bet <= 0:
             await interaction.followup.send("❌ You must bet a positive amount of coins.", ephemeral=True)
-            return False
-        if player_data['balance'] < bet:
-            await interaction.followup.send(f"❌ You don't have enough coins! Your balance is **{player_data['balance']:,}**.", ephemeral=True)
-            return False
-        return True
+            return None
+        balance = await self.bot.db.debit(interaction.user.id, interaction.guild.id, bet)
+        if balance is None:
+            current = await self.bot.db.get_user_fields(interaction.user.id, interaction.guild.id, "balance")
+            await interaction.followup.send(f"❌ You don't have enough coins! Your balance is **{current:,}**.", ephemeral=True)
+        return balance
 
     @commands.Cog.listener()
     async def on_ready(self):
@@ -129,8 +141,8 @@ class GamesCog(commands.Cog):
     @app_commands.command(name="slots", description="Play the slot machine!")
     async def slots(self, interaction: discord.Interaction, bet: int):
         await interaction.response.defer()
-        player = await self.bot.db.get_user_data(interaction.user.id, interaction.guild.id)
-        if not await self.check_player_can_bet(interaction, player, bet): return
+        balance = await self.place_bet(interaction, bet)
+        if balance is None: return
 
         emojis = ["🍒", "🍊", "🔔", "💎", "💰"] 
         reels = [random.choice(emojis) for _ in range(3)]
@@ -141,8 +153,7 @@ class GamesCog(commands.Cog):
         elif reels[0] == reels[1] or reels[1] == reels[2]:
             payout = int(bet * 1.5)
             
-        new_balance = player['balance'] - bet + payout
-        await self.bot.db.update_user_data(interaction.user.id, interaction.guild.id, {"balance": new_balance})
+        new_balance = await self.bot.db.credit(interaction.user.id, interaction.guild.id, payout) if payout > 0 else balance
         
         embed = discord.Embed(title="🎰 Slot Machine", description=f"**[ {' | '.join(reels)} ]**", color=discord.Color.gold())
         if payout > 0: embed.add_field(name="WINNER!", value=f"You won **{payout:,}** coins!")
@@ -154,14 +165,12 @@ class GamesCog(commands.Cog):
     @app_commands.choices(choice=[app_commands.Choice(name="Heads", value="heads"), app_commands.Choice(name="Tails", value="tails")])
     async def coinflip(self, interaction: discord.Interaction, bet: int, choice: str):
         await interaction.response.defer()
-        player = await self.bot.db.get_user_data(interaction.user.id, interaction.guild.id)
-        if not await self.check_player_can_bet(interaction, player, bet): return
+        if await self.place_bet(interaction, bet) is None: return
 
         outcome = random.choice(["heads", "tails"])
         won = (choice.lower() == outcome)
-        new_balance = player['balance'] + bet if won else player['balance'] - bet
-        
-        await self.bot.db.update_user_data(interaction.user.id, interaction.guild.id, {"balance": new_balance})
+        if won:
+            await self.bot.db.credit(interaction.user.id, interaction.guild.id, bet * 2)
         embed = discord.Embed(title="🪙 Coin Flip", description=f"The coin landed on **{outcome.title()}**!", color=discord.Color.green() if won else discord.Color.red())
         embed.add_field(name="Result", value=f"You {'won' if won else 'lost'} **{bet if won else bet:,}** coins.")
         await interaction.followup.send(embed=embed)
@@ -169,9 +178,9 @@ class GamesCog(commands.Cog):
     @app_commands.command(name="blackjack", description="Play Blackjack.")
     async def blackjack(self, interaction: discord.Interaction, bet: int):
         await interaction.response.defer()
-        player = await self.bot.db.get_user_data(interaction.user.id, interaction.guild.id)
-        if not await self.check_player_can_bet(interaction, player, bet): return
-        view = BlackjackView(self.bot, interaction.user, player, bet)
+        balance = await self.place_bet(interaction, bet)
+        if balance is None: return
+        view = BlackjackView(self.bot, interaction.user, balance, bet)
         player_score = view.calculate_hand_value(view.player_hand)
         embed = discord.Embed(title="🃏 Blackjack", color=discord.Color.dark_green())
         embed.set_author(name=f"{interaction.user.display_name}'s game")
@@ -187,11 +196,10 @@ class GamesCog(commands.Cog):
     @app_commands.describe(bet="Coins to bet", auto_cashout="Target multiplier (e.g. 2.0)")
     async def crash(self, interaction: discord.Interaction, bet: int, auto_cashout: float):
         await interaction.response.defer()
-        player = await self.bot.db.get_user_data(interaction.user.id, interaction.guild.id)
-        
-        if not await self.check_player_can_bet(interaction, player, bet): return
         if auto_cashout < 1.1:
             return await interaction.followup.send("❌ Auto-cashout must be at least 1.1x", ephemeral=True)
+        balance = await self.place_bet(interaction, bet)
+        if balance is None: return
 
         # Crash Algorithm: Weighted random
         # 3% chance of instant crash (1.0x)
@@ -229,20 +237,19 @@ class GamesCog(commands.Cog):
         # Final Result
         if won:
             profit = int(bet * auto_cashout) - bet
-            new_balance = player['balance'] + profit
+            new_balance = await self.bot.db.credit(interaction.user.id, interaction.guild.id, bet + profit)
             embed.title = "✅ SUCESSFUL CASHOUT"
             embed.description = f"Crashed at **{crash_point:.2f}x**\nYou cashed out at **{auto_cashout:.2f}x**"
             embed.color = discord.Color.green()
             embed.add_field(name="Profit", value=f"+{profit:,} coins", inline=False)
         else:
-            new_balance = player['balance'] - bet
+            new_balance = balance
             embed.title = "💥 CRASHED!"
             embed.description = f"Crashed at **{crash_point:.2f}x**\nYou needed **{auto_cashout:.2f}x**"
             embed.color = discord.Color.red()
             embed.add_field(name="Loss", value=f"-{bet:,} coins", inline=False)
 
         embed.set_footer(text=f"New Balance: {new_balance:,}")
-        await self.bot.db.update_user_data(interaction.user.id, interaction.guild.id, {"balance": new_balance})
         await msg.edit(embed=embed)
 
     # --- NEW GAME 2: TRIVIA ---
@@ -294,8 +301,7 @@ class GamesCog(commands.Cog):
             
             if msg.content.upper() == correct_letter:
                 reward = 250
-                winner_data = await self.bot.db.get_user_data(msg.author.id, interaction.guild.id)
-                await self.bot.db.update_user_data(msg.author.id, interaction.guild.id, {"balance": winner_data['balance'] + reward})
+                await self.bot.db.credit(msg.author.id, interaction.guild.id, reward)
                 
                 await msg.reply(f"🎉 **Correct!** {msg.author.mention} won **{reward}** coins! The answer was **{correct_answer}**.")
             else:
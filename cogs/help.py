@@ -25,7 +25,8 @@ class HelpSelect(ui.Select):
                 "`/daily` - Claim daily rewards\n"
                 "`/streak` - Check your daily streak luck\n"
                 "`/pay [user] [amount]` - Send coins to a friend\n"
-                "`/leaderboard` - See the top players\n"
+                "`/leaderboard [page]` - See the top players\n"
+                "`/rank [user]` - See your leaderboard position\n"
                 "`/lvl` - Check your level and XP\n"
                 "`/profile [user]` - View full profile stats"
             )
@@ -2,7 +2,6 @@ import discord
 from discord.ext import commands
 from discord import app_commands, ui
 from .channel_config import get_member_perks, get_guild_setting
-import math
 import time
 import datetime
 
@@ -20,34 +19,19 @@ class PurchaseView(ui.View):
     async def buy_button(self, interaction: discord.Interaction, button: ui.Button):
         await interaction.response.defer(thinking=True, ephemeral=True)
         try:
-            # 1. Validate Purchase
+            # 1. Process Transaction
+            # Debit, creator commission and the sale count commit together (or not at all)
             item_id = self.item['item_id']
-            # Re-fetch item to ensure it still exists
-            db_item = await self.bot.db.get_item_details(item_id, interaction.guild.id)
-            player = await self.bot.db.get_user_data(interaction.user.id, interaction.guild.id)
+            db_item, balance = await self.bot.db.purchase_item(interaction.user.id, interaction.guild.id, item_id, self.final_price, COMMISSION_RATE)
 
             if not db_item:
                 return await interaction.followup.send("❌ This item seems to have been removed from the shop.", ephemeral=True)
-            if player['balance'] < self.final_price:
+            if balance is None:
                 return await interaction.followup.send(f"❌ You don't have enough coins! You need **{self.final_price:,}** coins.", ephemeral=True)
 
-            # 2. Process Transaction
             original_price = db_item['price']
-            commission_amount = int(original_price * COMMISSION_RATE)
             
-            # Buyer pays
-            new_balance_buyer = player['balance'] - self.final_price
-            await self.bot.db.update_user_data(interaction.user.id, interaction.guild.id, {"balance": new_balance_buyer})
-            
-            # Creator gets paid
-            creator_data = await self.bot.db.get_user_data(db_item['creator_id'], interaction.guild.id)
-            new_balance_creator = creator_data['balance'] + commission_amount
-            await self.bot.db.update_user_data(db_item['creator_id'], interaction.guild.id, {"balance": new_balance_creator})
-            
-            # Update stats
-            await self.bot.db.increment_purchase_count(item_id, interaction.guild.id)
-            
-            # 3. Generate Premium Receipt
+            # 2. Generate Premium Receipt
             date_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
             saved_amount = int(original_price - self.final_price)
             
@@ -67,7 +51,7 @@ class PurchaseView(ui.View):
                 "```"
             )
             
-            # 4. Send DM
+            # 3. Send DM
             dm_embed = discord.Embed(title="✅ Purchase Successful!", description=receipt_text, color=discord.Color.brand_green())
             dm_embed.add_field(name="📥 Download Link", value=f"**[Click Here to Download]({db_item['product_link']})**")
             dm_embed.set_footer(text="Thank you for your purchase!")
@@ -93,7 +77,7 @@ class CategorySelect(ui.Select):
     def __init__(self, categories):
         # Limit to 25 categories due to Discord limits
         options = [discord.SelectOption(label="All Categories", value="all", emoji="🌐")]
-        for cat in sorted(list(categories))[:24]:
+        for cat in list(categories)[:24]:
             options.append(discord.SelectOption(label=cat, value=cat))
             
         super().__init__(placeholder="📂 Filter by Category...", min_values=1, max_values=1, options=options, row=3)
@@ -104,31 +88,50 @@ class CategorySelect(ui.Select):
         await interaction.response.defer()
         
         if selected == "all":
-            view.current_items = await view.bot.db.get_all_items(view.guild_id)
             view.current_tab = "all_items"
+            view.category = None
         else:
-            all_items = await view.bot.db.get_all_items(view.guild_id)
-            view.current_items = [item for item in all_items if item['category'] == selected]
             view.current_tab = "filtered"
+            view.category = selected
             
-        view.selected_index = 0
+        await view.load_first_page()
         await view.update_view(interaction)
 
 
+# Which catalog ordering each tab pages through
+TAB_ORDERS = {"new": "newest", "all_items": "name", "filtered": "name"}
+
 class ShopView(ui.View):
-    def __init__(self, bot: commands.Bot, author_id: int, guild_id: int, categories: set):
+    def __init__(self, bot: commands.Bot, author_id: int, guild_id: int, categories):
         super().__init__(timeout=300)
         self.bot = bot
         self.author_id = author_id
         self.guild_id = guild_id
         self.current_tab = "featured"
+        self.category = None
+        # Only the window on screen is held in memory; neighbours are fetched by keyset cursor
         self.current_items = []
-        self.selected_index = 0
+        self.page_offset = 0     # Position of current_items[0] in the whole list
+        self.total_items = 0
+        self.selected_index = 0  # Index into current_items
         self.items_in_view = 10
         
         if categories:
             self.add_item(CategorySelect(categories))
 
+    async def fetch_page(self, after=None, before=None):
+        return await self.bot.db.get_items_page(self.guild_id, TAB_ORDERS[self.current_tab], after=after, before=before, limit=self.items_in_view, category=self.category)
+
+    async def load_first_page(self):
+        self.page_offset = 0
+        self.selected_index = 0
+        if self.current_tab in TAB_ORDERS:
+            self.current_items = await self.fetch_page()
+            self.total_items = await self.bot.db.count_items(self.guild_id, self.category)
+        else:
+            self.current_items = []
+            self.total_items = 0
+
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         if self.author_id and interaction.user.id != self.author_id:
             await interaction.response.send_message("❌ This is not your shop session.", ephemeral=True)
@@ -162,13 +165,8 @@ class ShopView(ui.View):
             content_description = f"## {titles.get(self.current_tab, 'Items')}\n\n"
             
             if self.current_items:
-                start = max(0, self.selected_index - math.floor(self.items_in_view / 2))
-                end = min(len(self.current_items), start + self.items_in_view)
-                start = max(0, end - self.items_in_view)
-                
                 list_str = ""
-                for i in range(start, end):
-                    item = self.current_items[i]
+                for i, item in enumerate(self.current_items):
                     prefix = "➤" if i == self.selected_index else "•"
                     
                     badges = ""
@@ -178,11 +176,12 @@ class ShopView(ui.View):
                     list_str += f"{prefix} **{item['item_name']}** {badges}• `{item.get('price', 0):,} 🪙`\n"
                     
                 content_description += list_str
-                embed.set_footer(text=f"Showing item {self.selected_index + 1} of {len(self.current_items)} | Use arrows to scroll")
+                position = self.page_offset + self.selected_index
+                embed.set_footer(text=f"Showing item {position + 1} of {self.total_items} | Use arrows to scroll")
                 
-                if len(self.current_items) > 1:
-                    self.scroll_up_button.disabled = self.selected_index == 0
-                    self.scroll_down_button.disabled = self.selected_index == len(self.current_items) - 1
+                if self.total_items > 1:
+                    self.scroll_up_button.disabled = position == 0
+                    self.scroll_down_button.disabled = position >= self.total_items - 1
                     self.add_item(self.scroll_up_button)
                     self.add_item(self.scroll_down_button)
                 self.add_item(self.select_item_button)
@@ -210,14 +209,8 @@ class ShopView(ui.View):
 
     async def handle_tab_switch(self, interaction: discord.Interaction, tab_name: str):
         self.current_tab = tab_name
-        self.selected_index = 0
-        
-        if self.current_tab == "new": 
-            self.current_items = await self.bot.db.get_new_arrivals(self.guild_id, limit=None)
-        elif self.current_tab == "all_items": 
-            self.current_items = await self.bot.db.get_all_items(self.guild_id)
-        else: 
-            self.current_items = []
+        self.category = None
+        await self.load_first_page()
             
         self.featured_button.style = discord.ButtonStyle.primary if tab_name == "featured" else discord.ButtonStyle.secondary
         self.new_button.style = discord.ButtonStyle.primary if tab_name == "new" else discord.ButtonStyle.secondary
@@ -241,17 +234,37 @@ class ShopView(ui.View):
 
     @ui.button(emoji="🔼", style=discord.ButtonStyle.grey, custom_id="scroll_up", row=2)
     async def scroll_up_button(self, interaction: discord.Interaction, button: ui.Button):
+        await interaction.response.defer()
         if self.selected_index > 0:
             self.selected_index -= 1
-            await interaction.response.defer()
-            await self.update_view(interaction)
+        elif self.page_offset > 0:
+            # Step back to the previous window, landing on its last item
+            order = TAB_ORDERS[self.current_tab]
+            previous = await self.fetch_page(before=self.bot.db.item_cursor(self.current_items[0], order))
+            if not previous: return
+            self.current_items = previous
+            self.page_offset = max(0, self.page_offset - len(previous))
+            self.selected_index = len(previous) - 1
+        else:
+            return
+        await self.update_view(interaction)
 
     @ui.button(emoji="🔽", style=discord.ButtonStyle.grey, custom_id="scroll_down", row=2)
     async def scroll_down_button(self, interaction: discord.Interaction, button: ui.Button):
+        await interaction.response.defer()
         if self.selected_index < len(self.current_items) - 1:
             self.selected_index += 1
-            await interaction.response.defer()
-            await self.update_view(interaction)
+        elif self.current_items:
+            # Step forward to the next window, landing on its first item
+            order = TAB_ORDERS[self.current_tab]
+            following = await self.fetch_page(after=self.bot.db.item_cursor(self.current_items[-1], order))
+            if not following: return
+            self.page_offset += len(self.current_items)
+            self.current_items = following
+            self.selected_index = 0
+        else:
+            return
+        await self.update_view(interaction)
 
     @ui.button(label="View Item", style=discord.ButtonStyle.green, custom_id="select_item", row=1)
     async def select_item_button(self, interaction: discord.Interaction, button: ui.Button):
@@ -310,8 +323,7 @@ class ShopCog(commands.Cog):
             
         await interaction.response.defer()
         
-        all_items = await self.bot.db.get_all_items(interaction.guild.id)
-        categories = set(item['category'] for item in all_items)
+        categories = await self.bot.db.get_item_categories(interaction.guild.id)
         
         view = ShopView(self.bot, interaction.user.id, interaction.guild.id, categories)
         await view.handle_tab_switch(interaction, "featured")
@@ -326,7 +338,7 @@ class ShopCog(commands.Cog):
         
         embed = discord.Embed(title=f"🔎 Search Results for `{query}`", description=f"Found **{len(results)}** item(s). Use `/shop` to browse properly.", color=discord.Color.blue())
         for item in results[:5]:
-            embed.add_field(name=item['item_name'], value=f"{item['price']:,} coins", inline=False)
+            embed.add_field(name=item['item_name'], value=f"{item['price']:,} coins • {item['application']} • {item['category']}", inline=False)
         await interaction.followup.send(embed=embed, ephemeral=True)
 
 async def setup(bot: commands.Bot):
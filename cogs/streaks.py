@@ -41,11 +41,19 @@ class StreaksCog(commands.Cog):
     async def daily(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=False)
         try:
-            player = await self.bot.db.get_user_data(interaction.user.id, interaction.guild.id)
-            
             current_time_utc = datetime.now(timezone.utc)
             today_utc = current_time_utc.date()
-            
+
+            # Already claimed today (in UTC)? Answered from memory, see cooldowns.py
+            seconds_left = await self.bot.db.cooldowns.remaining("daily", interaction.user.id, interaction.guild.id, current_time_utc.timestamp())
+            if seconds_left:
+                await interaction.followup.send(
+                    f"<:wtf:1403067096782340167>. Wait for **{format_timedelta(timedelta(seconds=seconds_left))}**.",
+                    ephemeral=True
+                )
+                return
+
+            player = await self.bot.db.get_user_data(interaction.user.id, interaction.guild.id)
             last_claim_str = player.get('last_daily')
             last_claim_time = None
 
@@ -58,18 +66,6 @@ class StreaksCog(commands.Cog):
                     # Fallback for old date-only format: '2025-08-25'
                     last_claim_time = datetime.strptime(last_claim_str, '%Y-%m-%d')
 
-            # Check if the user has already claimed today (in UTC)
-            if last_claim_time and last_claim_time.date() == today_utc:
-                # --- NEW: Calculate time remaining until next UTC day ---
-                next_claim_time = datetime.combine(today_utc + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
-                time_left = next_claim_time - current_time_utc
-                
-                await interaction.followup.send(
-                    f"<:wtf:1403067096782340167>. Wait for **{format_timedelta(time_left)}**.",
-                    ephemeral=True
-                )
-                return
-
             # Determine if the streak should continue or be reset to 1
             new_streak = 1
             if last_claim_time:
@@ -79,18 +75,14 @@ class StreaksCog(commands.Cog):
             # Calculate reward
             level_bonus = (player['level'] // 50) * 50
             total_reward = min(50 + level_bonus, 500)
-            new_balance = player['balance'] + total_reward
             
-            # Prepare data for database update
-            data_to_update = {
-                "balance": new_balance,
-                "daily_streak": new_streak,
-                # --- NEW: Store the full ISO format timestamp ---
-                "last_daily": current_time_utc.isoformat(),
-                "daily_spam_count": 0
-            }
-            
-            await self.bot.db.update_user_data(interaction.user.id, interaction.guild.id, data_to_update)
+            # Claim and payout are one conditional write: if another /daily saved a claim since we read the
+            # row, this one matches nothing and isn't paid
+            new_balance = await self.bot.db.claim_daily(interaction.user.id, interaction.guild.id, last_claim_str,
+                                                        current_time_utc.isoformat(), new_streak, total_reward)
+            if new_balance is None:
+                await interaction.followup.send("<:wtf:1403067096782340167>. You've already claimed your daily reward.", ephemeral=True)
+                return
 
             # Send confirmation message
             embed = discord.Embed(
@@ -2,6 +2,7 @@ import discord
 from discord.ext import commands
 import datetime
 import time
+import levels
 
 class StreamingCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -55,8 +56,12 @@ class StreamingCog(commands.Cog):
                 if last_daily_str != today:
                     player['daily_stream_coins'] = 0
                 
-                # Calculate rewards
+                # Calculate rewards; a long stream can be worth several levels. The XP is accrued as total XP
+                # right away (no await since the read, so the level-up below is exactly what it lands as)
                 xp_earned = duration_minutes * self.XP_PER_MINUTE
+                progress = {"level": player["level"], "xp": player["xp"]}
+                levels_gained = levels.apply_xp(progress, xp_earned)
+                self.bot.db.accrue_user_data(member.id, member.guild.id, {"xp": xp_earned})
                 
                 # Calculate coins earned, respecting the daily limit
                 remaining_coins_for_day = self.DAILY_COIN_LIMIT - player.get('daily_stream_coins', 0)
@@ -65,19 +70,24 @@ class StreamingCog(commands.Cog):
 
                 # Prepare data for database update
                 data_to_update = {
-                    "xp": player["xp"] + xp_earned,
-                    "balance": player["balance"] + coins_earned,
                     "daily_stream_coins": player.get('daily_stream_coins', 0) + coins_earned,
                     "last_daily": today # Update the 'last_daily' field to mark the activity day
                 }
 
                 await self.bot.db.update_user_data(member.id, member.guild.id, data_to_update)
+                if coins_earned:
+                    await self.bot.db.credit(member.id, member.guild.id, coins_earned)
+                if levels_gained > 0:
+                    self.bot.level_ups.submit(member.guild.id, member.id, progress["level"])
                 
                 # This log message is commented out to prevent console spam.
                 # print(f"{member.name} streamed for {duration_minutes} minutes and earned {xp_earned} XP and {coins_earned} coins.")
 
                 # DM the user with their rewards
-                await member.send(f"🎉 Thanks for streaming! You earned **{xp_earned:,} XP** and **{coins_earned:,} coins** for your {duration_minutes}-minute stream.")
+                message = f"🎉 Thanks for streaming! You earned **{xp_earned:,} XP** and **{coins_earned:,} coins** for your {duration_minutes}-minute stream."
+                if levels_gained > 0:
+                    message += f" You're now **Level {progress['level']}**!"
+                await member.send(message)
 
             except discord.Forbidden:
                 print(f"Could not DM {member.name} about their streaming rewards.")
@@ -0,0 +1,127 @@
+# cooldowns.py
+# In-memory view of every per-user cooldown, so "not yet" is answered without touching the database.
+# The source of truth stays in the users columns: a user's entry is loaded from their row on first use, and
+# DatabaseManager reports every write to those columns back here. claim() saves through the accrual buffer,
+# which lands it with the next batch of chat rewards.
+# Entries only hold ready times, and ones that are all ready again can be dropped and reloaded later.
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+COOLDOWN_MAX_ENTRIES = 100_000  # Users tracked at once before ready ones are pruned
+COOLDOWN_PRUNE_TO = 0.9         # Share of max_entries left after pruning, so the next prune isn't one load away
+
+@dataclass(frozen=True)
+class Cooldown:
+    column: str     # users column holding the last claim
+    seconds: float  # How long after a claim it is ready again
+    daily: bool = False  # Column is an ISO date/time and the cooldown ends at the next UTC midnight
+
+COOLDOWNS = {
+    "coin": Cooldown("last_coin_claim", 25),           # Chat coins, EconomyCog.on_message
+    "xp": Cooldown("last_xp_claim", 20),               # Chat XP, EconomyCog.on_message
+    "bump": Cooldown("last_bump_timestamp", 7 * 86400),  # /bumpitem
+    "daily": Cooldown("last_daily", 86400, daily=True),  # /daily, saved together with the streak
+}
+COLUMNS = {cooldown.column: kind for kind, cooldown in COOLDOWNS.items()}
+
+def ready_at(cooldown: Cooldown, value) -> float:
+    """When a claim stored as `value` in the cooldown's column stops blocking the next one."""
+    if not value: return 0.0
+    if not cooldown.daily:
+        return float(value) + cooldown.seconds
+    try:
+        claimed = datetime.fromisoformat(value).date()
+    except ValueError:
+        return 0.0  # Unreadable: let the command deal with it
+    return datetime.combine(claimed + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc).timestamp()
+
+class CooldownRegistry:
+    def __init__(self, db, max_entries: int = COOLDOWN_MAX_ENTRIES):
+        self.db = db
+        self.max_entries = max_entries
+        self._ready = {}  # {(user_id, guild_id): {kind: ready_at}}, oldest loaded first
+        self._generation = 0  # Bumped on every observed write, see _load
+        self.stats = {"hits": 0, "loads": 0, "pruned": 0}
+
+    def __len__(self):
+        return len(self._ready)
+
+    def peek(self, kind: str, user_id: int, guild_id: int, now: float = None):
+        """Seconds until `kind` is ready (0.0 if it is), or None if this user isn't loaded yet."""
+        entry = self._ready.get((user_id, guild_id))
+        if entry is None: return None
+        self.stats["hits"] += 1
+        return self._left(kind, entry[kind], time.time() if now is None else now)
+
+    async def remaining(self, kind: str, user_id: int, guild_id: int, now: float = None) -> float:
+        """Seconds until `kind` is ready, 0.0 if it is. Reads the user's row only the first time."""
+        if kind not in COOLDOWNS: raise ValueError(f"Unknown cooldown '{kind}'. Choose from: {', '.join(COOLDOWNS)}")
+        left = self.peek(kind, user_id, guild_id, now)
+        if left is None:
+            entry = await self._load((user_id, guild_id))
+            left = self._left(kind, entry[kind], time.time() if now is None else now)
+        return left
+
+    def claim(self, kind: str, user_id: int, guild_id: int, when: float = None):
+        """Starts `kind`'s cooldown now (or at `when`). Saved with the next accrual flush.
+        The user's row must exist (as for accrue_user_data). /daily saves last_daily itself along with the streak."""
+        cooldown = COOLDOWNS[kind]
+        if cooldown.daily: raise ValueError(f"'{kind}' is saved by update_user_data, not claim()")
+        self.db.accrue_user_data(user_id, guild_id, timestamps={cooldown.column: time.time() if when is None else when})
+
+    @staticmethod
+    def _left(kind: str, ready: float, now: float) -> float:
+        left = ready - now
+        # A claim further ahead than the cooldown itself (e.g. a daily dated tomorrow) doesn't block
+        return left if 0 < left <= COOLDOWNS[kind].seconds else 0.0
+
+    async def _load(self, key) -> dict:
+        generation = self._generation
+        columns = [cooldown.column for cooldown in COOLDOWNS.values()]
+        values = await self.db.get_user_fields(*key, *columns)
+        entry = {kind: ready_at(cooldown, value) for (kind, cooldown), value in zip(COOLDOWNS.items(), values)}
+        self.stats["loads"] += 1
+        # A write seen while loading may not be in `values`; answer this call but load again next time
+        if generation == self._generation:
+            self._ready[key] = entry
+            if len(self._ready) > self.max_entries:
+                self.prune()
+        return entry
+
+    # --- WRITE HOOKS (called by DatabaseManager) ---
+    def observe(self, key, values: dict):
+        """A write of `values` to the user's row: picks up any cooldown columns in it."""
+        kinds = [(COLUMNS[column], value) for column, value in values.items() if column in COLUMNS]
+        if not kinds: return
+        self._generation += 1
+        entry = self._ready.get(key)
+        if entry is None: return
+        for kind, value in kinds:
+            cooldown = COOLDOWNS[kind]
+            # Claim timestamps only move forward (the accrual buffer keeps the MAX); last_daily is set outright
+            entry[kind] = ready_at(cooldown, value) if cooldown.daily else max(entry[kind], ready_at(cooldown, value))
+
+    def forget(self, key):
+        self._generation += 1
+        self._ready.pop(key, None)
+
+    def clear(self):
+        self._generation += 1
+        self._ready.clear()
+
+    def prune(self, now: float = None) -> int:
+        """Drops users whose cooldowns are all ready, then the oldest loaded ones if still over max_entries."""
+        now = time.time() if now is None else now
+        stale = [key for key, entry in self._ready.items() if not any(self._left(kind, ready, now) for kind, ready in entry.items())]
+        excess = len(self._ready) - len(stale) - int(self.max_entries * COOLDOWN_PRUNE_TO)
+        if excess > 0:
+            stale_set = set(stale)
+            stale += [key for key in self._ready if key not in stale_set][:excess]
+        for key in stale:
+            del self._ready[key]
+        self.stats["pruned"] += len(stale)
+        return len(stale)
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, tracked=len(self._ready), capacity=self.max_entries)
@@ -1,199 +1,1327 @@
 # database.py
 import aiosqlite
+import asyncio
+import dataclasses
+import sqlite3
 import time
 import os
+import pathlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from discord.ext import commands
+import migrations
+import levels
+from records import UserRecord, ItemRecord
+from storage import StorageEngine, ITEM_ORDERINGS, ITEM_LIST_COLUMNS
+from sharding import ShardRouter, SHARD_CACHE_SIZE, check_layout
+from cooldowns import CooldownRegistry
 
-class DatabaseManager:
-    def __init__(self, bot: commands.Bot):
+# --- PRAGMA PROFILES ---
+# Applied to every pooled connection when it is opened. "safe" matches SQLite's
+# defaults (what the old connect-per-call code ran with), the others trade some
+# durability on power loss for fewer fsyncs and a bigger page cache.
+PRAGMA_PROFILES = {
+    "safe": {"synchronous": "FULL", "cache_size": -2000, "mmap_size": 0, "temp_store": "DEFAULT"},
+    "balanced": {"synchronous": "NORMAL", "cache_size": -16000, "mmap_size": 64 * 1024 * 1024, "temp_store": "MEMORY"},
+    "fast": {"synchronous": "OFF", "cache_size": -64000, "mmap_size": 256 * 1024 * 1024, "temp_store": "MEMORY"},
+}
+DEFAULT_PRAGMA_PROFILE = "balanced"
+
+SEARCH_WEIGHTS = "10.0, 3.0, 2.0"  # bm25() weights for item_name, application, category
+USER_BATCH_SIZE = 400  # Users per IN (...) query, well under SQLite's bound-parameter limit
+STREAM_BATCH_SIZE = 500  # Rows per batch from the iter_* scans
+
+# --- SINGLE WRITER ---
+GROUP_COMMIT_MAX = 64  # Most write() blocks folded into one commit
+_CLOSE = object()  # Queue sentinel: the writer stops once everything before it is done
+
+# --- MAINTENANCE ---
+MAINTENANCE_CHECK_INTERVAL = 60.0  # Seconds between looks at how busy the bot is
+MAINTENANCE_INTERVAL = 30 * 60.0   # Minimum seconds between full maintenance runs
+OPTIMIZE_INTERVAL = 6 * 3600.0     # PRAGMA optimize (ANALYZE) at most this often
+QUIET_ACTIVITY_MAX = 20            # Writes + chat rewards in one check window at or below which the bot is quiet
+BUSY_CHECKPOINT_WAL_BYTES = 64 * 1024 * 1024  # WAL size that gets a PASSIVE checkpoint even when the bot is busy
+INCREMENTAL_VACUUM_PAGES = 2000    # Most free pages handed back per run, bounds how long the writer is held
+VACUUM_CONVERT_FREE_PAGES = 1000   # Free pages before a file from before auto_vacuum gets its one-time VACUUM
+
+class _WriteTicket:
+    """One queued write() call. The writer grants it the connection, the caller reports back when done."""
+    __slots__ = ("granted", "released", "committed", "exclusive")
+
+    def __init__(self, loop, exclusive: bool = False):
+        self.granted = loop.create_future()    # Set by the writer: the caller may use the connection
+        self.released = loop.create_future()   # Set by the caller: "ok", "rolled_back" or "broken"
+        self.committed = loop.create_future()  # Set by the writer once the group transaction is durable
+        self.exclusive = exclusive             # Runs alone, outside any transaction (see DatabaseHandle.exclusive)
+
+def _settle(future, result=None, error=None):
+    if future.done(): return
+    if error is not None: future.set_exception(error)
+    else: future.set_result(result)
+
+class DatabaseHandle:
+    """Long-lived read and write connections for a single SQLite file.
+
+    Every write goes through one writer task that drains a queue of write() calls. Whatever queued up
+    while the last commit ran is applied as one transaction (one savepoint per caller) and committed once.
+    """
+    def __init__(self, path: str, pragmas: dict):
+        self.path = path
+        self.pragmas = pragmas
+        self.reader = None
+        self.writer = None
+        self.scanner = None  # Read-only connection for long guild-wide scans, keeps them off the reader
+        self._queue = None
+        self._writer_task = None
+        self.write_stats = {"commits": 0, "writes": 0, "max_batch": 0, "max_queue_depth": 0, "last_commit_ms": 0.0, "max_commit_ms": 0.0, "total_commit_ms": 0.0}
+
+    @property
+    def is_open(self):
+        return self.writer is not None
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue else 0
+
+    async def _connect(self, read_only: bool = False):
+        if read_only:
+            db = await aiosqlite.connect(f"{pathlib.Path(self.path).absolute().as_uri()}?mode=ro", uri=True)
+        else:
+            db = await aiosqlite.connect(self.path)
+        db.row_factory = aiosqlite.Row
+        for name, func in levels.SQL_FUNCTIONS.items():
+            await db.create_function(name, 1, func, deterministic=True)
+        for key, value in self.pragmas.items():
+            await db.execute_fetchall(f"PRAGMA {key}={value}")
+        return db
+
+    async def open(self):
+        if self.is_open: return
+        self.writer = await self._connect()
+        # Only takes effect on a new, empty file; older files are converted by maintain()
+        await self.writer.execute_fetchall("PRAGMA auto_vacuum=INCREMENTAL")
+        await self.writer.execute_fetchall("PRAGMA journal_mode=WAL")
+        self.reader = await self._connect()
+        self.scanner = await self._connect(read_only=True)
+        self._queue = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._drain_writes())
+
+    async def attach(self, other: "DatabaseHandle", alias: str):
+        """ATTACHes another handle's file to this writer so one transaction can span both files.
+        Only call this while nothing is writing (init_db); ATTACH can't run inside a transaction."""
+        await self.writer.execute_fetchall(f"ATTACH DATABASE ? AS {alias}", (other.path,))
+        # synchronous/cache_size/mmap_size are per schema; temp_store is per connection and already set
+        for key in ("synchronous", "cache_size", "mmap_size"):
+            if key in other.pragmas:
+                await self.writer.execute_fetchall(f"PRAGMA {alias}.{key}={other.pragmas[key]}")
+
+    async def close(self):
+        # The writer finishes everything already queued before it sees the sentinel
+        if self._writer_task:
+            self._queue.put_nowait(_CLOSE)
+            await self._writer_task
+            self._writer_task = None
+        for db in (self.scanner, self.reader, self.writer):
+            if db is not None:
+                await db.close()
+        self.scanner = self.reader = self.writer = None
+
+    def get_write_stats(self) -> dict:
+        stats = dict(self.write_stats, queue_depth=self.queue_depth)
+        stats["avg_commit_ms"] = stats.pop("total_commit_ms") / stats["commits"] if stats["commits"] else 0.0
+        stats["avg_batch"] = stats["writes"] / stats["commits"] if stats["commits"] else 0.0
+        return stats
+
+    @asynccontextmanager
+    async def write(self):
+        """Queues for the writer connection. The body runs in its own savepoint and is rolled back alone
+        if it raises; we only return once the group transaction holding it has committed."""
+        ticket = _WriteTicket(asyncio.get_running_loop())
+        self._queue.put_nowait(ticket)
+        self.write_stats["max_queue_depth"] = max(self.write_stats["max_queue_depth"], self._queue.qsize())
+        try:
+            await ticket.granted
+        except asyncio.CancelledError:
+            # Gave up while queued (or just as we were let in): hand the connection straight back
+            _settle(ticket.released, "rolled_back")
+            raise
+        try:
+            await self.writer.execute("SAVEPOINT write_op")
+            yield self.writer
+            await self.writer.execute("RELEASE write_op")
+        except BaseException:
+            if self.writer.in_transaction:
+                await self.writer.execute("ROLLBACK TO write_op")
+                await self.writer.execute("RELEASE write_op")
+                _settle(ticket.released, "rolled_back")
+            else:
+                # SQLite already rolled the whole transaction back (e.g. disk full); the writer fails the batch
+                _settle(ticket.released, "broken")
+            raise
+        _settle(ticket.released, "ok")
+        await ticket.committed
+
+    def wal_bytes(self) -> int:
+        try: return os.path.getsize(self.path + "-wal")
+        except OSError: return 0
+
+    async def maintain(self, checkpoint: str = "PASSIVE", optimize: bool = False, vacuum_pages: int = 0) -> dict:
+        """One maintenance pass on this file: optionally PRAGMA optimize and an incremental vacuum, then a WAL
+        checkpoint. Returns the WAL/page counts before and after and the milliseconds spent on each step."""
+        report = {"checkpoint": checkpoint, "wal_bytes_before": self.wal_bytes(), "optimize_ms": None, "vacuum_ms": None, "converted": False}
+        started = time.perf_counter()
+        async with self.exclusive() as db:
+            report["pages_before"], report["free_before"] = await self._page_counts(db)
+            if optimize:
+                step = time.perf_counter()
+                # Without statistics yet, optimize would skip most tables; the first run does a full ANALYZE
+                if await db.execute_fetchall("SELECT 1 FROM main.sqlite_master WHERE name = 'sqlite_stat1'"):
+                    await db.execute_fetchall("PRAGMA main.optimize")
+                else:
+                    await db.execute_fetchall("ANALYZE main")
+                report["optimize_ms"] = (time.perf_counter() - step) * 1000
+            if vacuum_pages and report["free_before"]:
+                step = time.perf_counter()
+                (mode,), = await db.execute_fetchall("PRAGMA main.auto_vacuum")
+                if mode == 2:  # INCREMENTAL
+                    # The sqlite3 cursor steps a row-less PRAGMA once (one page); executescript runs it to the end
+                    await db.executescript(f"PRAGMA main.incremental_vacuum({int(vacuum_pages)});")
+                elif report["free_before"] >= VACUUM_CONVERT_FREE_PAGES:
+                    # Files created before auto_vacuum was set need one full VACUUM to switch modes
+                    await db.execute_fetchall("PRAGMA main.auto_vacuum=INCREMENTAL")
+                    await db.execute_fetchall("VACUUM main")
+                    report["converted"] = True
+                report["vacuum_ms"] = (time.perf_counter() - step) * 1000
+            step = time.perf_counter()
+            (busy, _, _), = await db.execute_fetchall(f"PRAGMA main.wal_checkpoint({checkpoint})")
+            report["checkpoint_ms"] = (time.perf_counter() - step) * 1000
+            report["checkpoint_busy"] = bool(busy)  # A reader or writer kept part of the WAL from being copied back
+            report["pages_after"], report["free_after"] = await self._page_counts(db)
+        report["wal_bytes_after"] = self.wal_bytes()
+        report["total_ms"] = (time.perf_counter() - started) * 1000
+        return report
+
+    @staticmethod
+    async def _page_counts(db) -> tuple:
+        (pages,), = await db.execute_fetchall("PRAGMA main.page_count")
+        (free,), = await db.execute_fetchall("PRAGMA main.freelist_count")
+        return pages, free
+
+    @asynccontextmanager
+    async def exclusive(self):
+        """Sole use of the writer connection with no transaction open, for statements that can't run inside
+        one (checkpoints, VACUUM). Waits for the writes queued ahead of it; later writes wait for it."""
+        ticket = _WriteTicket(asyncio.get_running_loop(), exclusive=True)
+        self._queue.put_nowait(ticket)
+        try:
+            await ticket.granted
+        except asyncio.CancelledError:
+            _settle(ticket.released, "ok")
+            raise
+        try:
+            yield self.writer
+        finally:
+            _settle(ticket.released, "ok")
+
+    async def _grant(self, ticket):
+        # A caller that was cancelled while queued has already settled `released`
+        if not ticket.granted.done():
+            ticket.granted.set_result(None)
+        return await ticket.released
+
+    async def _drain_writes(self):
+        held = None  # Ticket taken off the queue that can't join the current batch
+        while True:
+            ticket, held = held or await self._queue.get(), None
+            if ticket is _CLOSE: break
+            if ticket.exclusive:
+                await self._grant(ticket)
+                continue
+            batch = []
+            try:
+                # Deferred, so an ATTACHed file is only locked by the batches that actually write to it
+                await self.writer.execute("BEGIN")
+            except Exception as e:
+                _settle(ticket.granted, error=e)
+                continue
+            while True:
+                if not ticket.granted.done():
+                    ticket.granted.set_result(None)
+                    outcome = await ticket.released
+                    if outcome == "ok":
+                        batch.append(ticket)
+                    elif outcome == "broken":
+                        break
+                if len(batch) >= GROUP_COMMIT_MAX or self._queue.empty(): break
+                ticket = self._queue.get_nowait()
+                if ticket is _CLOSE or ticket.exclusive:
+                    held = ticket
+                    break
+            await self._commit_batch(batch)
+
+    async def _commit_batch(self, batch):
+        started = time.perf_counter()
+        error = None
+        try:
+            if self.writer.in_transaction:
+                await self.writer.commit()
+            elif batch:
+                error = sqlite3.OperationalError("transaction was rolled back by SQLite before it could commit")
+        except Exception as e:
+            error = e
+            try: await self.writer.rollback()
+            except Exception: pass
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if error is None and batch:
+            stats = self.write_stats
+            stats["commits"] += 1
+            stats["writes"] += len(batch)
+            stats["max_batch"] = max(stats["max_batch"], len(batch))
+            stats["last_commit_ms"] = elapsed_ms
+            stats["max_commit_ms"] = max(stats["max_commit_ms"], elapsed_ms)
+            stats["total_commit_ms"] += elapsed_ms
+        for ticket in batch:
+            _settle(ticket.committed, error=error)
+
+def _copy_database(source_path: str, target_path: str):
+    """Runs in a worker thread. Overwrites target_path's contents with source_path's through SQLite's backup
+    API, so connections that have the target open simply see the new contents afterwards."""
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path, timeout=30)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+# --- WRITE-BEHIND CHAT REWARDS ---
+ACCRUAL_FLUSH_INTERVAL = 5.0  # Seconds between background flushes
+ACCRUAL_MAX_PENDING = 500     # Flush early once this many users have pending rewards
+RANK_READ_ATTEMPTS = 3        # get_user_rank reads through the buffer this many times before flushing instead
+
+class AccrualBuffer:
+    """Buffers per-(user, guild) reward deltas in memory until they are flushed in one transaction.
+
+    Counters are stored as increments, claim timestamps as the latest value. XP is buffered as total XP gained
+    and never split into level and xp changes: the level follows from the row's total once the XP is applied
+    (here for readers, in ACCRUAL_UPDATE_SQL for the flush), so XP from several sources simply adds up.
+    """
+    INCREMENTS = ("balance", "xp")
+    TIMESTAMPS = ("last_coin_claim", "last_xp_claim", "last_bump_timestamp")
+
+    def __init__(self):
+        self.pending = {}   # {(user_id, guild_id): {field: value}}
+        self.flushing = {}  # Snapshot being written right now, still visible to readers
+        self.added = 0      # Running count of add() calls, a cheap measure of chat activity
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, key, increments: dict, timestamps: dict):
+        self.added += 1
+        entry = self.pending.setdefault(key, {})
+        for field, delta in increments.items():
+            entry[field] = entry.get(field, 0) + delta
+        for field, value in timestamps.items():
+            entry[field] = max(entry.get(field, 0), value)
+
+    def overlay(self, key, row):
+        """Applies every pending delta for `key` on top of a row read from the database (a UserRecord or a
+        dict of just some columns; fields the row doesn't carry are skipped)."""
+        for source in (self.flushing, self.pending):
+            entry = source.get(key)
+            if entry:
+                self.apply(entry, row)
+        return row
+
+    @classmethod
+    def apply(cls, entry: dict, row):
+        for field, value in entry.items():
+            if field not in row: continue
+            if field == "xp":
+                if value: levels.apply_xp(row, value)  # Rows carrying xp carry level too (see overlay callers)
+            elif field in cls.INCREMENTS:
+                row[field] += value
+            else:
+                row[field] = max(row[field], value)
+
+    def restore(self, snapshot: dict):
+        """Puts a snapshot back after a failed flush, merging with anything queued since."""
+        for key, entry in snapshot.items():
+            self.add(key, {f: v for f, v in entry.items() if f in self.INCREMENTS}, {f: v for f, v in entry.items() if f in self.TIMESTAMPS})
+
+    @classmethod
+    def to_params(cls, key, entry: dict):
+        params = {field: entry.get(field, 0) for field in cls.INCREMENTS + cls.TIMESTAMPS}
+        params["user_id"], params["guild_id"] = key
+        return params
+
+# level/xp are recomputed from the old total_xp plus the buffered XP (levels.SQL_FUNCTIONS); both right-hand sides see the old row
+ACCRUAL_UPDATE_SQL = """
+    UPDATE users SET balance = balance + :balance,
+        level = CASE WHEN :xp = 0 THEN level ELSE level_for_total(total_xp + :xp) END,
+        xp = CASE WHEN :xp = 0 THEN xp ELSE xp_in_level(total_xp + :xp) END,
+        last_coin_claim = MAX(last_coin_claim, :last_coin_claim), last_xp_claim = MAX(last_xp_claim, :last_xp_claim),
+        last_bump_timestamp = MAX(last_bump_timestamp, :last_bump_timestamp)
+    WHERE user_id = :user_id AND guild_id = :guild_id
+"""
+
+# --- USER ROW CACHE ---
+USER_CACHE_SIZE = 50_000  # Cached users rows, a few hundred bytes each; least recently used go first
+
+class UserCache:
+    """Bounded LRU of users rows as committed to the database, keyed by (user_id, guild_id).
+
+    Buffered rewards are not in it; readers overlay them like they do on rows from SQLite. Writers update or
+    drop an entry once their transaction has committed. A read that missed only stores its row if no user
+    write happened while it was loading (`generation`), so a slow read can't bring back a row a write replaced.
+    """
+    def __init__(self, size: int = USER_CACHE_SIZE):
+        self.size = size
+        self.generation = 0  # Bumped by every write that goes through the cache
+        self._rows = OrderedDict()  # {(user_id, guild_id): UserRecord}, least recently used first
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def peek(self, key):
+        """Like get() but leaves the counters and LRU order alone (for bookkeeping, not reads)."""
+        return self._rows.get(key)
+
+    def get(self, key):
+        """The cached row, or None. Shared with the cache: copy it before changing anything."""
+        record = self._rows.get(key)
+        if record is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self._rows.move_to_end(key)
+        return record
+
+    def put(self, key, record, generation: int):
+        """Caches a row loaded from the database, unless a write went through since `generation` was read."""
+        if self.size <= 0 or generation != self.generation: return
+        self._rows[key] = record
+        self._rows.move_to_end(key)
+        if len(self._rows) > self.size:
+            self._rows.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def store(self, key, record):
+        """Write-through of a whole row a committed write returned."""
+        self.generation += 1
+        self.put(key, record, self.generation)
+
+    def update(self, key, values: dict):
+        """Write-through of committed column values; a user who isn't cached stays uncached."""
+        self.generation += 1
+        record = self._rows.get(key)
+        if record is not None:
+            for field, value in values.items():
+                record[field] = value
+
+    def apply(self, key, entry: dict):
+        """Write-through of accrual deltas that have just landed."""
+        self.generation += 1
+        record = self._rows.get(key)
+        if record is not None:
+            AccrualBuffer.apply(entry, record)
+
+    def discard(self, key):
+        self.generation += 1
+        if self._rows.pop(key, None) is not None:
+            self.stats["invalidations"] += 1
+
+    def discard_guild(self, guild_id: int):
+        self.generation += 1
+        for key in [key for key in self._rows if key[1] == guild_id]:
+            del self._rows[key]
+            self.stats["invalidations"] += 1
+
+    def clear(self):
+        self.generation += 1
+        self.stats["invalidations"] += len(self._rows)
+        self._rows.clear()
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return dict(self.stats, size=len(self._rows), capacity=self.size, hit_rate=self.stats["hits"] / lookups if lookups else 0.0)
+
+# --- LEADERBOARD WATCH ---
+class RankWatch:
+    """Tells cached leaderboards (EconomyCog) when a write may have changed a guild's top entries.
+
+    A guild is watched from the moment a snapshot starts building. Until narrow() records its entries, any
+    level/xp write in the guild counts; after that only writes to a listed user or ones reaching the cutoff
+    total do. A change bumps the guild's version and stops watching until the next rebuild.
+    """
+    def __init__(self):
+        self._watched = {}  # {guild_id: (cutoff total_xp or None, frozenset(user_ids))}
+        self._versions = {}  # {guild_id: int}
+
+    def __contains__(self, guild_id):
+        return guild_id in self._watched
+
+    def version(self, guild_id: int) -> int:
+        return self._versions.get(guild_id, 0)
+
+    def watch(self, guild_id: int) -> int:
+        """Starts watching before the snapshot's query runs. Returns the version to build it at."""
+        self._watched[guild_id] = (None, frozenset())
+        return self.version(guild_id)
+
+    def narrow(self, guild_id: int, version: int, rows: list):
+        """Watches only what can change the top `rows` (a get_leaderboard result) from here on."""
+        if self.version(guild_id) == version and guild_id in self._watched and rows:
+            self._watched[guild_id] = (rows[-1]['total_xp'], frozenset(row['user_id'] for row in rows))
+
+    def changed(self, guild_id: int, user_id: int = None, total_xp: int = None):
+        """A user's level/xp changed (total_xp None: not known). Without a user_id, the whole guild changed."""
+        watched = self._watched.get(guild_id)
+        if watched is None: return
+        cutoff, user_ids = watched
+        if cutoff is not None and user_id is not None and user_id not in user_ids and total_xp is not None and total_xp < cutoff:
+            return
+        del self._watched[guild_id]
+        self._versions[guild_id] = self.version(guild_id) + 1
+
+    def clear(self):
+        for guild_id in list(self._watched):
+            self.changed(guild_id)
+
+class _CheckoutAborted(Exception):
+    """Raised inside purchase_item to roll the whole checkout back."""
+
+class DatabaseManager(StorageEngine):
+    """The SQLite engine: users and settings in economy.db, the shop in shop.db.
+
+    With shard_dir set, users and items live in per-guild (or per-bucket, see shard_buckets) files instead,
+    see sharding.py. Settings, role grants and bulk jobs always stay in economy.db.
+    """
+    name = "sqlite"
+
+    def __init__(self, bot: commands.Bot, pragma_profile: str = DEFAULT_PRAGMA_PROFILE, economy_db_path: str = "economy.db", shop_db_path: str = "shop.db",
+                 shard_dir: str = None, shard_buckets: int = 0, shard_cache_size: int = SHARD_CACHE_SIZE, user_cache_size: int = USER_CACHE_SIZE):
         self.bot = bot
-        self.economy_db_path = "economy.db"
-        self.shop_db_path = "shop.db"
-        # We will initialize tables in an async setup method
+        self.economy_db_path = economy_db_path
+        self.shop_db_path = shop_db_path
+        if pragma_profile not in PRAGMA_PROFILES:
+            raise ValueError(f"Unknown PRAGMA profile '{pragma_profile}'. Choose from: {', '.join(PRAGMA_PROFILES)}")
+        self.pragma_profile = pragma_profile
+        self.economy = DatabaseHandle(self.economy_db_path, PRAGMA_PROFILES[pragma_profile])
+        self.shop = DatabaseHandle(self.shop_db_path, PRAGMA_PROFILES[pragma_profile])
+        self.shards = ShardRouter(shard_dir, shard_buckets, PRAGMA_PROFILES[pragma_profile], DatabaseHandle, shard_cache_size) if shard_dir else None
+        # Connections are opened once in init_db and closed in close(); shards open on first use
+        self.accruals = AccrualBuffer()
+        self.user_cache = UserCache(user_cache_size)  # Every per-user read and write goes through it
+        self.cooldowns = CooldownRegistry(self)  # Told about every write to a cooldown column below
+        self.rank_watch = RankWatch()  # Told about every level/xp write below
+        self._accrual_flush_lock = asyncio.Lock()
+        self._accrual_wakeup = asyncio.Event()
+        self._accrual_task = None
+        self._maintenance_task = None
+        self._maintained_at = self._optimized_at = None  # time.monotonic() of the last full run / optimize
+        self.last_maintenance = {}  # {"economy"/"shop": report from the most recent maintain()}
+        self._guild_settings = {}  # {guild_id: {setting_key: parsed value}}, write-through
+        self._role_grants = {}  # {guild_id: {grant_type: frozenset(role_ids)}}, write-through
 
     async def init_db(self):
-        """Initializes the database tables asynchronously."""
-        async with aiosqlite.connect(self.economy_db_path) as db:
-            await db.execute("PRAGMA journal_mode=WAL")
-            
-            # --- USERS TABLE ---
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER NOT NULL, guild_id INTEGER NOT NULL,
-                    balance INTEGER DEFAULT 0, xp INTEGER DEFAULT 0, level INTEGER DEFAULT 1,
-                    last_daily TEXT, daily_streak INTEGER DEFAULT 0,
-                    last_coin_claim REAL DEFAULT 0, last_xp_claim REAL DEFAULT 0,
-                    daily_spam_count INTEGER DEFAULT 0,
-                    daily_stream_coins INTEGER DEFAULT 0,
-                    last_bump_timestamp REAL DEFAULT 0,
-                    stream_start_timestamp REAL DEFAULT 0, 
-                    PRIMARY KEY (user_id, guild_id)
-                )
-            """)
-            
-            # --- GUILD SETTINGS TABLE (Replaces channel_config.json) ---
-            # We store settings as key-value pairs per guild for flexibility
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS guild_settings (
-                    guild_id INTEGER NOT NULL,
-                    setting_key TEXT NOT NULL,
-                    setting_value TEXT,
-                    PRIMARY KEY (guild_id, setting_key)
-                )
-            """)
-            await db.commit()
-            print(f"✅ Economy DB initialized at {self.economy_db_path}")
-
-        async with aiosqlite.connect(self.shop_db_path) as db:
-            await db.execute("PRAGMA journal_mode=WAL")
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS items (
-                    item_id INTEGER PRIMARY KEY AUTOINCREMENT, creator_id INTEGER NOT NULL,
-                    guild_id INTEGER NOT NULL, item_name TEXT NOT NULL, application TEXT NOT NULL,
-                    category TEXT NOT NULL, price INTEGER NOT NULL, product_link TEXT NOT NULL,
-                    screenshot_link TEXT, screenshot_link_2 TEXT, screenshot_link_3 TEXT,
-                    purchase_count INTEGER DEFAULT 0,
-                    upload_timestamp REAL DEFAULT 0,
-                    is_featured INTEGER DEFAULT 0
-                )
-            """)
-            await db.commit()
-            print(f"✅ Shop DB initialized at {self.shop_db_path}")
+        """Opens the connection pool and initializes the database tables asynchronously."""
+        if self.economy.is_open and self.shop.is_open: return
+        await self.economy.open()
+        await self.shop.open()
+
+        # Schema changes live in migrations.py; nothing runs when both files are already current
+        for label, handle, path, steps in (("Economy", self.economy, self.economy_db_path, migrations.ECONOMY_MIGRATIONS), ("Shop", self.shop, self.shop_db_path, migrations.SHOP_MIGRATIONS)):
+            before, after = await migrations.run_migrations(handle, steps)
+            change = f"schema v{after}" if before == after else f"migrated schema v{before} -> v{after}"
+            print(f"✅ {label} DB initialized at {path} ({change}, profile: {self.pragma_profile})")
+
+        # Checkout writes users and items in one transaction (see purchase_item)
+        await self.economy.attach(self.shop, "shop")
+        if self.shards:
+            check_layout(self.shards.directory, self.shards.buckets)
+            layout = f"one file pair per {'guild' if self.shards.buckets <= 0 else f'bucket ({self.shards.buckets} buckets)'}"
+            print(f"✅ Sharded layout in {self.shards.directory}: {layout}, up to {self.shards.cache_size} open")
+            users = await self.economy.reader.execute_fetchall("SELECT EXISTS (SELECT 1 FROM users)")
+            items = await self.shop.reader.execute_fetchall("SELECT EXISTS (SELECT 1 FROM items)")
+            if users[0][0] or items[0][0]:
+                print(f"⚠️ {self.economy_db_path}/{self.shop_db_path} still hold users or items the sharded layout won't read. Run split_shards.py first.")
+
+        await self.load_all_guild_settings()
+        await self.load_all_role_grants()
+        self._accrual_task = asyncio.create_task(self._accrual_flush_loop())
+        self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+
+    async def close(self):
+        """Flushes buffered rewards and closes every pooled connection. Called once on bot shutdown."""
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+            self._maintenance_task = None
+        if self._accrual_task:
+            self._accrual_task.cancel()
+            self._accrual_task = None
+        if self.economy.is_open:
+            await self.flush_accruals()
+        if self.shards:
+            await self.shards.close()
+        await self.economy.close()
+        await self.shop.close()
+
+    def get_write_stats(self) -> dict:
+        """Writer queue depth, group sizes and commit latency for each database."""
+        return {"economy": self.economy.get_write_stats(), "shop": self.shop.get_write_stats()}
+
+    def database_paths(self) -> dict:
+        """{name: path} of every database file: "economy", "shop" and, when sharded, "<shard key>-economy"/"-shop"."""
+        paths = {"economy": self.economy.path, "shop": self.shop.path}
+        if self.shards:
+            paths.update(self.shards.paths())
+        return paths
+
+    @asynccontextmanager
+    async def _named_handle(self, name: str):
+        """The open handle for a database_paths() name, held open (for shards) until the block ends."""
+        kind = name.rsplit("-", 1)[-1]
+        if name in ("economy", "shop"):
+            yield getattr(self, name)
+        elif self.shards and name in self.shards.paths():
+            async with self.shards.lease_key(name[:-len(kind) - 1]) as shard:
+                yield getattr(shard, kind)
+        else:
+            raise ValueError(f"Unknown database '{name}'")
+
+    async def restore_database(self, name: str, source_path: str):
+        """Replaces one database file with the database at source_path while the bot runs (see backups.py).
+        Buffered rewards land first, writes queue up behind the copy, then the schema and caches are brought up to date."""
+        kind = name.rsplit("-", 1)[-1]
+        if kind == "economy":
+            await self.flush_accruals()
+        async with self._named_handle(name) as handle:
+            async with handle.exclusive():
+                await asyncio.to_thread(_copy_database, source_path, handle.path)
+            await migrations.run_migrations(handle, migrations.ECONOMY_MIGRATIONS if kind == "economy" else migrations.SHOP_MIGRATIONS)
+        if kind == "economy":
+            self.user_cache.clear()
+            self.cooldowns.clear()
+            self.rank_watch.clear()
+        if name == "economy":
+            await self.load_all_guild_settings()
+            await self.load_all_role_grants()
+
+    # --- MAINTENANCE ---
+    # Checkpoints, ANALYZE and incremental vacuum hold the writer, so full runs wait for a quiet window.
+    # While the bot stays busy only an oversized WAL gets a (non-blocking) PASSIVE checkpoint.
+    def _activity_count(self) -> int:
+        shard_writes = self.shards.total_writes() if self.shards else 0
+        return self.economy.write_stats["writes"] + self.shop.write_stats["writes"] + shard_writes + self.accruals.added
+
+    async def _maintenance_loop(self):
+        last_activity = self._activity_count()
+        while True:
+            await asyncio.sleep(MAINTENANCE_CHECK_INTERVAL)
+            activity = self._activity_count()
+            quiet = activity - last_activity <= QUIET_ACTIVITY_MAX and not (self.economy.queue_depth or self.shop.queue_depth)
+            last_activity = activity
+            try:
+                await self.run_maintenance(quiet)
+            except Exception as e:
+                print(f"❌ Database maintenance failed: {e}")
+
+    async def run_maintenance(self, quiet: bool = True) -> dict:
+        """Maintains economy.db, shop.db and any open shards if it is due. Returns {name: report} for whatever ran."""
+        now = time.monotonic()
+        # Shards that aren't open need nothing: closing the last connection checkpoints and removes the WAL
+        names = ["economy", "shop"] + [f"{key}-{kind}" for key in (self.shards.open_keys if self.shards else []) for kind in ("economy", "shop")]
+        if quiet and (self._maintained_at is None or now - self._maintained_at >= MAINTENANCE_INTERVAL):
+            optimize = self._optimized_at is None or now - self._optimized_at >= OPTIMIZE_INTERVAL
+            options = {"checkpoint": "TRUNCATE", "optimize": optimize, "vacuum_pages": INCREMENTAL_VACUUM_PAGES}
+            self._maintained_at = now
+            if optimize: self._optimized_at = now
+        else:
+            options = {"checkpoint": "PASSIVE"}
+
+        reports = {}
+        for name in names:
+            async with self._named_handle(name) as handle:
+                if options["checkpoint"] == "PASSIVE" and handle.wal_bytes() < BUSY_CHECKPOINT_WAL_BYTES: continue
+                reports[name] = await handle.maintain(**options)
+            self.last_maintenance[name] = dict(reports[name], finished_at=time.time())
+            self._log_maintenance(name, reports[name])
+        return reports
+
+    @staticmethod
+    def _log_maintenance(name: str, report: dict):
+        mb = lambda size: f"{size / (1024 * 1024):.1f} MB"
+        steps = [f"checkpoint {report['checkpoint']} {report['checkpoint_ms']:.1f} ms" + (" (busy)" if report['checkpoint_busy'] else "")]
+        if report['optimize_ms'] is not None: steps.append(f"optimize {report['optimize_ms']:.1f} ms")
+        if report['vacuum_ms'] is not None: steps.append(f"{'VACUUM to incremental' if report['converted'] else 'vacuum'} {report['vacuum_ms']:.1f} ms")
+        print(f"🧹 {name.title()} DB maintenance: WAL {mb(report['wal_bytes_before'])} -> {mb(report['wal_bytes_after'])}, "
+              f"pages {report['pages_before']:,} -> {report['pages_after']:,} (free {report['free_before']:,} -> {report['free_after']:,}), "
+              f"{', '.join(steps)}, total {report['total_ms']:.1f} ms")
 
     # --- SETTINGS MANAGEMENT (Replacing JSON) ---
-    async def get_guild_setting(self, guild_id: int, key: str, default=None):
-        async with aiosqlite.connect(self.economy_db_path) as db:
-            cursor = await db.execute("SELECT setting_value FROM guild_settings WHERE guild_id = ? AND setting_key = ?", (guild_id, key))
-            row = await cursor.fetchone()
-            if row:
-                # Attempt to cast to int if it looks like an ID
-                val = row[0]
-                if val.isdigit(): return int(val)
-                return val
-            return default
+    # Settings are read far more often than written, so each guild's settings live in memory
+    # as one parsed snapshot. Writes go to the database and then straight into the snapshot.
+    async def load_all_guild_settings(self):
+        """Bulk-loads every guild's settings into memory with a single query."""
+        rows = await self.economy.reader.execute_fetchall("SELECT * FROM guild_settings")
+        snapshots = {}
+        for row in rows:
+            snapshots.setdefault(row['guild_id'], {})[row['setting_key']] = self._parse_setting_value(row['setting_value'])
+        self._guild_settings = snapshots
+
+    async def get_guild_settings(self, guild_id: int) -> dict:
+        """Returns the cached settings snapshot for a guild, loading it on first use. Don't mutate it."""
+        settings = self._guild_settings.get(guild_id)
+        if settings is None:
+            rows = await self.economy.reader.execute_fetchall("SELECT * FROM guild_settings WHERE guild_id = ?", (guild_id,))
+            settings = {row['setting_key']: self._parse_setting_value(row['setting_value']) for row in rows}
+            settings = self._guild_settings.setdefault(guild_id, settings)
+        return settings
 
     async def set_guild_setting(self, guild_id: int, key: str, value):
-        async with aiosqlite.connect(self.economy_db_path) as db:
+        settings = await self.get_guild_settings(guild_id)
+        async with self.economy.write() as db:
             await db.execute("""
                 INSERT INTO guild_settings (guild_id, setting_key, setting_value) 
                 VALUES (?, ?, ?)
                 ON CONFLICT(guild_id, setting_key) DO UPDATE SET setting_value = excluded.setting_value
             """, (guild_id, key, str(value)))
-            await db.commit()
+        settings[key] = self._parse_setting_value(str(value))
+
+    # --- ROLE GRANTS ---
+    # Which roles count as "admin" or "creator" in each guild. Cached as frozensets so a permission
+    # check is a set intersection against the member's roles; writes replace the cached set.
+    async def load_all_role_grants(self):
+        rows = await self.economy.reader.execute_fetchall("SELECT guild_id, grant_type, role_id FROM guild_role_grants")
+        grants = {}
+        for guild_id, grant_type, role_id in rows:
+            grants.setdefault(guild_id, {}).setdefault(grant_type, set()).add(role_id)
+        self._role_grants = {guild_id: {grant_type: frozenset(role_ids) for grant_type, role_ids in by_type.items()} for guild_id, by_type in grants.items()}
+
+    async def get_role_grants(self, guild_id: int, grant_type: str) -> frozenset:
+        by_type = self._role_grants.get(guild_id)
+        if by_type is None:
+            rows = await self.economy.reader.execute_fetchall("SELECT grant_type, role_id FROM guild_role_grants WHERE guild_id = ?", (guild_id,))
+            loaded = {}
+            for row_type, role_id in rows:
+                loaded.setdefault(row_type, set()).add(role_id)
+            by_type = self._role_grants.setdefault(guild_id, {row_type: frozenset(role_ids) for row_type, role_ids in loaded.items()})
+        return by_type.get(grant_type, frozenset())
+
+    async def add_role_grant(self, guild_id: int, grant_type: str, role_id: int) -> bool:
+        """Returns False if the role already had this grant."""
+        current = await self.get_role_grants(guild_id, grant_type)
+        async with self.economy.write() as db:
+            cursor = await db.execute("INSERT OR IGNORE INTO guild_role_grants (guild_id, role_id, grant_type) VALUES (?, ?, ?)", (guild_id, role_id, grant_type))
+            added = cursor.rowcount > 0
+        self._role_grants[guild_id][grant_type] = current | {role_id}
+        return added
+
+    async def remove_role_grant(self, guild_id: int, grant_type: str, role_id: int) -> bool:
+        """Returns False if the role didn't have this grant."""
+        current = await self.get_role_grants(guild_id, grant_type)
+        async with self.economy.write() as db:
+            cursor = await db.execute("DELETE FROM guild_role_grants WHERE guild_id = ? AND grant_type = ? AND role_id = ?", (guild_id, grant_type, role_id))
+            removed = cursor.rowcount > 0
+        self._role_grants[guild_id][grant_type] = current - {role_id}
+        return removed
+
+    async def remove_role_from_all_grants(self, guild_id: int, role_id: int):
+        """Drops a deleted role from every grant type."""
+        await self.get_role_grants(guild_id, "admin")  # Make sure the guild is cached before editing it
+        async with self.economy.write() as db:
+            await db.execute("DELETE FROM guild_role_grants WHERE guild_id = ? AND role_id = ?", (guild_id, role_id))
+        by_type = self._role_grants[guild_id]
+        for grant_type, role_ids in by_type.items():
+            if role_id in role_ids:
+                by_type[grant_type] = role_ids - {role_id}
+
+    # --- ROUTING ---
+    @asynccontextmanager
+    async def _route(self, guild_id: int):
+        """The (economy, shop) handles holding `guild_id`'s users and items: the main files, or its shard."""
+        if self.shards is None:
+            yield self.economy, self.shop
+        else:
+            async with self.shards.lease(guild_id) as shard:
+                yield shard.economy, shard.shop
+
+    def _group_by_shard(self, keys) -> list:
+        """Splits (user_id, guild_id) keys by the file they live in: [(a guild_id to route by, [keys])]."""
+        keys = list(keys)
+        if self.shards is None: return [(keys[0][1], keys)] if keys else []
+        groups = {}
+        for key in keys:
+            groups.setdefault(self.shards.key_for(key[1]), (key[1], []))[1].append(key)
+        return list(groups.values())
+
+    # --- BUFFERED CHAT REWARDS ---
+    def accrue_user_data(self, user_id: int, guild_id: int, increments: dict = None, timestamps: dict = None):
+        """Queues balance/xp increments and claim timestamps without touching the database.
+
+        xp is total XP gained; the user moves up (or down) levels as it lands, so pass it unsplit.
+        The row must already exist (call get_user_data first). get_user_data sees the pending values straight away.
+        """
+        if increments and not increments.keys() <= set(AccrualBuffer.INCREMENTS):
+            raise ValueError(f"Only {', '.join(AccrualBuffer.INCREMENTS)} can be accrued, got {', '.join(increments)}")
+        self.accruals.add((user_id, guild_id), increments or {}, timestamps or {})
+        if timestamps:
+            self.cooldowns.observe((user_id, guild_id), timestamps)
+        if increments and "xp" in increments:
+            self._rank_changed((user_id, guild_id))
+        if len(self.accruals) >= ACCRUAL_MAX_PENDING:
+            self._accrual_wakeup.set()
+
+    async def flush_accruals(self):
+        """Writes every buffered reward in a single transaction (one per shard when sharded)."""
+        async with self._accrual_flush_lock:
+            if not self.accruals.pending: return
+            self.accruals.flushing, self.accruals.pending = self.accruals.pending, {}
+            landed = set()
+            try:
+                for guild_id, keys in self._group_by_shard(self.accruals.flushing):
+                    async with self._route(guild_id) as (economy, _), economy.write() as db:
+                        await db.executemany(ACCRUAL_UPDATE_SQL, [AccrualBuffer.to_params(key, self.accruals.flushing[key]) for key in keys])
+                    landed.update(keys)
+                    for key in keys:
+                        self.user_cache.apply(key, self.accruals.flushing[key])
+            except Exception:
+                self.accruals.restore({key: entry for key, entry in self.accruals.flushing.items() if key not in landed})
+                raise
+            finally:
+                self.accruals.flushing = {}
+
+    async def _accrual_flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._accrual_wakeup.wait(), timeout=ACCRUAL_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._accrual_wakeup.clear()
+            try:
+                await self.flush_accruals()
+            except Exception as e:
+                print(f"❌ Failed to flush buffered rewards: {e}")
+
+    async def _wait_for_flush(self, key):
+        # A flush of this user's rewards is mid-commit; wait so we never read it twice or not at all
+        if key in self.accruals.flushing:
+            async with self._accrual_flush_lock: pass
+
+    @asynccontextmanager
+    async def _user_write(self, guild_id: int, *user_ids):
+        """Write transaction on the guild's economy file that first lands any buffered rewards for `user_ids`,
+        so absolute writes and balance checks see the same values get_user_data showed.
+        The caller updates the user cache for its own changes after the block."""
+        keys = [(user_id, guild_id) for user_id in user_ids]
+        for key in keys:
+            await self._wait_for_flush(key)
+        landed = {}
+        try:
+            async with self._route(guild_id) as (economy, _), economy.write() as db:
+                for key in keys:
+                    pending = self.accruals.pending.pop(key, None)
+                    if pending:
+                        landed[key] = pending
+                        await db.execute(ACCRUAL_UPDATE_SQL, AccrualBuffer.to_params(key, pending))
+                yield db
+        except BaseException:
+            self.accruals.restore(landed)
+            raise
+        for key, entry in landed.items():
+            self.user_cache.apply(key, entry)
 
     # --- USER DATA ---
-    async def get_user_data(self, user_id: int, guild_id: int):
-        async with aiosqlite.connect(self.economy_db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute("SELECT * FROM users WHERE user_id = ? AND guild_id = ?", (user_id, guild_id))
-            row = await cursor.fetchone()
+    # Full rows come back as UserRecord (records.py), served from the user cache when possible. Otherwise existing users are one
+    # SELECT on the read connection. New users are created and returned by a single upsert; the no-op DO UPDATE makes RETURNING
+    # hand back the row even if another handler won the race.
+    async def _load_user(self, key):
+        """The committed row for `key` from the cache or the database, creating the user if needed.
+        Shared with the cache: copy it before changing anything."""
+        await self._wait_for_flush(key)
+        record = self.user_cache.get(key)
+        if record is not None: return record
+        generation = self.user_cache.generation
+        async with self._route(key[1]) as (economy, _):
+            rows = await economy.reader.execute_fetchall(f"SELECT {UserRecord.COLUMNS} FROM users WHERE user_id = ? AND guild_id = ?", key)
+            row = rows[0] if rows else None
             if not row:
-                await db.execute("INSERT INTO users (user_id, guild_id) VALUES (?, ?)", (user_id, guild_id))
-                await db.commit()
-                cursor = await db.execute("SELECT * FROM users WHERE user_id = ? AND guild_id = ?", (user_id, guild_id))
-                row = await cursor.fetchone()
-            return dict(row)
+                async with economy.write() as db:
+                    async with db.execute(f"INSERT INTO users (user_id, guild_id) VALUES (?, ?) ON CONFLICT(user_id, guild_id) DO UPDATE SET user_id = excluded.user_id RETURNING {UserRecord.COLUMNS}", key) as cursor:
+                        row = await cursor.fetchone()
+        record = UserRecord.from_row(row)
+        self.user_cache.put(key, record, generation)
+        return record
+
+    async def get_user_data(self, user_id: int, guild_id: int):
+        key = (user_id, guild_id)
+        return self.accruals.overlay(key, dataclasses.replace(await self._load_user(key)))
+
+    async def get_user_fields(self, user_id: int, guild_id: int, *fields):
+        """Like get_user_data but returns only `fields`: get_user_fields(uid, gid, "balance") -> 120.
+        Returns the value for a single field, or a tuple in the order asked for several."""
+        for field in fields:
+            if field not in UserRecord.FIELDS:
+                raise ValueError(f"Unknown user field '{field}'")
+        key = (user_id, guild_id)
+        record = await self._load_user(key)
+        if key in self.accruals.pending or key in self.accruals.flushing:
+            # Buffered XP can change the level, so both go through the overlay whichever was asked for
+            values = self.accruals.overlay(key, {field: record[field] for field in (*fields, "level", "xp")})
+            row = tuple(values[field] for field in fields)
+        else:
+            row = tuple(getattr(record, field) for field in fields)
+        return row[0] if len(fields) == 1 else row
+
+    async def get_users_data(self, guild_id: int, user_ids, create_missing: bool = True) -> dict:
+        """Fetches many users of one guild at once. Returns {user_id: row}.
+
+        Missing users are created in one upsert unless create_missing is False, in which case they're left out.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        results = {}
+        for user_id in user_ids:
+            await self._wait_for_flush((user_id, guild_id))
+            record = self.user_cache.get((user_id, guild_id))
+            if record is not None:
+                results[user_id] = record
+        uncached = [user_id for user_id in user_ids if user_id not in results]
+        generation = self.user_cache.generation
+        async with self._route(guild_id) as (economy, _):
+            for start in range(0, len(uncached), USER_BATCH_SIZE):
+                chunk = uncached[start:start + USER_BATCH_SIZE]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = await economy.reader.execute_fetchall(f"SELECT {UserRecord.COLUMNS} FROM users WHERE guild_id = ? AND user_id IN ({placeholders})", (guild_id, *chunk))
+                for row in rows:
+                    results[row['user_id']] = UserRecord.from_row(row)
+                missing = [user_id for user_id in chunk if user_id not in results]
+                if missing and create_missing:
+                    values = ", ".join(["(?, ?)"] * len(missing))
+                    params = [value for user_id in missing for value in (user_id, guild_id)]
+                    async with economy.write() as db:
+                        async with db.execute(f"INSERT INTO users (user_id, guild_id) VALUES {values} ON CONFLICT(user_id, guild_id) DO UPDATE SET user_id = excluded.user_id RETURNING {UserRecord.COLUMNS}", params) as cursor:
+                            for row in await cursor.fetchall():
+                                results[row['user_id']] = UserRecord.from_row(row)
+        for user_id in uncached:
+            if user_id in results:
+                self.user_cache.put((user_id, guild_id), results[user_id], generation)
+        return {user_id: self.accruals.overlay((user_id, guild_id), dataclasses.replace(row)) for user_id, row in results.items()}
 
     async def update_user_data(self, user_id: int, guild_id: int, data: dict):
         if not data: return
         set_clause = ", ".join([f"{key} = ?" for key in data.keys()])
         values = list(data.values()) + [user_id, guild_id]
-        async with aiosqlite.connect(self.economy_db_path) as db:
-            await db.execute(f"UPDATE users SET {set_clause} WHERE user_id = ? AND guild_id = ?", values)
-            await db.commit()
+        async with self._user_write(guild_id, user_id) as db:
+            # RETURNING gives the row exactly as stored (column affinity applied) for the cache
+            async with db.execute(f"UPDATE users SET {set_clause} WHERE user_id = ? AND guild_id = ? RETURNING {UserRecord.COLUMNS}", values) as cursor:
+                row = await cursor.fetchone()
+        if row:
+            self.user_cache.store((user_id, guild_id), UserRecord.from_row(row))
+            self.cooldowns.observe((user_id, guild_id), data)
+            if "xp" in data or "level" in data:
+                self._rank_changed((user_id, guild_id))
 
     async def delete_user_data(self, user_id: int, guild_id: int):
-        async with aiosqlite.connect(self.economy_db_path) as db:
+        await self._wait_for_flush((user_id, guild_id))
+        self.accruals.pending.pop((user_id, guild_id), None)
+        async with self._route(guild_id) as (economy, _), economy.write() as db:
             await db.execute("DELETE FROM users WHERE user_id = ? AND guild_id = ?", (user_id, guild_id))
-            await db.commit()
-
-    async def get_leaderboard(self, guild_id: int, limit: int = 10):
-        async with aiosqlite.connect(self.economy_db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute("SELECT user_id, level, xp, balance FROM users WHERE guild_id = ? ORDER BY level DESC, xp DESC LIMIT ?", (guild_id, limit))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
-            
+        self.user_cache.discard((user_id, guild_id))
+        self.cooldowns.forget((user_id, guild_id))
+        self.rank_watch.changed(guild_id, user_id, -1)  # Only matters if they were listed
+
+    # --- WALLET ---
+    # Balance changes are single atomic statements, so concurrent handlers can't overwrite each other.
+    async def credit(self, user_id: int, guild_id: int, amount: int) -> int:
+        """Adds `amount` coins (creating the user if needed) and returns the new balance."""
+        async with self._user_write(guild_id, user_id) as db:
+            async with db.execute("""
+                INSERT INTO users (user_id, guild_id, balance) VALUES (?, ?, ?)
+                ON CONFLICT(user_id, guild_id) DO UPDATE SET balance = balance + excluded.balance
+                RETURNING balance
+            """, (user_id, guild_id, amount)) as cursor:
+                row = await cursor.fetchone()
+        self.user_cache.update((user_id, guild_id), {"balance": row[0]})
+        return row[0]
+
+    async def debit(self, user_id: int, guild_id: int, amount: int, clamp: bool = False):
+        """Removes `amount` coins if the user can afford it and returns the new balance, or None if not.
+
+        With clamp=True the debit always succeeds and the balance stops at 0 instead.
+        """
+        if clamp:
+            query = "UPDATE users SET balance = MAX(balance - ?, 0) WHERE user_id = ? AND guild_id = ? RETURNING balance"
+            params = (amount, user_id, guild_id)
+        else:
+            query = "UPDATE users SET balance = balance - ? WHERE user_id = ? AND guild_id = ? AND balance >= ? RETURNING balance"
+            params = (amount, user_id, guild_id, amount)
+        async with self._user_write(guild_id, user_id) as db:
+            async with db.execute(query, params) as cursor:
+                row = await cursor.fetchone()
+        if not row: return None
+        self.user_cache.update((user_id, guild_id), {"balance": row[0]})
+        return row[0]
+
+    async def transfer(self, sender_id: int, recipient_id: int, guild_id: int, amount: int):
+        """Moves coins between two users in one transaction.
+
+        Returns (sender_balance, recipient_balance), or None if the sender can't afford it.
+        """
+        async with self._user_write(guild_id, sender_id, recipient_id) as db:
+            async with db.execute("UPDATE users SET balance = balance - ? WHERE user_id = ? AND guild_id = ? AND balance >= ? RETURNING balance", (amount, sender_id, guild_id, amount)) as cursor:
+                sender_row = await cursor.fetchone()
+            if not sender_row: return None
+            async with db.execute("""
+                INSERT INTO users (user_id, guild_id, balance) VALUES (?, ?, ?)
+                ON CONFLICT(user_id, guild_id) DO UPDATE SET balance = balance + excluded.balance
+                RETURNING balance
+            """, (recipient_id, guild_id, amount)) as cursor:
+                recipient_row = await cursor.fetchone()
+        self.user_cache.update((sender_id, guild_id), {"balance": sender_row[0]})
+        self.user_cache.update((recipient_id, guild_id), {"balance": recipient_row[0]})
+        return sender_row[0], recipient_row[0]
+
+    async def purchase_item(self, buyer_id: int, guild_id: int, item_id: int, price: int, commission_rate: float):
+        """Runs a whole shop checkout as one transaction on the economy writer, with the shop file ATTACHed:
+        charges the buyer `price`, pays the creator `commission_rate` of the listed price and counts the sale.
+
+        Returns (item, buyer_balance). item is None if it has been removed from the shop and buyer_balance
+        is None if the buyer can't afford it; nothing is written in either case.
+        """
+        # In WAL mode SQLite commits each attached file atomically on its own, not as a set, so a crash
+        # inside the commit itself could keep one side. That window is the commit, not the whole checkout.
+        item = None
+        try:
+            async with self._user_write(guild_id, buyer_id) as db:
+                async with db.execute(f"UPDATE shop.items SET purchase_count = purchase_count + 1 WHERE item_id = ? AND guild_id = ? RETURNING {ItemRecord.COLUMNS}", (item_id, guild_id)) as cursor:
+                    row = await cursor.fetchone()
+                if not row: raise _CheckoutAborted
+                item = ItemRecord.from_row(row)
+                async with db.execute("UPDATE users SET balance = balance - ? WHERE user_id = ? AND guild_id = ? AND balance >= ? RETURNING balance", (price, buyer_id, guild_id, price)) as cursor:
+                    row = await cursor.fetchone()
+                if not row: raise _CheckoutAborted
+                balance = row[0]
+                async with db.execute("""
+                    INSERT INTO users (user_id, guild_id, balance) VALUES (?, ?, ?)
+                    ON CONFLICT(user_id, guild_id) DO UPDATE SET balance = balance + excluded.balance
+                    RETURNING balance
+                """, (item['creator_id'], guild_id, int(item['price'] * commission_rate))) as cursor:
+                    creator_balance = (await cursor.fetchone())[0]
+        except _CheckoutAborted:
+            return item, None
+        if item['creator_id'] == buyer_id:
+            balance = creator_balance  # Buying their own item: the commission landed after the charge
+        else:
+            self.user_cache.update((item['creator_id'], guild_id), {"balance": creator_balance})
+        self.user_cache.update((buyer_id, guild_id), {"balance": balance})
+        return item, balance
+
+    async def claim_daily(self, user_id: int, guild_id: int, last_daily, claimed_at: str, streak: int, reward: int):
+        """Saves a /daily claim and pays `reward` in one statement, but only while last_daily still holds the
+        value the command read. Returns the new balance, or None if another claim got there first."""
+        key = (user_id, guild_id)
+        async with self._user_write(guild_id, user_id) as db:
+            async with db.execute(f"""
+                UPDATE users SET last_daily = ?, daily_streak = ?, daily_spam_count = 0, balance = balance + ?
+                WHERE user_id = ? AND guild_id = ? AND last_daily IS ? RETURNING {UserRecord.COLUMNS}
+            """, (claimed_at, streak, reward, user_id, guild_id, last_daily)) as cursor:
+                row = await cursor.fetchone()
+        if not row: return None
+        record = UserRecord.from_row(row)
+        self.user_cache.store(key, record)
+        self.cooldowns.observe(key, {"last_daily": claimed_at})
+        return record.balance
+
+    # --- RANKS ---
+    def _rank_changed(self, key):
+        if key[1] not in self.rank_watch: return
+        record = self.user_cache.peek(key)
+        total = None
+        if record is not None:
+            current = self.accruals.overlay(key, {"level": record.level, "xp": record.xp})
+            total = levels.total_xp(current['level'], current['xp'])
+        self.rank_watch.changed(key[1], key[0], total)
+
+    # Ordered by (total_xp DESC, user_id) on idx_users_guild_total_xp. Pending accruals are flushed first
+    # so positions match what /profile shows.
+    async def get_leaderboard(self, guild_id: int, limit: int = 10, offset: int = 0):
+        await self.flush_accruals()
+        async with self._route(guild_id) as (economy, _):
+            rows = await economy.reader.execute_fetchall(
+                "SELECT user_id, level, xp, balance, total_xp FROM users WHERE guild_id = ? ORDER BY total_xp DESC, user_id LIMIT ? OFFSET ?",
+                (guild_id, limit, offset)
+            )
+        return [dict(row) for row in rows]
+
+    async def count_ranked_users(self, guild_id: int):
+        await self.flush_accruals()
+        async with self._route(guild_id) as (economy, _):
+            rows = await economy.reader.execute_fetchall("SELECT COUNT(*) FROM users WHERE guild_id = ?", (guild_id,))
+        return rows[0][0]
+
+    async def get_user_rank(self, user_id: int, guild_id: int):
+        """Returns {rank, total_xp, level, xp, out_of} for the user, or None if they have no row yet.
+
+        Buffered XP is read through the accrual buffer instead of flushed, so /rank never opens a write.
+        Cost: the COUNTs step through idx_users_guild_total_xp over everyone ranked above the user, and over
+        the whole guild for out_of, so this is O(rank + guild size) index entries, not O(log n).
+        """
+        for _ in range(RANK_READ_ATTEMPTS):
+            async with self._accrual_flush_lock:  # No flush half-landed while we read
+                buffered = {key[0]: entry for key, entry in self.accruals.pending.items() if key[1] == guild_id and entry.get("xp")}
+                standing = await self._read_rank(user_id, guild_id, buffered)
+            # A write that landed one of these entries while we read may be counted twice: read again
+            if all(self.accruals.pending.get((other_id, guild_id)) is entry for other_id, entry in buffered.items()):
+                return standing
+        # Still changing under us: land everything and count committed rows only
+        await self.flush_accruals()
+        return await self._read_rank(user_id, guild_id, {})
+
+    async def _read_rank(self, user_id: int, guild_id: int, buffered: dict):
+        own_xp = buffered[user_id]['xp'] if user_id in buffered else 0
+        async with self._route(guild_id) as (economy, _):
+            # One statement, so the position and the total come from the same snapshot
+            rows = await economy.reader.execute_fetchall(
+                """
+                SELECT u.level, u.xp, u.total_xp + :own_xp AS total_xp,
+                       (SELECT COUNT(*) FROM users WHERE guild_id = u.guild_id AND total_xp > u.total_xp + :own_xp AND user_id != u.user_id)
+                     + (SELECT COUNT(*) FROM users WHERE guild_id = u.guild_id AND total_xp = u.total_xp + :own_xp AND user_id < u.user_id) + 1 AS rank,
+                       (SELECT COUNT(*) FROM users WHERE guild_id = u.guild_id) AS out_of
+                FROM users u WHERE u.user_id = :user_id AND u.guild_id = :guild_id
+                """,
+                {"own_xp": own_xp, "user_id": user_id, "guild_id": guild_id}
+            )
+            if not rows: return None
+            standing = dict(rows[0])
+            others = [other_id for other_id in buffered if other_id != user_id]
+            committed = []
+            if others:
+                placeholders = ", ".join("?" * len(others))
+                committed = await economy.reader.execute_fetchall(f"SELECT user_id, total_xp FROM users WHERE guild_id = ? AND user_id IN ({placeholders})", (guild_id, *others))
+        # Other users' buffered XP can move them past this user (or, if negative, back behind)
+        total = standing['total_xp']
+        ahead = lambda other_id, other_total: other_total > total or (other_total == total and other_id < user_id)
+        for other_id, other_total in committed:
+            standing['rank'] += ahead(other_id, other_total + buffered[other_id]['xp']) - ahead(other_id, other_total)
+        if own_xp:
+            standing['level'], standing['xp'] = levels.split_total(total)
+        return standing
+
     async def get_all_users_in_guild(self, guild_id: int):
-        async with aiosqlite.connect(self.economy_db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute("SELECT * FROM users WHERE guild_id = ?", (guild_id,))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        await self.flush_accruals()
+        async with self._route(guild_id) as (economy, _):
+            rows = await economy.reader.execute_fetchall(f"SELECT {UserRecord.COLUMNS} FROM users WHERE guild_id = ?", (guild_id,))
+        return [UserRecord.from_row(row) for row in rows]
+
+    # --- BULK JOBS ---
+    # Set-based statements and job bookkeeping for bulk_jobs.py
+    async def reset_levels(self, guild_id: int, above: int = 11, to_level: int = 9) -> int:
+        """Drops everyone above `above` to `to_level` with 0 xp in one statement. Returns how many users changed."""
+        # Land this guild's buffered rewards in the same transaction so none are applied on top of the reset
+        user_ids = [user_id for user_id, key_guild in self.accruals.pending if key_guild == guild_id]
+        async with self._user_write(guild_id, *user_ids) as db:
+            cursor = await db.execute("UPDATE users SET level = ?, xp = 0 WHERE guild_id = ? AND level > ?", (to_level, guild_id, above))
+            changed = cursor.rowcount
+        self.user_cache.discard_guild(guild_id)
+        self.rank_watch.changed(guild_id)
+        return changed
+
+    async def count_users_at_level(self, guild_id: int, min_level: int) -> int:
+        await self.flush_accruals()
+        async with self._route(guild_id) as (economy, _):
+            rows = await economy.scanner.execute_fetchall("SELECT COUNT(*) FROM users WHERE guild_id = ? AND level >= ?", (guild_id, min_level))
+        return rows[0][0]
+
+    async def create_bulk_job(self, guild_id: int, kind: str, channel_id: int, total: int, details: str = None) -> int:
+        now = time.time()
+        async with self.economy.write() as db:
+            cursor = await db.execute(
+                "INSERT INTO bulk_jobs (guild_id, kind, channel_id, total, details, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (guild_id, kind, channel_id, total, details, now, now)
+            )
+            return cursor.lastrowid
+
+    async def update_bulk_job(self, job_id: int, data: dict):
+        data = {**data, "updated_at": time.time()}
+        set_clause = ", ".join([f"{key} = ?" for key in data.keys()])
+        async with self.economy.write() as db:
+            await db.execute(f"UPDATE bulk_jobs SET {set_clause} WHERE job_id = ?", (*data.values(), job_id))
+
+    async def get_bulk_job(self, job_id: int):
+        rows = await self.economy.reader.execute_fetchall("SELECT * FROM bulk_jobs WHERE job_id = ?", (job_id,))
+        return dict(rows[0]) if rows else None
+
+    async def get_running_bulk_jobs(self, guild_id: int = None, kind: str = None):
+        query, params = "SELECT * FROM bulk_jobs WHERE status = 'running'", []
+        if guild_id is not None:
+            query += " AND guild_id = ?"; params.append(guild_id)
+        if kind is not None:
+            query += " AND kind = ?"; params.append(kind)
+        rows = await self.economy.reader.execute_fetchall(query, params)
+        return [dict(row) for row in rows]
+
+    # --- STREAMING SCANS ---
+    # Guild-wide reads for background work. Rows arrive in batches from the read-only scan connection with
+    # only the requested columns, and stay sqlite rows (no per-row dict). Each batch is its own keyset query,
+    # so a slow consumer never holds a read snapshot open and blocks WAL checkpoints.
+    @staticmethod
+    def _projection(key: str, columns) -> str:
+        columns = tuple(dict.fromkeys((key, *columns)))  # The keyset column always comes back
+        if not all(column.isidentifier() for column in columns):
+            raise ValueError(f"Invalid column list: {columns}")
+        return ", ".join(columns)
+
+    async def iter_users(self, guild_id: int, columns=("user_id",), min_level: int = None, after_user_id: int = 0, batch_size: int = STREAM_BATCH_SIZE):
+        """Yields batches of a guild's users in user_id order, starting after `after_user_id`."""
+        await self.flush_accruals()
+        query = f"SELECT {self._projection('user_id', columns)} FROM users WHERE guild_id = ? AND user_id > ?"
+        filters = ()
+        if min_level is not None:
+            query += " AND level >= ?"; filters = (min_level,)
+        query += " ORDER BY user_id LIMIT ?"
+        async with self._route(guild_id) as (economy, _):
+            while True:
+                rows = await economy.scanner.execute_fetchall(query, (guild_id, after_user_id, *filters, batch_size))
+                if not rows: return
+                yield rows
+                if len(rows) < batch_size: return
+                after_user_id = rows[-1]['user_id']
+
+    async def iter_items(self, guild_id: int, columns=("item_id",), after_item_id: int = 0, batch_size: int = STREAM_BATCH_SIZE):
+        """Yields batches of a guild's shop items in item_id order, starting after `after_item_id`."""
+        query = f"SELECT {self._projection('item_id', columns)} FROM items WHERE guild_id = ? AND item_id > ? ORDER BY item_id LIMIT ?"
+        async with self._route(guild_id) as (_, shop):
+            while True:
+                rows = await shop.scanner.execute_fetchall(query, (guild_id, after_item_id, batch_size))
+                if not rows: return
+                yield rows
+                if len(rows) < batch_size: return
+                after_item_id = rows[-1]['item_id']
 
     # --- SHOP ITEMS ---
     async def add_item_to_shop(self, creator_id, guild_id, item_name, application, category, price, product_link, screenshot_link, screenshot_link_2, screenshot_link_3):
-        async with aiosqlite.connect(self.shop_db_path) as db:
-            await db.execute(
+        async with self._route(guild_id) as (_, shop), shop.write() as db:
+            cursor = await db.execute(
                 "INSERT INTO items (creator_id, guild_id, item_name, application, category, price, product_link, screenshot_link, screenshot_link_2, screenshot_link_3, upload_timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
                 (creator_id, guild_id, item_name, application, category, price, product_link, screenshot_link, screenshot_link_2, screenshot_link_3, time.time())
             )
-            await db.commit()
+            return cursor.lastrowid
 
     async def get_item_details(self, item_id, guild_id):
-        async with aiosqlite.connect(self.shop_db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute("SELECT * FROM items WHERE item_id = ? AND guild_id = ?", (item_id, guild_id))
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+        async with self._route(guild_id) as (_, shop):
+            rows = await shop.reader.execute_fetchall(f"SELECT {ItemRecord.COLUMNS} FROM items WHERE item_id = ? AND guild_id = ?", (item_id, guild_id))
+        row = rows[0] if rows else None
+        return ItemRecord.from_row(row) if row else None
 
     async def delete_item(self, item_id, guild_id):
-        async with aiosqlite.connect(self.shop_db_path) as db:
+        async with self._route(guild_id) as (_, shop), shop.write() as db:
             await db.execute("DELETE FROM items WHERE item_id = ? AND guild_id = ?", (item_id, guild_id))
-            await db.commit()
 
     async def get_new_arrivals(self, guild_id, limit=5):
-        async with aiosqlite.connect(self.shop_db_path) as db:
-            db.row_factory = aiosqlite.Row
-            query = "SELECT * FROM items WHERE guild_id = ? ORDER BY upload_timestamp DESC"
-            params = [guild_id]
-            if limit:
-                query += " LIMIT ?"
-                params.append(limit)
-            cursor = await db.execute(query, tuple(params))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        query = f"SELECT {ItemRecord.COLUMNS} FROM items WHERE guild_id = ? ORDER BY upload_timestamp DESC"
+        params = [guild_id]
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        async with self._route(guild_id) as (_, shop):
+            rows = await shop.reader.execute_fetchall(query, tuple(params))
+        return [ItemRecord.from_row(row) for row in rows]
 
     async def get_all_items(self, guild_id):
-        async with aiosqlite.connect(self.shop_db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute("SELECT * FROM items WHERE guild_id = ? ORDER BY item_name ASC", (guild_id,))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        async with self._route(guild_id) as (_, shop):
+            rows = await shop.reader.execute_fetchall(f"SELECT {ItemRecord.COLUMNS} FROM items WHERE guild_id = ? ORDER BY item_name ASC", (guild_id,))
+        return [ItemRecord.from_row(row) for row in rows]
+
+    # --- CATALOG PAGINATION ---
+    # Keyset ("seek") pagination: a page is fetched relative to the first/last item already shown,
+    # so cost stays flat no matter how deep someone scrolls and nothing needs the full catalog in memory.
+    async def get_items_page(self, guild_id: int, order: str = "newest", after=None, before=None, limit: int = 10, category: str = None):
+        """Returns up to `limit` items, in display order, that come after cursor `after` or just before cursor `before`."""
+        column, descending = ITEM_ORDERINGS[order]
+        backwards = before is not None
+        # Walking backwards means flipping the comparison and the sort, then reversing the page
+        forward_op, sort = ("<", "DESC") if descending else (">", "ASC")
+        if backwards:
+            forward_op, sort = {"<": ">", ">": "<"}[forward_op], {"ASC": "DESC", "DESC": "ASC"}[sort]
+
+        query = f"SELECT {ITEM_LIST_COLUMNS} FROM items WHERE guild_id = ?"
+        params = [guild_id]
+        if category is not None:
+            query += " AND category = ?"
+            params.append(category)
+        cursor = before if backwards else after
+        if cursor is not None:
+            query += f" AND ({column}, item_id) {forward_op} (?, ?)"
+            params.extend(cursor)
+        query += f" ORDER BY {column} {sort}, item_id {sort} LIMIT ?"
+        params.append(limit)
+
+        async with self._route(guild_id) as (_, shop):
+            rows = [dict(row) for row in await shop.reader.execute_fetchall(query, params)]
+        if backwards: rows.reverse()
+        return rows
+
+    async def count_items(self, guild_id: int, category: str = None) -> int:
+        async with self._route(guild_id) as (_, shop):
+            if category is None:
+                rows = await shop.reader.execute_fetchall("SELECT COUNT(*) FROM items WHERE guild_id = ?", (guild_id,))
+            else:
+                rows = await shop.reader.execute_fetchall("SELECT COUNT(*) FROM items WHERE guild_id = ? AND category = ?", (guild_id, category))
+        return rows[0][0]
+
+    async def get_item_categories(self, guild_id: int):
+        async with self._route(guild_id) as (_, shop):
+            rows = await shop.reader.execute_fetchall("SELECT DISTINCT category FROM items WHERE guild_id = ? ORDER BY category", (guild_id,))
+        return [row[0] for row in rows]
 
     async def get_items_by_creator(self, creator_id: int, guild_id: int):
-        async with aiosqlite.connect(self.shop_db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute("SELECT * FROM items WHERE creator_id = ? AND guild_id = ? ORDER BY upload_timestamp DESC", (creator_id, guild_id))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        async with self._route(guild_id) as (_, shop):
+            rows = await shop.reader.execute_fetchall(f"SELECT {ItemRecord.COLUMNS} FROM items WHERE creator_id = ? AND guild_id = ? ORDER BY upload_timestamp DESC", (creator_id, guild_id))
+        return [ItemRecord.from_row(row) for row in rows]
 
-    async def bump_item(self, item_id: int):
-        async with aiosqlite.connect(self.shop_db_path) as db:
-            await db.execute("UPDATE items SET upload_timestamp = ? WHERE item_id = ?", (time.time(), item_id))
-            await db.commit()
+    async def bump_item(self, item_id: int, guild_id: int):
+        async with self._route(guild_id) as (_, shop), shop.write() as db:
+            await db.execute("UPDATE items SET upload_timestamp = ? WHERE item_id = ? AND guild_id = ?", (time.time(), item_id, guild_id))
 
     async def get_featured_item(self, guild_id):
-        async with aiosqlite.connect(self.shop_db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute("SELECT * FROM items WHERE guild_id = ? AND is_featured = 1 LIMIT 1", (guild_id,))
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+        async with self._route(guild_id) as (_, shop):
+            rows = await shop.reader.execute_fetchall(f"SELECT {ItemRecord.COLUMNS} FROM items WHERE guild_id = ? AND is_featured = 1 LIMIT 1", (guild_id,))
+        row = rows[0] if rows else None
+        return ItemRecord.from_row(row) if row else None
 
     async def set_featured_item(self, item_id, guild_id):
-        async with aiosqlite.connect(self.shop_db_path) as db:
+        async with self._route(guild_id) as (_, shop), shop.write() as db:
             await db.execute("UPDATE items SET is_featured = 0 WHERE guild_id = ?", (guild_id,))
             await db.execute("UPDATE items SET is_featured = 1 WHERE item_id = ? AND guild_id = ?", (item_id, guild_id))
-            await db.commit()
-
-    async def search_items(self, guild_id, query):
-        async with aiosqlite.connect(self.shop_db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute("SELECT item_id, item_name, price FROM items WHERE guild_id = ? AND item_name LIKE ?", (guild_id, f'%{query}%'))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+
+    @staticmethod
+    def _fts_query(text: str):
+        """Turns free text into an FTS5 query: every word must match, each as a prefix ("gal" finds "Galaxy")."""
+        terms = StorageEngine._search_terms(text)
+        return " ".join('"' + term.replace('"', '""') + '"*' for term in terms) or None
+
+    async def search_items(self, guild_id, query, limit=None):
+        """Full-text search over name, application and category, best matches (BM25) first."""
+        match = self._fts_query(query)
+        if not match: return []
+        # Column weights: a hit in the name counts more than one in the application or category
+        sql = f"""
+            SELECT items.item_id, items.item_name, items.price, items.application, items.category
+            FROM items_fts JOIN items ON items.item_id = items_fts.rowid
+            WHERE items_fts MATCH ? AND items.guild_id = ?
+            ORDER BY bm25(items_fts, {SEARCH_WEIGHTS})
+        """
+        params = [match, guild_id]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        async with self._route(guild_id) as (_, shop):
+            rows = await shop.reader.execute_fetchall(sql, params)
+        return [dict(row) for row in rows]
             
     async def increment_purchase_count(self, item_id: int, guild_id: int):
-        async with aiosqlite.connect(self.shop_db_path) as db:
-            await db.execute("UPDATE items SET purchase_count = purchase_count + 1 WHERE item_id = ? AND guild_id = ?", (item_id, guild_id))
-            await db.commit()
\ No newline at end of file
+        async with self._route(guild_id) as (_, shop), shop.write() as db:
+            await db.execute("UPDATE items SET purchase_count = purchase_count + 1 WHERE item_id = ? AND guild_id = ?", (item_id, guild_id))
\ No newline at end of file
@@ -0,0 +1,92 @@
+# level_ups.py
+# Level-up side effects (announcement, rank roles, rank DM) run here in the background instead of inside the
+# message handler that noticed the level-up, so Discord latency and rate limits never hold up chat rewards.
+# Handlers call bot.level_ups.submit() and move on; a few workers drain the queue. A member who levels up again
+# while still waiting is merged into the queued event, so a burst becomes one announcement and one role edit.
+# EconomyCog registers the handler that does the Discord work.
+import asyncio
+import time
+from dataclasses import dataclass
+
+LEVEL_UP_WORKERS = 2
+LEVEL_UP_QUEUE_SIZE = 1000  # Members waiting at once; past this level-ups are dropped (/syncranks catches roles up)
+
+@dataclass(slots=True)
+class LevelUp:
+    guild_id: int
+    user_id: int
+    level: int              # Level reached; raised in place if they level again before a worker gets to it
+    channel_id: int = None  # Where to announce when the guild has no LEVEL_UP_CHANNEL_ID (None: nowhere)
+    queued_at: float = 0.0  # time.monotonic()
+
+class LevelUpQueue:
+    def __init__(self, bot, workers: int = LEVEL_UP_WORKERS, maxsize: int = LEVEL_UP_QUEUE_SIZE):
+        self.bot = bot
+        self.workers = workers
+        self._queue = asyncio.Queue(maxsize)  # (guild_id, user_id) keys into _pending, in arrival order
+        self._pending = {}  # {(guild_id, user_id): LevelUp} not yet picked up by a worker
+        self._handler = None
+        self._tasks = []
+        self.stats = {"submitted": 0, "merged": 0, "dropped": 0, "processed": 0, "failed": 0, "max_depth": 0, "total_wait": 0.0, "max_wait": 0.0}
+
+    def register(self, handler):
+        """Sets the coroutine function called with each LevelUp."""
+        self._handler = handler
+
+    def start(self):
+        if self._tasks: return
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        """Stops the workers. Level-ups still waiting are dropped; /syncranks catches their roles up."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, guild_id: int, user_id: int, level: int, channel_id: int = None) -> bool:
+        """Queues a level-up without waiting. Returns False if the queue is full and it was dropped."""
+        self.stats["submitted"] += 1
+        key = (guild_id, user_id)
+        queued = self._pending.get(key)
+        if queued is not None:
+            queued.level = max(queued.level, level)
+            queued.channel_id = channel_id or queued.channel_id
+            self.stats["merged"] += 1
+            return True
+        if self._queue.full():
+            self.stats["dropped"] += 1
+            return False
+        self._pending[key] = LevelUp(guild_id, user_id, level, channel_id, time.monotonic())
+        self._queue.put_nowait(key)
+        self.stats["max_depth"] = max(self.stats["max_depth"], self._queue.qsize())
+        return True
+
+    async def _worker(self):
+        while True:
+            key = await self._queue.get()
+            event = self._pending.pop(key)
+            wait = time.monotonic() - event.queued_at
+            self.stats["total_wait"] += wait
+            self.stats["max_wait"] = max(self.stats["max_wait"], wait)
+            try:
+                if self._handler is None: raise RuntimeError("no level-up handler registered")
+                await self._handler(event)
+                self.stats["processed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"❌ Level-up side effects failed for user {event.user_id} in guild {event.guild_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def get_stats(self) -> dict:
+        """Backlog metrics: depth now and at peak, how long the oldest waiter has waited, average/max wait in ms."""
+        now = time.monotonic()
+        handled = self.stats["processed"] + self.stats["failed"]
+        oldest = min((event.queued_at for event in self._pending.values()), default=now)
+        return dict(self.stats, depth=self._queue.qsize(), capacity=self._queue.maxsize, workers=len(self._tasks),
+                    oldest_wait_ms=(now - oldest) * 1000,
+                    avg_wait_ms=self.stats["total_wait"] / handled * 1000 if handled else 0.0,
+                    max_wait_ms=self.stats["max_wait"] * 1000)
@@ -0,0 +1,48 @@
+# levels.py
+# The level curve: going from level L to L+1 takes 100 + 50*L xp.
+# Everything needed to reach level L is then total(L) = 25*L^2 + 75*L - 100, the same expression as the
+# users.total_xp column (migrations.py v3), and it inverts exactly with an integer square root, so any amount
+# of xp maps to its level in O(1) instead of a loop that runs once per level gained.
+from math import isqrt
+
+TABLE_LEVELS = 1000  # Thresholds precomputed for levels 1..TABLE_LEVELS; above that the formula is used
+
+def level_total(level: int) -> int:
+    """XP needed to go from level 1 (0 xp) to `level`."""
+    return 25 * level * level + 75 * level - 100
+
+LEVEL_TOTALS = [0] + [level_total(level) for level in range(1, TABLE_LEVELS + 1)]  # LEVEL_TOTALS[level]
+
+def threshold(level: int) -> int:
+    """Total XP at which `level` is reached."""
+    return LEVEL_TOTALS[level] if 0 < level <= TABLE_LEVELS else level_total(level)
+
+def xp_to_next(level: int) -> int:
+    """XP needed within `level` to reach the next one."""
+    return 100 + 50 * level
+
+def total_xp(level: int, xp: int) -> int:
+    return threshold(level) + xp
+
+def level_for_total(total: int) -> int:
+    # total(L) <= T  <=>  (10L + 15)^2 <= 4T + 625
+    return max(1, (isqrt(4 * max(total, 0) + 625) - 15) // 10)
+
+def split_total(total: int) -> tuple:
+    """(level, xp within that level) for a total XP amount."""
+    level = level_for_total(total)
+    return level, max(total, 0) - threshold(level)
+
+def xp_in_level(total: int) -> int:
+    return split_total(total)[1]
+
+# Registered on every SQLite connection (database.py), so a flush can move a row to the level its new total
+# puts it at in the same UPDATE
+SQL_FUNCTIONS = {"level_for_total": level_for_total, "xp_in_level": xp_in_level}
+
+def apply_xp(record, delta: int) -> int:
+    """Adds `delta` xp (may be negative) to a user record or dict with 'level'/'xp', moving it to the right level.
+    Returns the number of levels gained (negative if lost). Also fixes rows whose xp already ran past the threshold."""
+    old_level = record['level']
+    record['level'], record['xp'] = split_total(total_xp(old_level, record['xp']) + delta)
+    return record['level'] - old_level
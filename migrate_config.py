@@ -41,6 +41,26 @@ def migrate():
             break
     
     count = 0
+
+    # Admin/creator role lists live in their own table (schema v5); this matches migrations.ROLE_LIST_SETTINGS
+    role_list_settings = {"ADMIN_ROLES": "admin", "CREATOR_ROLE_IDS": "creator"}
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS guild_role_grants (
+            guild_id INTEGER NOT NULL, role_id INTEGER NOT NULL, grant_type TEXT NOT NULL,
+            PRIMARY KEY (guild_id, grant_type, role_id)
+        ) WITHOUT ROWID
+    """)
+
+    def save_setting(guild_id, key, value):
+        if key in role_list_settings:
+            role_ids = value if isinstance(value, list) else [value]
+            for role_id in role_ids:
+                cursor.execute("INSERT OR IGNORE INTO guild_role_grants (guild_id, role_id, grant_type) VALUES (?, ?, ?)", (guild_id, int(role_id), role_list_settings[key]))
+            return
+        cursor.execute("""
+            INSERT OR REPLACE INTO guild_settings (guild_id, setting_key, setting_value)
+            VALUES (?, ?, ?)
+        """, (guild_id, key, str(value)))
     
     if is_flat_structure:
         print("\n⚠️  Detected Single-Server Config Format.")
@@ -58,11 +78,7 @@ def migrate():
         
         print(f"   Processing settings for Guild ID: {guild_id}")
         for key, value in data.items():
-            value_str = str(value)
-            cursor.execute("""
-                INSERT OR REPLACE INTO guild_settings (guild_id, setting_key, setting_value)
-                VALUES (?, ?, ?)
-            """, (guild_id, key, value_str))
+            save_setting(guild_id, key, value)
             count += 1
             
     else:
@@ -70,11 +86,7 @@ def migrate():
         for guild_id, settings in data.items():
             print(f"   Processing Guild ID: {guild_id}")
             for key, value in settings.items():
-                value_str = str(value) 
-                cursor.execute("""
-                    INSERT OR REPLACE INTO guild_settings (guild_id, setting_key, setting_value)
-                    VALUES (?, ?, ?)
-                """, (guild_id, key, value_str))
+                save_setting(int(guild_id), key, value)
                 count += 1
             
     conn.commit()
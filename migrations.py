@@ -0,0 +1,205 @@
+# migrations.py
+# Versioned schema for economy.db and shop.db. DatabaseManager.init_db runs these on startup.
+# To change the schema, APPEND a new (version, steps) entry - never edit one that has shipped.
+# A step is either a SQL string or an async callable taking the connection.
+import ast
+import time
+
+# Role-list settings that v5 moves out of guild_settings, and the grant_type they become
+ROLE_LIST_SETTINGS = {"ADMIN_ROLES": "admin", "CREATOR_ROLE_IDS": "creator"}
+
+async def move_role_lists_to_grants(db):
+    """v5 data step: "[1, 2]" strings in guild_settings -> one guild_role_grants row per role."""
+    placeholders = ", ".join("?" * len(ROLE_LIST_SETTINGS))
+    rows = await db.execute_fetchall(f"SELECT guild_id, setting_key, setting_value FROM guild_settings WHERE setting_key IN ({placeholders})", tuple(ROLE_LIST_SETTINGS))
+    grants = []
+    for guild_id, key, raw in rows:
+        try: value = ast.literal_eval(raw) if raw else []
+        except (ValueError, SyntaxError):
+            print(f"⚠️ Skipping unreadable {key} for guild {guild_id}: {raw!r}")
+            continue
+        role_ids = value if isinstance(value, (list, tuple, set)) else [value]
+        grants += [(guild_id, int(role_id), ROLE_LIST_SETTINGS[key]) for role_id in role_ids if str(role_id).isdigit()]
+    await db.executemany("INSERT OR IGNORE INTO guild_role_grants (guild_id, role_id, grant_type) VALUES (?, ?, ?)", grants)
+    await db.execute(f"DELETE FROM guild_settings WHERE setting_key IN ({placeholders})", tuple(ROLE_LIST_SETTINGS))
+
+def add_missing_columns(table: str, columns: dict):
+    """Step for databases created before a column existed (what migrate_db.py used to do by hand)."""
+    async def step(db):
+        existing = {row[1] for row in await db.execute_fetchall(f"PRAGMA table_info({table})")}
+        for name, definition in columns.items():
+            if name not in existing:
+                await db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+    return step
+
+ECONOMY_MIGRATIONS = [
+    (1, [
+        # --- USERS TABLE ---
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER NOT NULL, guild_id INTEGER NOT NULL,
+            balance INTEGER DEFAULT 0, xp INTEGER DEFAULT 0, level INTEGER DEFAULT 1,
+            last_daily TEXT, daily_streak INTEGER DEFAULT 0,
+            last_coin_claim REAL DEFAULT 0, last_xp_claim REAL DEFAULT 0,
+            daily_spam_count INTEGER DEFAULT 0,
+            daily_stream_coins INTEGER DEFAULT 0,
+            last_bump_timestamp REAL DEFAULT 0,
+            stream_start_timestamp REAL DEFAULT 0,
+            PRIMARY KEY (user_id, guild_id)
+        )
+        """,
+        add_missing_columns("users", {"last_bump_timestamp": "REAL DEFAULT 0", "stream_start_timestamp": "REAL DEFAULT 0"}),
+        # --- GUILD SETTINGS TABLE (Replaces channel_config.json) ---
+        # We store settings as key-value pairs per guild for flexibility
+        """
+        CREATE TABLE IF NOT EXISTS guild_settings (
+            guild_id INTEGER NOT NULL,
+            setting_key TEXT NOT NULL,
+            setting_value TEXT,
+            PRIMARY KEY (guild_id, setting_key)
+        )
+        """,
+    ]),
+    (2, [
+        # get_leaderboard and per-guild scans
+        "CREATE INDEX IF NOT EXISTS idx_users_guild_level ON users (guild_id, level DESC, xp DESC)",
+    ]),
+    (3, [
+        # Cumulative XP: everything needed to reach `level` (sum of 100 + 50*l for l < level) plus the current xp.
+        # Same curve as levels.py; the two must change together.
+        # VIRTUAL, so it is computed from level/xp and can never drift from them.
+        add_missing_columns("users", {"total_xp": "INTEGER GENERATED ALWAYS AS (25 * level * level + 75 * level - 100 + xp) VIRTUAL"}),
+        # Rank index: leaderboard pages and /rank positions are index-only range scans.
+        # user_id breaks ties so every member has exactly one position.
+        "DROP INDEX IF EXISTS idx_users_guild_level",
+        "CREATE INDEX IF NOT EXISTS idx_users_guild_total_xp ON users (guild_id, total_xp DESC, user_id)",
+    ]),
+    (4, [
+        # Background guild-wide jobs (bulk_jobs.py). `cursor` is the last user_id handled: jobs walk a guild's
+        # users in user_id order and save their place after every chunk, so a restart picks up from there.
+        """
+        CREATE TABLE IF NOT EXISTS bulk_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL, kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            channel_id INTEGER, message_id INTEGER,
+            cursor INTEGER NOT NULL DEFAULT 0,
+            total INTEGER DEFAULT 0, processed INTEGER DEFAULT 0, changed INTEGER DEFAULT 0, failed INTEGER DEFAULT 0,
+            details TEXT,
+            created_at REAL NOT NULL, updated_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_bulk_jobs_running ON bulk_jobs (guild_id, kind) WHERE status = 'running'",
+        # Job chunks: WHERE guild_id = ? AND user_id > ? ORDER BY user_id
+        "CREATE INDEX IF NOT EXISTS idx_users_guild_user ON users (guild_id, user_id)",
+    ]),
+    (5, [
+        # Admin/creator roles as rows instead of stringified lists in guild_settings.
+        # The primary key serves "all roles of a type in a guild"; the index serves role deletion.
+        """
+        CREATE TABLE IF NOT EXISTS guild_role_grants (
+            guild_id INTEGER NOT NULL, role_id INTEGER NOT NULL, grant_type TEXT NOT NULL,
+            PRIMARY KEY (guild_id, grant_type, role_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_role_grants_role ON guild_role_grants (guild_id, role_id)",
+        move_role_lists_to_grants,
+    ]),
+]
+
+SHOP_MIGRATIONS = [
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS items (
+            item_id INTEGER PRIMARY KEY AUTOINCREMENT, creator_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL, item_name TEXT NOT NULL, application TEXT NOT NULL,
+            category TEXT NOT NULL, price INTEGER NOT NULL, product_link TEXT NOT NULL,
+            screenshot_link TEXT, screenshot_link_2 TEXT, screenshot_link_3 TEXT,
+            purchase_count INTEGER DEFAULT 0,
+            upload_timestamp REAL DEFAULT 0,
+            is_featured INTEGER DEFAULT 0
+        )
+        """,
+        add_missing_columns("items", {"purchase_count": "INTEGER DEFAULT 0", "upload_timestamp": "REAL DEFAULT 0", "is_featured": "INTEGER DEFAULT 0"}),
+    ]),
+    (2, [
+        # get_new_arrivals
+        "CREATE INDEX IF NOT EXISTS idx_items_guild_upload ON items (guild_id, upload_timestamp DESC)",
+        # get_all_items
+        "CREATE INDEX IF NOT EXISTS idx_items_guild_name ON items (guild_id, item_name)",
+        # get_items_by_creator
+        "CREATE INDEX IF NOT EXISTS idx_items_creator ON items (creator_id, guild_id, upload_timestamp DESC)",
+        # get_featured_item: only the (at most one per guild) featured rows are indexed
+        "CREATE INDEX IF NOT EXISTS idx_items_featured ON items (guild_id) WHERE is_featured = 1",
+    ]),
+    (3, [
+        # Full-text index for /search. External-content table: it stores only the index, the text stays in items.
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+            item_name, application, category,
+            content = 'items', content_rowid = 'item_id',
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+        """,
+        # Triggers keep the index in step with every insert/update/delete on items
+        """
+        CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+            INSERT INTO items_fts (rowid, item_name, application, category) VALUES (new.item_id, new.item_name, new.application, new.category);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN
+            INSERT INTO items_fts (items_fts, rowid, item_name, application, category) VALUES ('delete', old.item_id, old.item_name, old.application, old.category);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE OF item_name, application, category ON items BEGIN
+            INSERT INTO items_fts (items_fts, rowid, item_name, application, category) VALUES ('delete', old.item_id, old.item_name, old.application, old.category);
+            INSERT INTO items_fts (rowid, item_name, application, category) VALUES (new.item_id, new.item_name, new.application, new.category);
+        END
+        """,
+        # Index whatever is already in the shop
+        "INSERT INTO items_fts (items_fts) VALUES ('rebuild')",
+    ]),
+    (4, [
+        # Category-filtered catalog pages and the category list (DISTINCT category)
+        "CREATE INDEX IF NOT EXISTS idx_items_guild_category ON items (guild_id, category, item_name)",
+        # Keyset pages sort on (upload_timestamp DESC, item_id DESC). An ascending index scanned backwards
+        # serves that directly; the v2 DESC index would need a temp b-tree for the item_id tie-break.
+        "DROP INDEX IF EXISTS idx_items_guild_upload",
+        "CREATE INDEX IF NOT EXISTS idx_items_guild_uploaded ON items (guild_id, upload_timestamp)",
+    ]),
+]
+
+def latest_version(migrations) -> int:
+    return migrations[-1][0]
+
+async def get_schema_version(db) -> int:
+    # Plain reads only, so an up-to-date database sees no DDL at all
+    rows = await db.execute_fetchall("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'")
+    if not rows: return 0
+    rows = await db.execute_fetchall("SELECT MAX(version) FROM schema_version")
+    return rows[0][0] or 0
+
+async def run_migrations(handle, migrations) -> tuple:
+    """Brings one database up to date. Each version is applied (and committed) in its own write().
+
+    Returns (version_before, version_after).
+    """
+    current = await get_schema_version(handle.writer)
+    if current >= latest_version(migrations):
+        return current, current
+
+    before = current
+    for version, steps in migrations:
+        if version <= current: continue
+        async with handle.write() as db:
+            await db.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, applied_at REAL NOT NULL)")
+            for step in steps:
+                if callable(step):
+                    await step(db)
+                else:
+                    await db.execute(step)
+            await db.execute("INSERT INTO schema_version (version, applied_at) VALUES (?, ?)", (version, time.time()))
+        current = version
+    return before, current
@@ -0,0 +1,74 @@
+# records.py
+# Slotted row types returned by DatabaseManager for full users/items rows.
+# They keep the dict-style access the cogs already use (player['balance'], player.get('last_daily', 0),
+# player['daily_stream_coins'] = 0, dict(player)) but cost one small object per row instead of a dict.
+from dataclasses import dataclass, fields
+
+class Record:
+    """Mapping-style access on top of a slotted dataclass."""
+    __slots__ = ()
+    FIELDS = ()  # Column names in SELECT order
+    _field_set = frozenset()
+
+    @classmethod
+    def from_row(cls, row):
+        # Rows must be selected with cls.COLUMNS so the positions line up
+        return cls(*row)
+
+    def __getitem__(self, key):
+        if key not in self._field_set: raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self._field_set: raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self._field_set
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._field_set else default
+
+    def keys(self):
+        return self.FIELDS
+
+def _record(cls):
+    """Turns an annotated Record subclass into a slotted dataclass and fills in FIELDS/COLUMNS."""
+    cls = dataclass(slots=True)(cls)
+    cls.FIELDS = tuple(field.name for field in fields(cls))
+    cls._field_set = frozenset(cls.FIELDS)
+    cls.COLUMNS = ", ".join(cls.FIELDS)
+    return cls
+
+@_record
+class UserRecord(Record):
+    user_id: int
+    guild_id: int
+    balance: int
+    xp: int
+    level: int
+    last_daily: str
+    daily_streak: int
+    last_coin_claim: float
+    last_xp_claim: float
+    daily_spam_count: int
+    daily_stream_coins: int
+    last_bump_timestamp: float
+    stream_start_timestamp: float
+
+@_record
+class ItemRecord(Record):
+    item_id: int
+    creator_id: int
+    guild_id: int
+    item_name: str
+    application: str
+    category: str
+    price: int
+    product_link: str
+    screenshot_link: str
+    screenshot_link_2: str
+    screenshot_link_3: str
+    purchase_count: int
+    upload_timestamp: float
+    is_featured: int
@@ -0,0 +1,141 @@
+# sharding.py
+# Optional per-guild layout: each guild's users and shop items live in their own pair of SQLite files
+# (<key>-economy.db / <key>-shop.db in the shard folder) instead of the shared economy.db/shop.db.
+# A key is one guild ("guild-<id>") or, with buckets, a fixed hash bucket of guilds ("bucket-007").
+# Guild settings, role grants and bulk jobs stay in the main economy.db.
+# Shards open on first use and the least recently used idle ones are closed past `cache_size`.
+# split_shards.py moves an existing single-file deployment into this layout.
+import asyncio
+import json
+import os
+import zlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import migrations
+
+SHARD_CACHE_SIZE = 32  # Open shards (each is two files, three connections apiece)
+LAYOUT_FILE = "layout.json"
+SHARD_FILES = {"economy": migrations.ECONOMY_MIGRATIONS, "shop": migrations.SHOP_MIGRATIONS}
+
+def shard_key(guild_id: int, buckets: int) -> str:
+    if buckets <= 0: return f"guild-{guild_id}"
+    # crc32 rather than hash(): the bucket must never change between runs
+    return f"bucket-{zlib.crc32(str(guild_id).encode()) % buckets:03d}"
+
+def shard_path(directory: str, key: str, kind: str) -> str:
+    return os.path.join(directory, f"{key}-{kind}.db")
+
+def check_layout(directory: str, buckets: int):
+    """Records the bucket count on first use and refuses to start with a different one, which would send
+    guilds to the wrong files."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, LAYOUT_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            stored = json.load(f)["buckets"]
+        if stored != buckets:
+            raise ValueError(f"{directory} was split with {stored} buckets, not {buckets}. Re-run split_shards.py to change it.")
+    else:
+        with open(path, "w") as f:
+            json.dump({"buckets": buckets}, f)
+
+class Shard:
+    """One open shard: the economy/shop handle pair, with shop ATTACHed to economy like the main files."""
+    __slots__ = ("key", "economy", "shop", "leases", "idle")
+
+    def __init__(self, key, economy, shop):
+        self.key = key
+        self.economy = economy
+        self.shop = shop
+        self.leases = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+class ShardRouter:
+    def __init__(self, directory: str, buckets: int, pragmas: dict, handle_factory, cache_size: int = SHARD_CACHE_SIZE):
+        self.directory = directory
+        self.buckets = buckets
+        self.pragmas = pragmas
+        self.cache_size = cache_size
+        self._handle_factory = handle_factory  # DatabaseHandle, passed in to keep this module free of database.py
+        self._open = OrderedDict()  # {key: Shard}, least recently used first
+        self._opening = {}  # {key: Task} so concurrent first uses share one open
+        self.stats = {"hits": 0, "opens": 0, "evictions": 0, "closed_writes": 0}
+
+    def key_for(self, guild_id: int) -> str:
+        return shard_key(guild_id, self.buckets)
+
+    @property
+    def open_keys(self) -> list:
+        return list(self._open)
+
+    def paths(self) -> dict:
+        """{"<key>-economy"/"<key>-shop": path} for every shard file on disk, open or not."""
+        if not os.path.isdir(self.directory): return {}
+        return {name[:-3]: os.path.join(self.directory, name) for name in sorted(os.listdir(self.directory))
+                if name.endswith(("-economy.db", "-shop.db"))}
+
+    def total_writes(self) -> int:
+        return self.stats["closed_writes"] + sum(shard.economy.write_stats["writes"] + shard.shop.write_stats["writes"] for shard in self._open.values())
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, open=len(self._open), capacity=self.cache_size, on_disk=len(self.paths()) // 2)
+
+    @asynccontextmanager
+    async def lease(self, guild_id: int):
+        async with self.lease_key(self.key_for(guild_id)) as shard:
+            yield shard
+
+    @asynccontextmanager
+    async def lease_key(self, key: str):
+        """The open shard for `key`. It won't be closed while any lease on it is held."""
+        shard = self._open.get(key)
+        if shard is not None:
+            self.stats["hits"] += 1
+            self._open.move_to_end(key)
+        else:
+            task = self._opening.get(key)
+            if task is None:
+                task = self._opening[key] = asyncio.create_task(self._open_shard(key))
+                task.add_done_callback(lambda _: self._opening.pop(key, None))
+            shard = await asyncio.shield(task)
+        shard.leases += 1
+        shard.idle.clear()
+        try:
+            yield shard
+        finally:
+            shard.leases -= 1
+            if shard.leases == 0:
+                shard.idle.set()
+
+    async def _open_shard(self, key: str) -> Shard:
+        handles = {}
+        for kind, steps in SHARD_FILES.items():
+            handle = handles[kind] = self._handle_factory(shard_path(self.directory, key, kind), self.pragmas)
+            await handle.open()
+            await migrations.run_migrations(handle, steps)
+        await handles["economy"].attach(handles["shop"], "shop")
+        shard = self._open[key] = Shard(key, handles["economy"], handles["shop"])
+        self.stats["opens"] += 1
+        await self._evict(keep=key)
+        return shard
+
+    async def _evict(self, keep: str):
+        # Oldest idle shards go first; busy ones stay open even if that means briefly going over capacity
+        idle = [other for other, shard in self._open.items() if shard.leases == 0 and other != keep]
+        for key in idle[:max(len(self._open) - self.cache_size, 0)]:
+            await self._close(self._open.pop(key))
+            self.stats["evictions"] += 1
+
+    async def _close(self, shard: Shard):
+        await shard.idle.wait()
+        self.stats["closed_writes"] += shard.economy.write_stats["writes"] + shard.shop.write_stats["writes"]
+        await shard.economy.close()
+        await shard.shop.close()
+
+    async def close(self):
+        for task in list(self._opening.values()):
+            await asyncio.gather(task, return_exceptions=True)
+        while self._open:
+            _, shard = self._open.popitem(last=False)
+            await self._close(shard)
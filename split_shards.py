@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import os
+import sqlite3
+import database
+from sharding import ShardRouter, check_layout
+
+# Moves a single-file deployment (every guild in economy.db/shop.db) into the sharded layout, see sharding.py.
+# Stop the bot first. Settings, role grants and bulk jobs stay where they are; users and items are copied
+# guild by guild into their shard (item ids are kept, so links and featured items still work) and counted again.
+# The originals are only deleted with --purge, once every guild checked out. Then start the bot with DB_SHARD_DIR.
+# Usage: python split_shards.py --shard-dir shards [--buckets 64] [--purge]
+
+COPY_BATCH = 5000  # Rows per INSERT batch
+
+def source_columns(conn, table: str) -> list:
+    # table_info leaves out generated columns (users.total_xp), which can't be inserted
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+async def copy_rows(source, handle, table: str, guild_id: int) -> int:
+    columns = source_columns(source, table)
+    names, placeholders = ", ".join(columns), ", ".join("?" * len(columns))
+    rows = await handle.reader.execute_fetchall(f"SELECT COUNT(*) FROM {table} WHERE guild_id = ?", (guild_id,))
+    if rows[0][0]:
+        print(f"   ℹ️ {table} for guild {guild_id} already in its shard, skipping.")
+        return rows[0][0]
+    cursor = source.execute(f"SELECT {names} FROM {table} WHERE guild_id = ?", (guild_id,))
+    while batch := cursor.fetchmany(COPY_BATCH):
+        async with handle.write() as db:
+            await db.executemany(f"INSERT INTO {table} ({names}) VALUES ({placeholders})", batch)
+    rows = await handle.reader.execute_fetchall(f"SELECT COUNT(*) FROM {table} WHERE guild_id = ?", (guild_id,))
+    return rows[0][0]
+
+async def split(economy_path: str, shop_path: str, shard_dir: str, buckets: int, purge: bool):
+    for path in (economy_path, shop_path):
+        if not os.path.exists(path):
+            print(f"❌ {path} not found.")
+            return
+    try:
+        check_layout(shard_dir, buckets)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    economy = sqlite3.connect(economy_path)
+    shop = sqlite3.connect(shop_path)
+    router = ShardRouter(shard_dir, buckets, database.PRAGMA_PROFILES[database.DEFAULT_PRAGMA_PROFILE], database.DatabaseHandle, cache_size=4)
+    guilds = sorted({row[0] for row in economy.execute("SELECT DISTINCT guild_id FROM users")}
+                    | {row[0] for row in shop.execute("SELECT DISTINCT guild_id FROM items")})
+    print(f"🔄 Splitting {len(guilds)} guilds into {shard_dir}/ ({f'{buckets} buckets' if buckets else 'one shard per guild'})...")
+
+    verified = []
+    try:
+        for guild_id in guilds:
+            async with router.lease(guild_id) as shard:
+                copied = {"users": await copy_rows(economy, shard.economy, "users", guild_id),
+                          "items": await copy_rows(shop, shard.shop, "items", guild_id)}
+            expected = {"users": economy.execute("SELECT COUNT(*) FROM users WHERE guild_id = ?", (guild_id,)).fetchone()[0],
+                        "items": shop.execute("SELECT COUNT(*) FROM items WHERE guild_id = ?", (guild_id,)).fetchone()[0]}
+            if copied == expected:
+                verified.append(guild_id)
+                print(f"   ✅ Guild {guild_id} -> {router.key_for(guild_id)}: {copied['users']:,} users, {copied['items']:,} items")
+            else:
+                print(f"   ❌ Guild {guild_id}: expected {expected}, shard has {copied}. Left in place.")
+    finally:
+        await router.close()
+
+    if purge and verified:
+        placeholders = ", ".join("?" * len(verified))
+        with economy:
+            economy.execute(f"DELETE FROM users WHERE guild_id IN ({placeholders})", verified)
+        with shop:
+            shop.execute(f"DELETE FROM items WHERE guild_id IN ({placeholders})", verified)
+        print(f"🧹 Removed {len(verified)} guilds from {economy_path} and {shop_path}. Maintenance reclaims the space.")
+    economy.close()
+    shop.close()
+
+    if len(verified) == len(guilds):
+        print(f"✅ Done. Start the bot with DB_SHARD_DIR={shard_dir}" + (f" DB_SHARD_BUCKETS={buckets}" if buckets else ""))
+    else:
+        print(f"⚠️ {len(guilds) - len(verified)} guilds didn't check out, see above. Fix them and run this again.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split economy.db/shop.db into per-guild shard files.")
+    parser.add_argument("--economy", default="economy.db", help="The existing economy database.")
+    parser.add_argument("--shop", default="shop.db", help="The existing shop database.")
+    parser.add_argument("--shard-dir", required=True, help="Folder for the shard files (DB_SHARD_DIR).")
+    parser.add_argument("--buckets", type=int, default=0, help="Hash guilds into this many shards (DB_SHARD_BUCKETS, default: one per guild).")
+    parser.add_argument("--purge", action="store_true", help="Delete the copied guilds from the original files afterwards.")
+    args = parser.parse_args()
+    asyncio.run(split(args.economy, args.shop, args.shard_dir, args.buckets, args.purge))
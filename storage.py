@@ -0,0 +1,409 @@
+# storage.py
+# The storage interface behind bot.db: the user, settings, rank and shop item operations the cogs call.
+# DatabaseManager (database.py) is the SQLite engine. MemoryEngine keeps everything in plain dicts and is meant
+# for benchmarks and tests (benchmark_db.py --only contract runs one workload against every engine and exits 1
+# if any two disagree).
+# A networked SQL engine would subclass StorageEngine the same way.
+# Bulk jobs, role grants, streaming scans, maintenance and backups are SQLite-only and not part of the interface.
+import dataclasses
+import itertools
+import re
+import time
+from abc import ABC, abstractmethod
+import levels
+from records import UserRecord, ItemRecord
+
+# Catalog orderings for keyset pagination: name -> (sort column, descending)
+ITEM_ORDERINGS = {"newest": ("upload_timestamp", True), "name": ("item_name", False)}
+ITEM_LIST_COLUMNS = "item_id, item_name, category, price, purchase_count, upload_timestamp"  # Enough to render a list row
+SEARCH_RESULT_COLUMNS = ("item_id", "item_name", "price", "application", "category")
+
+class StorageEngine(ABC):
+    """Async operations every engine provides; an engine missing one fails when it is created. Rows come back as
+    UserRecord/ItemRecord (or dicts for list/rank views), and callers may modify what they get without touching stored data."""
+    name = ""
+
+    # --- LIFECYCLE ---
+    @abstractmethod
+    async def init_db(self):
+        ...
+
+    @abstractmethod
+    async def close(self):
+        ...
+
+    # --- SETTINGS ---
+    @staticmethod
+    def _parse_setting_value(raw):
+        if raw is None: return None
+        # Attempt to cast to int if it looks like an ID. Role lists live in guild_role_grants, not here
+        if raw.isdigit(): return int(raw)
+        return raw
+
+    @abstractmethod
+    async def get_guild_settings(self, guild_id: int) -> dict:
+        ...
+
+    async def get_guild_setting(self, guild_id: int, key: str, default=None):
+        value = (await self.get_guild_settings(guild_id)).get(key)
+        return default if value is None else value
+
+    @abstractmethod
+    async def set_guild_setting(self, guild_id: int, key: str, value):
+        ...
+
+    # --- USERS ---
+    @abstractmethod
+    async def get_user_data(self, user_id: int, guild_id: int) -> UserRecord:
+        ...
+
+    @abstractmethod
+    async def get_user_fields(self, user_id: int, guild_id: int, *fields):
+        ...
+
+    @abstractmethod
+    async def get_users_data(self, guild_id: int, user_ids, create_missing: bool = True) -> dict:
+        ...
+
+    @abstractmethod
+    async def get_all_users_in_guild(self, guild_id: int) -> list:
+        ...
+
+    @abstractmethod
+    async def update_user_data(self, user_id: int, guild_id: int, data: dict):
+        ...
+
+    @abstractmethod
+    async def delete_user_data(self, user_id: int, guild_id: int):
+        ...
+
+    @abstractmethod
+    def accrue_user_data(self, user_id: int, guild_id: int, increments: dict = None, timestamps: dict = None):
+        ...
+
+    @abstractmethod
+    async def flush_accruals(self):
+        ...
+
+    # --- WALLET ---
+    @abstractmethod
+    async def credit(self, user_id: int, guild_id: int, amount: int) -> int:
+        ...
+
+    @abstractmethod
+    async def debit(self, user_id: int, guild_id: int, amount: int, clamp: bool = False):
+        ...
+
+    @abstractmethod
+    async def transfer(self, sender_id: int, recipient_id: int, guild_id: int, amount: int):
+        ...
+
+    @abstractmethod
+    async def purchase_item(self, buyer_id: int, guild_id: int, item_id: int, price: int, commission_rate: float):
+        ...
+
+    @abstractmethod
+    async def claim_daily(self, user_id: int, guild_id: int, last_daily, claimed_at: str, streak: int, reward: int):
+        ...
+
+    # --- RANKS ---
+    @abstractmethod
+    async def get_leaderboard(self, guild_id: int, limit: int = 10, offset: int = 0) -> list:
+        ...
+
+    @abstractmethod
+    async def count_ranked_users(self, guild_id: int) -> int:
+        ...
+
+    @abstractmethod
+    async def get_user_rank(self, user_id: int, guild_id: int):
+        ...
+
+    # --- SHOP ITEMS ---
+    @abstractmethod
+    async def add_item_to_shop(self, creator_id, guild_id, item_name, application, category, price, product_link, screenshot_link, screenshot_link_2, screenshot_link_3) -> int:
+        ...
+
+    @abstractmethod
+    async def get_item_details(self, item_id, guild_id):
+        ...
+
+    @abstractmethod
+    async def delete_item(self, item_id, guild_id):
+        ...
+
+    @abstractmethod
+    async def get_new_arrivals(self, guild_id, limit=5) -> list:
+        ...
+
+    @abstractmethod
+    async def get_all_items(self, guild_id) -> list:
+        ...
+
+    @staticmethod
+    def item_cursor(item: dict, order: str):
+        """The keyset cursor for an item dict in the given ordering (pass it as after=/before=)."""
+        column, _ = ITEM_ORDERINGS[order]
+        return (item[column], item['item_id'])
+
+    @abstractmethod
+    async def get_items_page(self, guild_id: int, order: str = "newest", after=None, before=None, limit: int = 10, category: str = None) -> list:
+        ...
+
+    @abstractmethod
+    async def count_items(self, guild_id: int, category: str = None) -> int:
+        ...
+
+    @abstractmethod
+    async def get_item_categories(self, guild_id: int) -> list:
+        ...
+
+    @abstractmethod
+    async def get_items_by_creator(self, creator_id: int, guild_id: int) -> list:
+        ...
+
+    @abstractmethod
+    async def bump_item(self, item_id: int, guild_id: int):
+        ...
+
+    @abstractmethod
+    async def get_featured_item(self, guild_id):
+        ...
+
+    @abstractmethod
+    async def set_featured_item(self, item_id, guild_id):
+        ...
+
+    @staticmethod
+    def _search_terms(text: str) -> list:
+        return [term for term in re.split(r"\W+", text) if term]
+
+    @abstractmethod
+    async def search_items(self, guild_id, query, limit=None) -> list:
+        ...
+
+    @abstractmethod
+    async def increment_purchase_count(self, item_id: int, guild_id: int):
+        ...
+
+# --- IN-MEMORY ENGINE ---
+SEARCH_FIELD_WEIGHTS = (("item_name", 10.0), ("application", 3.0), ("category", 2.0))  # Same weights as the FTS5 ranking
+
+class MemoryEngine(StorageEngine):
+    """Every row in Python dicts, nothing persisted. Same results as the SQLite engine for the same calls,
+    except search ranking, which counts weighted field hits instead of BM25."""
+    name = "memory"
+
+    def __init__(self, bot=None):
+        self.bot = bot
+        self._settings = {}  # {guild_id: {setting_key: parsed value}}
+        self._users = {}     # {(user_id, guild_id): UserRecord}
+        self._items = {}     # {item_id: ItemRecord}
+        self._item_ids = itertools.count(1)
+
+    async def init_db(self):
+        pass
+
+    async def close(self):
+        pass
+
+    # --- SETTINGS ---
+    async def get_guild_settings(self, guild_id: int) -> dict:
+        return self._settings.setdefault(guild_id, {})
+
+    async def set_guild_setting(self, guild_id: int, key: str, value):
+        self._settings.setdefault(guild_id, {})[key] = self._parse_setting_value(str(value))
+
+    # --- USERS ---
+    def _user(self, user_id: int, guild_id: int) -> UserRecord:
+        # Column defaults from the users table
+        key = (user_id, guild_id)
+        record = self._users.get(key)
+        if record is None:
+            record = self._users[key] = UserRecord(user_id, guild_id, 0, 0, 1, None, 0, 0, 0, 0, 0, 0, 0)
+        return record
+
+    async def get_user_data(self, user_id: int, guild_id: int) -> UserRecord:
+        return dataclasses.replace(self._user(user_id, guild_id))
+
+    async def get_user_fields(self, user_id: int, guild_id: int, *fields):
+        for field in fields:
+            if field not in UserRecord.FIELDS:
+                raise ValueError(f"Unknown user field '{field}'")
+        record = self._user(user_id, guild_id)
+        values = tuple(record[field] for field in fields)
+        return values[0] if len(fields) == 1 else values
+
+    async def get_users_data(self, guild_id: int, user_ids, create_missing: bool = True) -> dict:
+        results = {}
+        for user_id in dict.fromkeys(user_ids):
+            if create_missing or (user_id, guild_id) in self._users:
+                results[user_id] = dataclasses.replace(self._user(user_id, guild_id))
+        return results
+
+    async def get_all_users_in_guild(self, guild_id: int) -> list:
+        return [dataclasses.replace(record) for (_, row_guild), record in self._users.items() if row_guild == guild_id]
+
+    async def update_user_data(self, user_id: int, guild_id: int, data: dict):
+        record = self._users.get((user_id, guild_id))
+        if record is None: return
+        for field, value in data.items():
+            record[field] = value
+
+    async def delete_user_data(self, user_id: int, guild_id: int):
+        self._users.pop((user_id, guild_id), None)
+
+    def accrue_user_data(self, user_id: int, guild_id: int, increments: dict = None, timestamps: dict = None):
+        record = self._users.get((user_id, guild_id))
+        if record is None: return
+        for field, delta in (increments or {}).items():
+            if field == "xp":
+                if delta: levels.apply_xp(record, delta)  # Total XP gained, like the SQLite engine's buffer
+            elif field == "balance":
+                record.balance += delta
+            else:
+                raise ValueError(f"Only balance, xp can be accrued, got {field}")
+        for field, value in (timestamps or {}).items():
+            record[field] = max(record[field] or 0, value)
+
+    async def flush_accruals(self):
+        pass  # Accruals are applied straight away
+
+    # --- WALLET ---
+    async def credit(self, user_id: int, guild_id: int, amount: int) -> int:
+        record = self._user(user_id, guild_id)
+        record.balance += amount
+        return record.balance
+
+    async def debit(self, user_id: int, guild_id: int, amount: int, clamp: bool = False):
+        record = self._users.get((user_id, guild_id))
+        if record is None: return None
+        if clamp:
+            record.balance = max(record.balance - amount, 0)
+        elif record.balance >= amount:
+            record.balance -= amount
+        else:
+            return None
+        return record.balance
+
+    async def transfer(self, sender_id: int, recipient_id: int, guild_id: int, amount: int):
+        if await self.debit(sender_id, guild_id, amount) is None: return None
+        return self._users[(sender_id, guild_id)].balance, await self.credit(recipient_id, guild_id, amount)
+
+    async def purchase_item(self, buyer_id: int, guild_id: int, item_id: int, price: int, commission_rate: float):
+        item = self._items.get(item_id)
+        if item is None or item.guild_id != guild_id: return None, None
+        balance = await self.debit(buyer_id, guild_id, price)
+        if balance is None: return dataclasses.replace(item, purchase_count=item.purchase_count + 1), None
+        item.purchase_count += 1
+        creator_balance = await self.credit(item.creator_id, guild_id, int(item.price * commission_rate))
+        return dataclasses.replace(item), creator_balance if item.creator_id == buyer_id else balance
+
+    async def claim_daily(self, user_id: int, guild_id: int, last_daily, claimed_at: str, streak: int, reward: int):
+        record = self._users.get((user_id, guild_id))
+        if record is None or record.last_daily != last_daily: return None
+        record.last_daily, record.daily_streak, record.daily_spam_count = claimed_at, streak, 0
+        record.balance += reward
+        return record.balance
+
+    # --- RANKS ---
+    @staticmethod
+    def _rank_key(record: UserRecord):
+        return (-levels.total_xp(record.level, record.xp), record.user_id)
+
+    def _ranked(self, guild_id: int) -> list:
+        return sorted((record for (_, row_guild), record in self._users.items() if row_guild == guild_id), key=self._rank_key)
+
+    async def get_leaderboard(self, guild_id: int, limit: int = 10, offset: int = 0) -> list:
+        return [{"user_id": record.user_id, "level": record.level, "xp": record.xp, "balance": record.balance, "total_xp": -self._rank_key(record)[0]}
+                for record in self._ranked(guild_id)[offset:offset + limit]]
+
+    async def count_ranked_users(self, guild_id: int) -> int:
+        return sum(1 for _, row_guild in self._users if row_guild == guild_id)
+
+    async def get_user_rank(self, user_id: int, guild_id: int):
+        record = self._users.get((user_id, guild_id))
+        if record is None: return None
+        ranked = self._ranked(guild_id)
+        return {"level": record.level, "xp": record.xp, "total_xp": -self._rank_key(record)[0], "rank": ranked.index(record) + 1, "out_of": len(ranked)}
+
+    # --- SHOP ITEMS ---
+    def _guild_items(self, guild_id: int) -> list:
+        return [item for item in self._items.values() if item.guild_id == guild_id]
+
+    async def add_item_to_shop(self, creator_id, guild_id, item_name, application, category, price, product_link, screenshot_link, screenshot_link_2, screenshot_link_3) -> int:
+        item_id = next(self._item_ids)
+        self._items[item_id] = ItemRecord(item_id, creator_id, guild_id, item_name, application, category, price, product_link,
+                                          screenshot_link, screenshot_link_2, screenshot_link_3, 0, time.time(), 0)
+        return item_id
+
+    async def get_item_details(self, item_id, guild_id):
+        item = self._items.get(item_id)
+        return dataclasses.replace(item) if item and item.guild_id == guild_id else None
+
+    async def delete_item(self, item_id, guild_id):
+        if item_id in self._items and self._items[item_id].guild_id == guild_id:
+            del self._items[item_id]
+
+    async def get_new_arrivals(self, guild_id, limit=5) -> list:
+        items = sorted(self._guild_items(guild_id), key=lambda item: item.upload_timestamp, reverse=True)
+        return [dataclasses.replace(item) for item in (items[:limit] if limit else items)]
+
+    async def get_all_items(self, guild_id) -> list:
+        return [dataclasses.replace(item) for item in sorted(self._guild_items(guild_id), key=lambda item: item.item_name)]
+
+    async def get_items_page(self, guild_id: int, order: str = "newest", after=None, before=None, limit: int = 10, category: str = None) -> list:
+        column, descending = ITEM_ORDERINGS[order]
+        items = sorted((item for item in self._guild_items(guild_id) if category is None or item.category == category),
+                       key=lambda item: (item[column], item.item_id), reverse=descending)
+        keys = [(item[column], item.item_id) for item in items]
+        if before is not None:
+            # Position of the first item that comes at or after `before` in display order
+            end = next((i for i, key in enumerate(keys) if (key >= tuple(before) if not descending else key <= tuple(before))), len(items))
+            page = items[max(end - limit, 0):end]
+        else:
+            start = 0 if after is None else next((i for i, key in enumerate(keys) if (key > tuple(after) if not descending else key < tuple(after))), len(items))
+            page = items[start:start + limit]
+        return [{column: item[column] for column in ITEM_LIST_COLUMNS.split(", ")} for item in page]
+
+    async def count_items(self, guild_id: int, category: str = None) -> int:
+        return sum(1 for item in self._guild_items(guild_id) if category is None or item.category == category)
+
+    async def get_item_categories(self, guild_id: int) -> list:
+        return sorted({item.category for item in self._guild_items(guild_id)})
+
+    async def get_items_by_creator(self, creator_id: int, guild_id: int) -> list:
+        items = [item for item in self._guild_items(guild_id) if item.creator_id == creator_id]
+        return [dataclasses.replace(item) for item in sorted(items, key=lambda item: item.upload_timestamp, reverse=True)]
+
+    async def bump_item(self, item_id: int, guild_id: int):
+        item = self._items.get(item_id)
+        if item and item.guild_id == guild_id:
+            item.upload_timestamp = time.time()
+
+    async def get_featured_item(self, guild_id):
+        item = next((item for item in self._guild_items(guild_id) if item.is_featured), None)
+        return dataclasses.replace(item) if item else None
+
+    async def set_featured_item(self, item_id, guild_id):
+        for item in self._guild_items(guild_id):
+            item.is_featured = 1 if item.item_id == item_id else 0
+
+    async def search_items(self, guild_id, query, limit=None) -> list:
+        terms = [term.lower() for term in self._search_terms(query)]
+        if not terms: return []
+        scored = []
+        for item in self._guild_items(guild_id):
+            words = {field: re.split(r"\W+", item[field].lower()) for field, _ in SEARCH_FIELD_WEIGHTS}
+            # Every term must prefix-match a word somewhere, like the FTS5 query
+            if not all(any(word.startswith(term) for field_words in words.values() for word in field_words) for term in terms): continue
+            score = sum(weight for field, weight in SEARCH_FIELD_WEIGHTS for term in terms if any(word.startswith(term) for word in words[field]))
+            scored.append((-score, item.item_id, item))
+        scored.sort(key=lambda entry: entry[:2])
+        results = [{column: item[column] for column in SEARCH_RESULT_COLUMNS} for _, _, item in scored]
+        return results[:limit] if limit else results
+
+    async def increment_purchase_count(self, item_id: int, guild_id: int):
+        item = self._items.get(item_id)
+        if item and item.guild_id == guild_id:
+            item.purchase_count += 1